@@ -0,0 +1,127 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+import calendar
+from collections import defaultdict
+
+# third party library
+import numpy as np
+import pandas as pd
+
+# local
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# names of the days of the week indexed by pandas dayofweek, Monday is 0
+WEEKDAY_NAMES = list(calendar.day_name)
+
+# dimensions that can be aggregated over
+DIMENSIONS = ['year', 'month', 'day', 'hour', 'borough']
+
+# time columns derived once at load for each time dimension
+DERIVED_TIME_COLUMNS = {'year': 'YEAR', 'month': 'MONTH', 'day': 'DAY', 'hour': 'HOUR'}
+
+
+# ============================================================== #
+#  SECTION: Class Definitions                                   #
+# ============================================================== #
+
+class AggregationKeys:
+    """
+    Integer key of every dimension for each row of a dataframe.
+    The keys are derived once so any combination of dimensions is counted in a single pass.
+    Days are keyed by pandas dayofweek and boroughs by their index in boroughs, -1 for any other borough.
+    """
+
+    def __init__(self, df, boroughs):
+        self.boroughs = list(boroughs)
+        self.keys = {'borough': pd.Categorical(df['BOROUGH'], categories=self.boroughs).codes.astype(np.int16)}
+        if all(column in df for column in DERIVED_TIME_COLUMNS):
+            # reuse the time columns derived at load, the day column is a categorical of day names
+            day = df[DERIVED_TIME_COLUMNS['day']]
+            day_keys = np.array([WEEKDAY_NAMES.index(name) for name in day.cat.categories], dtype=np.int16)
+            self.keys['day'] = day_keys[day.cat.codes.to_numpy()]
+            for dimension in ['year', 'month', 'hour']:
+                self.keys[dimension] = df[DERIVED_TIME_COLUMNS[dimension]].to_numpy(dtype=np.int16)
+        else:
+            crash_time = df['CRASH TIME'].dt
+            self.keys['year'] = crash_time.year.to_numpy(dtype=np.int16)
+            self.keys['month'] = crash_time.month.to_numpy(dtype=np.int16)
+            self.keys['day'] = crash_time.dayofweek.to_numpy(dtype=np.int16)
+            self.keys['hour'] = crash_time.hour.to_numpy(dtype=np.int16)
+
+    def __len__(self):
+        return len(self.keys['year'])
+
+    def encode(self, dimension, domain):
+        """
+        Keys of the values of a dimension's domain, days are named and boroughs are names of boroughs.
+        """
+        if dimension == 'day':
+            return [WEEKDAY_NAMES.index(day) for day in domain]
+        if dimension == 'borough':
+            return [self.boroughs.index(borough) for borough in domain]
+        return list(domain)
+
+    def positions(self, dimension, domain):
+        """
+        Position of each row's value within the domain of a dimension, -1 when it is not within the domain.
+        """
+        keys = self.keys[dimension]
+        domain_keys = np.array(self.encode(dimension, domain), dtype=np.int64)
+        if len(keys) == 0 or len(domain_keys) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        # lookup table from key to position, offset so negative keys can be looked up
+        offset = min(keys.min(), domain_keys.min())
+        lookup = np.full(max(keys.max(), domain_keys.max()) - offset + 1, -1, dtype=np.int64)
+        lookup[domain_keys - offset] = np.arange(len(domain_keys))
+        return lookup[keys - offset]
+
+    def count_by(self, dimensions, weights=None):
+        """
+        Count rows, or sum weights, for every combination of values of the given dimensions.
+        dimensions is a list of (dimension, domain) and the result has one axis per dimension
+        in the same order, with each axis indexed by position in its domain.
+        """
+        positions = [self.positions(dimension, domain) for dimension, domain in dimensions]
+        return count_positions(positions, tuple(len(domain) for _, domain in dimensions), weights=weights)
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def nested_counts(counts, outer_domain, inner_domain, print_step=False):
+    """
+    Convert a 3 dimensional count array into a dictionary of outer value to a dictionary
+    of inner value to the list of counts along the last axis.
+    """
+    nested = defaultdict(lambda: defaultdict(list))
+    counts = counts.tolist()
+    for outer_index, outer_value in enumerate(outer_domain):
+        if print_step:
+            print('Showing year:', outer_value)
+        for inner_index, inner_value in enumerate(inner_domain):
+            nested[outer_value][inner_value].extend(counts[outer_index][inner_index])
+            if print_step:
+                print('   ', inner_value, counts[outer_index][inner_index])
+    return nested
+
+
+def count_positions(positions, shape, weights=None):
+    """
+    Count rows, or sum weights, by their positions along each axis of an array of the given shape.
+    Rows with a negative position along any axis are not counted.
+    """
+    within = np.ones(len(positions[0]), dtype=bool)
+    for position in positions:
+        within &= position >= 0
+    flat_index = np.ravel_multi_index([position[within] for position in positions], shape)
+    if weights is not None:
+        weights = np.nan_to_num(np.asarray(weights, dtype=np.float64))[within]
+    return np.bincount(flat_index, weights=weights, minlength=int(np.prod(shape))).reshape(shape)
@@ -4,19 +4,29 @@
 
 # standard library
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+import os
+import sys
 
 # third party library
 import numpy as np
 import pandas as pd
 from pandas.api.types import CategoricalDtype
 import matplotlib.pyplot as plt
-from scipy.stats import gaussian_kde
-from mpl_toolkits.basemap import Basemap
 import seaborn as sns
-from PIL import Image
 
 # local
+from aggregation import AggregationKeys, nested_counts
+from columnar_cache import CLEANED_DATA_DIR, COLLISION_ID_COLUMN, append_cleaned_data, clear_pending_append, high_water_mark, \
+    load_cleaned_data, read_high_water_mark, read_pending_append, remove_appended, save_cleaned_data, saved_years, \
+    write_high_water_mark, write_pending_append
+from count_cube import COUNT_CUBE_FILE, STAGED_COUNT_CUBE_FILE, build_count_cube, load_count_cube
+from density import DENSITY_METHODS, DEFAULT_RESOLUTION, binned_kde, count_image, density_grid, exact_kde, shade_counts
+from density_cache import DensityCache
+from figure_export import active_exporter, export_question, show_figure
+from instrumentation import profile_stage, profiled, profiling
+from map_cache import MAP_CACHE
 
 
 # ============================================================== #
@@ -29,6 +39,21 @@ MOTOR_VEHICLE_COLLISIONS_CSV = 'Motor_Vehicle_Collisions_-_Crashes.csv'
 # preprocessed cleaned vehicle colision file
 CLEAN_MOTOR_VEHICLE_COLLISIONS_CSV = 'Clean_Motor_Vehicle_Collisions_-_Crashes.csv'
 
+# columns of the collision data used for analytics
+ANALYTICS_COLUMNS = ['CRASH DATE', 'CRASH TIME', 'BOROUGH', 'LATITUDE', 'LONGITUDE', 'NUMBER OF PERSONS INJURED', 'NUMBER OF PERSONS KILLED', 'NUMBER OF PEDESTRIANS INJURED',
+                     'NUMBER OF PEDESTRIANS KILLED', 'NUMBER OF CYCLIST INJURED', 'NUMBER OF CYCLIST KILLED', 'NUMBER OF MOTORIST INJURED', 'NUMBER OF MOTORIST KILLED']
+
+# explicit dtypes of the analytics columns so they are not inferred, counts are floats as some are missing
+ANALYTICS_DTYPES = {'CRASH DATE': str, 'CRASH TIME': str, 'BOROUGH': str, 'LATITUDE': np.float64, 'LONGITUDE': np.float64,
+                    **{column: np.float64 for column in ANALYTICS_COLUMNS if column.startswith('NUMBER OF')}}
+
+# columns and dtypes read when the newest collision read has to be known to append newer ones later
+INGEST_COLUMNS = ANALYTICS_COLUMNS + [COLLISION_ID_COLUMN]
+INGEST_DTYPES = {**ANALYTICS_DTYPES, COLLISION_ID_COLUMN: np.int64}
+
+# rows read at a time when scanning a file for collisions newer than the saved ones
+APPEND_CHUNK_SIZE = 100000
+
 # ============================================================== #
 #  SECTION: Class Definitions                                   #
 # ============================================================== #
@@ -74,8 +99,15 @@ MAX_LATITUDE = 40.92
 MIN_LONGITUDE = -74.25
 MAX_LONGITUDE = -73.7
 
-# range of selected years
-YEARS = range(2013, 2021)
+# first year analyzed, collisions of the Dataset start in the middle of 2012
+FIRST_YEAR = 2013
+
+# analyzed years, replaced by the years of the data when it is loaded
+YEARS = list(range(FIRST_YEAR, 2021))
+
+# rows and columns of the side by side plots, years that do not fit continue on another figure
+SUBPLOT_ROWS = 2
+SUBPLOT_COLUMNS = 2
 
 # selected months
 MONTHS = {
@@ -99,7 +131,66 @@ DAYS = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Satur
 # range of hours, military time
 HOURS = range(0, 24)
 
+# ordered type of the day of the week column
+DAY_TYPE = CategoricalDtype(categories=DAYS, ordered=True)
+
+# compact types of the cleaned analytics columns, counts are at most a few dozen people
+ANALYTICS_SCHEMA = {
+    'BOROUGH': CategoricalDtype(categories=list(BOROUGH_COORDS.keys())),
+    'LATITUDE': np.float32,
+    'LONGITUDE': np.float32,
+    'NUMBER OF PERSONS INJURED': np.uint16,
+    'NUMBER OF PERSONS KILLED': np.uint8,
+    'NUMBER OF PEDESTRIANS INJURED': np.uint8,
+    'NUMBER OF PEDESTRIANS KILLED': np.uint8,
+    'NUMBER OF CYCLIST INJURED': np.uint8,
+    'NUMBER OF CYCLIST KILLED': np.uint8,
+    'NUMBER OF MOTORIST INJURED': np.uint16,
+    'NUMBER OF MOTORIST KILLED': np.uint8
+}
+
+# integer types, narrowest first, a count column is widened to when its values do not fit its type in ANALYTICS_SCHEMA,
+# signed ones when it has negative values
+UNSIGNED_INTEGER_TYPES = [np.uint8, np.uint16, np.uint32, np.uint64]
+SIGNED_INTEGER_TYPES = [np.int8, np.int16, np.int32, np.int64]
+
+# approximate meters in a degree of latitude
+METERS_PER_DEGREE = 111320
 
+
+@profiled(category='clean')
+def add_time_columns(df):
+    """
+    Add the year, month, day of the week and hour of each crash as compact columns,
+    so filtering and plotting never decompose CRASH TIME again.
+    """
+    crash_time = df['CRASH TIME'].dt
+    df['YEAR'] = crash_time.year.astype(np.int16)
+    df['MONTH'] = crash_time.month.astype(np.int8)
+    # pandas numbers days from Monday, DAYS starts on Sunday
+    df['DAY'] = pd.Categorical.from_codes((crash_time.dayofweek.to_numpy() + 1) % 7, dtype=DAY_TYPE)
+    df['HOUR'] = crash_time.hour.astype(np.int8)
+    return df
+
+
+def time_column(df, column):
+    """
+    Derived time column of df, decomposed from CRASH TIME if df does not have it.
+    """
+    if column in df:
+        return df[column]
+    crash_time = df['CRASH TIME'].dt
+    if column == 'YEAR':
+        return crash_time.year
+    elif column == 'MONTH':
+        return crash_time.month
+    elif column == 'DAY':
+        return crash_time.day_name()
+    elif column == 'HOUR':
+        return crash_time.hour
+
+
+@profiled(category='filter')
 def df_filter_by(df, column, value):
     """
     Returns a dataframe with rows selected from df that have value within column.
@@ -107,19 +198,22 @@ def df_filter_by(df, column, value):
     if column == 'borough':
         return df[df['BOROUGH'] == value]
     elif column == 'year':
-        return df[df['CRASH TIME'].dt.year == value]
+        return df[time_column(df, 'YEAR') == value]
     elif column == 'month':
-        return df[df['CRASH TIME'].dt.month == value]
+        return df[time_column(df, 'MONTH') == value]
     elif column == 'day':
-        return df[df['CRASH TIME'].dt.day_name() == value]
+        return df[time_column(df, 'DAY') == value]
     elif column == 'hour':
-        return df[df['CRASH TIME'].dt.hour == value]
+        return df[time_column(df, 'HOUR') == value]
 
 
-def df_between_coords(df, coord1, coord2):
+def df_between_coords(df, coord1, coord2, index=None):
     """
     Filter dataframe by being between two coordinates, c1 and c2.
+    With a SpatialGridIndex built over df only the rows in the grid cells of the box are compared.
     """
+    if index is not None:
+        return df.iloc[index.within_box(coord1, coord2)]
     # min, max latitude and longitude of coord1
     min_lat, min_long = coord1
     # min, max latitude and longitude of coord2
@@ -133,36 +227,127 @@ def df_between_years(df, y1, y2):
     """
     Filter dataframe by being between two year, y1 and y2.
     """
-    return df[(y1 <= df['CRASH TIME'].dt.year) & (df['CRASH TIME'].dt.year <= y2)]
+    year = time_column(df, 'YEAR')
+    return df[(y1 <= year) & (year <= y2)]
+
+
+def discover_years(cleaned_df, first_year=FIRST_YEAR):
+    """
+    Years with collisions in cleaned_df from first_year on, counted in a single bincount.
+    """
+    year = time_column(cleaned_df, 'YEAR').to_numpy(dtype=np.int64)
+    if len(year) == 0:
+        return []
+    offset = year.min()
+    years = np.flatnonzero(np.bincount(year - offset)) + offset
+    return [int(year) for year in years if year >= first_year]
+
+
+def set_years(years):
+    """
+    Analyze the given years in every query and plot.
+    """
+    global YEARS
+    YEARS = list(years)
+
+
+def split_by_year(cleaned_df):
+    """
+    Dictionary of the rows of cleaned_df in each year of YEARS.
+    Rows are grouped by a single stable sort on the year instead of a pass over the rows per year.
+    """
+    year = time_column(cleaned_df, 'YEAR').to_numpy(dtype=np.int64)
+    order = np.argsort(year, kind='stable')
+    bounds = np.searchsorted(year[order], [YEARS, np.add(YEARS, 1)])
+    return {year: cleaned_df.iloc[order[start:end]] for year, start, end in zip(YEARS, *bounds)}
 
 
-def load_from_saved():
+def fitting_integer_dtype(values, dtype):
+    """
+    dtype when every value of the series fits within it, otherwise the narrowest wider integer type they fit within,
+    a signed one when any value is negative, so converting never wraps values around.
+    """
+    low, high = values.min(), values.max()
+    if pd.isna(low):
+        return dtype
+    candidates = SIGNED_INTEGER_TYPES if low < 0 else UNSIGNED_INTEGER_TYPES
+    for candidate in [dtype] + candidates:
+        info = np.iinfo(candidate)
+        if np.dtype(candidate).itemsize >= np.dtype(dtype).itemsize and info.min <= low and high <= info.max:
+            return candidate
+    raise ValueError(f'{values.name} ranges from {low} to {high}, beyond every integer type')
+
+
+@profiled(category='clean')
+def apply_schema(cleaned_df, schema=ANALYTICS_SCHEMA, report=False):
+    """
+    Convert the columns of cleaned_df to the compact types of the schema. A count column with values that
+    do not fit its type keeps the narrowest wider type they fit. Missing counts become 0, they can no longer
+    be told apart from counts of 0. Optionally print the memory of each column before and after,
+    the missing counts filled, the widened columns and the precision lost by the coordinates.
+    """
+    before = cleaned_df.memory_usage(deep=True)
+    precision_loss = {}
+    missing_counts = {}
+    widened = {}
+    for column, dtype in schema.items():
+        if column not in cleaned_df:
+            continue
+        values = cleaned_df[column]
+        if pd.api.types.is_integer_dtype(dtype):
+            missing_counts[column] = int(values.isna().sum())
+            values = values.fillna(0)
+            fitting_dtype = fitting_integer_dtype(values, dtype)
+            if fitting_dtype != dtype:
+                widened[column] = np.dtype(fitting_dtype).name
+            dtype = fitting_dtype
+        converted = values.astype(dtype)
+        if report and pd.api.types.is_float_dtype(dtype):
+            precision_loss[column] = np.abs(values.to_numpy(dtype=np.float64) - converted.to_numpy(dtype=np.float64)).max(initial=0)
+        cleaned_df[column] = converted
+
+    if report:
+        after = cleaned_df.memory_usage(deep=True)
+        print(f'{"Column":<32}{"Before":>12}{"After":>12}')
+        for column in before.index:
+            print(f'{column:<32}{before[column] / 1024 ** 2:>9.1f} MB{after.get(column, 0) / 1024 ** 2:>9.1f} MB')
+        print(f'{"Total":<32}{before.sum() / 1024 ** 2:>9.1f} MB{after.sum() / 1024 ** 2:>9.1f} MB')
+        for column, loss in precision_loss.items():
+            print(f'Max {column.lower()} change: {loss:.2e} degrees (~{loss * METERS_PER_DEGREE:.2f} m)')
+        for column, missing in missing_counts.items():
+            if missing:
+                print(f'{missing} missing {column.lower()} filled with 0')
+        for column, dtype in widened.items():
+            print(f'{column.lower()} widened to {dtype}, its values do not fit {np.dtype(schema[column]).name}')
+    return cleaned_df
+
+
+def load_from_saved(columns=None, only_years=False, report=False):
     """
     Load from a saved version of the data file into a dataframe.
+    Optionally only read some columns or only the partitions of the years from FIRST_YEAR on.
+    YEARS becomes the years of the loaded data.
     """
-    year_df_dict = {}
-    for year in YEARS:
-        year_df = pd.read_csv(f'year_{year}.csv')
-        year_df['CRASH TIME'] = pd.to_datetime(year_df['CRASH TIME'])
-        year_df_dict[year] = year_df
-    cleaned_df = pd.read_csv('cleaned_analytics_data.csv')
-    cleaned_df['CRASH TIME'] = pd.to_datetime(cleaned_df['CRASH TIME'])
-    return cleaned_df, year_df_dict
+    finish_pending_append()
+    years = [year for year in saved_years() if year >= FIRST_YEAR] if only_years else None
+    cleaned_df = apply_schema(load_cleaned_data(years, columns=columns), report=report)
+    if 'CRASH TIME' in cleaned_df:
+        add_time_columns(cleaned_df)
+    set_years(discover_years(cleaned_df))
+    return cleaned_df, split_by_year(cleaned_df)
 
 
-def read_data(set_location=False, save_cleaned=False, save_years=False):
+@profiled(category='clean')
+def clean_collision_df(collision_df):
     """
-    Read and clean the data for most use cases.
-    Additional cleaning needed for type of collision and quantizing values.
+    Clean the raw collision data for most use cases.
+    Works the same on the whole data file or on a chunk of it.
     """
-    collision_df = pd.read_csv(MOTOR_VEHICLE_COLLISIONS_CSV)
-    # columns to keep
-    columns = ['CRASH DATE', 'CRASH TIME', 'BOROUGH', 'LATITUDE', 'LONGITUDE', 'NUMBER OF PERSONS INJURED', 'NUMBER OF PERSONS KILLED', 'NUMBER OF PEDESTRIANS INJURED',
-            'NUMBER OF PEDESTRIANS KILLED', 'NUMBER OF CYCLIST INJURED', 'NUMBER OF CYCLIST KILLED', 'NUMBER OF MOTORIST INJURED', 'NUMBER OF MOTORIST KILLED']
-    collision_df = collision_df[columns].copy()
+    collision_df = collision_df[ANALYTICS_COLUMNS].copy()
 
     # Combine crash date and crash time into datetime
-    collision_df['CRASH TIME'] = pd.to_datetime(collision_df['CRASH DATE'] + ' ' + collision_df['CRASH TIME'], format='%m/%d/%Y %H:%M')
+    with profile_stage('to_datetime', category='clean', rows=len(collision_df)):
+        collision_df['CRASH TIME'] = pd.to_datetime(collision_df['CRASH DATE'] + ' ' + collision_df['CRASH TIME'], format='%m/%d/%Y %H:%M')
     del collision_df['CRASH DATE']
 
     # fill NaN lat and long with 0 to treat 0 and NaN the same
@@ -180,143 +365,265 @@ def read_data(set_location=False, save_cleaned=False, save_years=False):
     within_long = (MIN_LONGITUDE < cleaned_df['LONGITUDE']) & (cleaned_df['LONGITUDE'] < MAX_LONGITUDE)
     # these records should have borough labels and should not be thrown out as we handled that before
     no_lat_long = ((cleaned_df['LATITUDE'] == 0) & (cleaned_df['LATITUDE'] == 0))
-    cleaned_df = cleaned_df[(within_lat & within_long) | no_lat_long]
+    return cleaned_df[(within_lat & within_long) | no_lat_long]
+
+
+@profiled(category='read', rows='result')
+def read_data(set_location=False, save_cleaned=False, save_years=False, chunk_size=None, report=False):
+    """
+    Read and clean the data for most use cases.
+    Additional cleaning needed for type of collision and quantizing values.
+    Optionally read and clean chunk_size rows at a time to lower peak memory.
+    Columns are converted to ANALYTICS_SCHEMA, set report to print the memory saved.
+    YEARS becomes the years of the cleaned data.
+    Saving the cleaned data or the years both save the year partitioned dataset read by load_from_saved,
+    along with the count cube of the cleaned data and the high water mark append_new_data continues from.
+    """
+    save = save_cleaned or save_years
+    # the collision ids are only needed for the high water mark of the saved data
+    columns, dtypes = (INGEST_COLUMNS, INGEST_DTYPES) if save else (ANALYTICS_COLUMNS, ANALYTICS_DTYPES)
+    mark = None
+    if chunk_size is None:
+        with profile_stage('read_csv', category='read') as stage:
+            collision_df = pd.read_csv(MOTOR_VEHICLE_COLLISIONS_CSV, usecols=columns, dtype=dtypes)
+            stage.rows = len(collision_df)
+        cleaned_df = clean_collision_df(collision_df)
+        if save:
+            mark = high_water_mark(collision_df)
+    else:
+        cleaned_chunks = []
+        for chunk in pd.read_csv(MOTOR_VEHICLE_COLLISIONS_CSV, usecols=columns, dtype=dtypes, chunksize=chunk_size):
+            cleaned_chunks.append(clean_collision_df(chunk))
+            if save:
+                mark = high_water_mark(chunk, mark)
+        cleaned_df = pd.concat(cleaned_chunks)
+
+    cleaned_df = apply_schema(cleaned_df, report=report)
 
     # save and output
-    year_df_dict = {}
-    for year in YEARS:
-        year_df = df_filter_by(cleaned_df, 'year', year)
-        if save_years:
-            year_df.to_csv(f'year_{year}.csv')
-        year_df_dict[year] = year_df
-    if save_cleaned:
-        cleaned_df.to_csv('cleaned_analytics_data.csv')
-    return cleaned_df, year_df_dict
+    if save:
+        save_cleaned_data(cleaned_df, high_water_mark=mark)
+        build_count_cube(cleaned_df, BOROUGH_COORDS.keys()).save()
+    add_time_columns(cleaned_df)
+    set_years(discover_years(cleaned_df))
+    return cleaned_df, split_by_year(cleaned_df)
 
 
-def query_accidents_by_value_and_year(cleaned_df, column_name, column_dict, print_step=False):
+def read_csv_tail(csv_path, start, usecols=INGEST_COLUMNS, dtype=INGEST_DTYPES):
+    """
+    Rows of csv_path after its first start bytes, parsed with the header of the file.
+    The first start bytes have to hold the header and end with a row, None is returned when they do not.
+    """
+    if start <= 0:
+        return None
+    header = pd.read_csv(csv_path, nrows=0).columns.tolist()
+    with open(csv_path, 'rb') as file:
+        file.seek(start - 1)
+        if file.read(1) != b'\n':
+            return None
+        if not file.read(1):
+            return pd.read_csv(csv_path, nrows=0, usecols=usecols, dtype=dtype)
+        file.seek(start)
+        return pd.read_csv(file, header=None, names=header, usecols=usecols, dtype=dtype)
+
+
+def read_new_collisions(csv_path, mark, start=None):
+    """
+    Raw collisions of csv_path newer than the high water mark. With start, the size of csv_path when the
+    saved data was cleaned from it, only the rows after it are parsed. Otherwise csv_path is scanned
+    APPEND_CHUNK_SIZE rows at a time, so only the new collisions are held at once.
+    """
+    def newer(collision_df):
+        if mark['collision_id'] is None:
+            return collision_df
+        return collision_df[collision_df[COLLISION_ID_COLUMN] > mark['collision_id']]
+
+    tail_df = None if start is None else read_csv_tail(csv_path, start)
+    if tail_df is not None:
+        return newer(tail_df)
+    with pd.read_csv(csv_path, usecols=INGEST_COLUMNS, dtype=INGEST_DTYPES, chunksize=APPEND_CHUNK_SIZE) as reader:
+        new_chunks = [newer(chunk) for chunk in reader]
+    if not new_chunks:
+        return pd.read_csv(csv_path, nrows=0, usecols=INGEST_COLUMNS, dtype=INGEST_DTYPES)
+    return pd.concat(new_chunks)
+
+
+def finish_pending_append():
+    """
+    Complete or undo an append stopped part way. The high water mark is saved last in one replace,
+    once it moved the staged count cube replaces the saved one, before that the appended files are removed.
+    Either way the saved data, count cube and mark agree again, so the collisions are appended once.
+    """
+    pending = read_pending_append()
+    if pending is None:
+        return
+    if read_high_water_mark() == pending['mark']:
+        if os.path.isfile(STAGED_COUNT_CUBE_FILE):
+            os.replace(STAGED_COUNT_CUBE_FILE, COUNT_CUBE_FILE)
+    else:
+        remove_appended(pending['name'])
+        if os.path.isfile(STAGED_COUNT_CUBE_FILE):
+            os.remove(STAGED_COUNT_CUBE_FILE)
+    clear_pending_append()
+
+
+@profiled(category='read', rows='result')
+def append_new_data(csv_path=MOTOR_VEHICLE_COLLISIONS_CSV, print_step=False, start=None):
+    """
+    Clean only the collisions of csv_path newer than the high water mark of the saved data and append them
+    to the partitions of their years, counting them into the saved count cube.
+    csv_path can be the whole Dataset downloaded again or only the collisions published since the last run,
+    the saved rows are never read again. Pass start, the size the Dataset had when the saved data was cleaned
+    from it, to only parse the collisions after it. Returns the appended cleaned rows.
+    The append commits when the high water mark is saved, an append stopped before is undone by the next one.
+    """
+    finish_pending_append()
+    mark = read_high_water_mark()
+    if mark is None:
+        raise FileNotFoundError(f'no high water mark saved in {CLEANED_DATA_DIR}, run read_data(save_cleaned=True) first')
+    collision_df = read_new_collisions(csv_path, mark, start=start)
+    # index the new rows after the saved ones so they load last
+    collision_df = collision_df.set_axis(pd.RangeIndex(mark['next_index'], mark['next_index'] + len(collision_df)))
+    cleaned_df = apply_schema(clean_collision_df(collision_df))
+
+    new_mark = high_water_mark(collision_df, mark)
+    name = f'append-{mark["next_index"]}'
+    write_pending_append(name, new_mark)
+    try:
+        append_cleaned_data(cleaned_df, name=name)
+        cube = load_count_cube()
+        if cube is not None:
+            cube.add(cleaned_df)
+            cube.save(STAGED_COUNT_CUBE_FILE)
+    except BaseException:
+        # the mark has not moved, so the files appended so far are removed
+        finish_pending_append()
+        raise
+    write_high_water_mark(new_mark)
+    finish_pending_append()
+    if print_step:
+        print(f'{len(collision_df)} new collisions, {len(cleaned_df)} appended after cleaning')
+    return cleaned_df
+
+
+def aggregation_keys(cleaned_df):
+    """
+    Derive the integer year, month, day, hour and borough keys of each row for aggregations.
+    """
+    return AggregationKeys(cleaned_df, BOROUGH_COORDS.keys())
+
+
+def accident_counter(cleaned_df, cube=None):
+    """
+    Counts accidents by dimensions from the count cube when given, otherwise from the rows of cleaned_df.
+    """
+    return cube if cube is not None else aggregation_keys(cleaned_df)
+
+
+def load_cube(cleaned_df):
+    """
+    Load the count cube saved alongside the cleaned data, or build it from cleaned_df when there is none.
+    """
+    cube = load_count_cube()
+    if cube is None:
+        cube = build_count_cube(cleaned_df, BOROUGH_COORDS.keys())
+    return cube
+
+
+def year_nested_counts(year, year_df, outer_dimension, outer_domain, inner_dimension, inner_domain):
+    """
+    Dictionary of outer value to the list of counts of each inner value within a single year's rows,
+    the same as one year of the query functions' results.
+    """
+    counts = aggregation_keys(year_df).count_by([(outer_dimension, outer_domain), (inner_dimension, inner_domain)])
+    return nested_counts(counts[np.newaxis], [year], outer_domain)[year]
+
+
+@profiled(category='query')
+def query_accidents_by_value_and_year(cleaned_df, column_name, column_dict, print_step=False, cube=None):
     """
     Parses dataframe and returns a dictionary indicating accidents in each month by year.
+    Counts come from the count cube instead when one is given.
     """
+    # handle possibility of column dict being a dict
+    column_dict_keys = column_dict
+    if isinstance(column_dict_keys, dict):
+        column_dict_keys = column_dict_keys.keys()
+    column_dict_keys = list(column_dict_keys)
+
+    # count accidents of every year and column value in a single pass
+    year_value_counts = accident_counter(cleaned_df, cube).count_by([('year', YEARS), (column_name, column_dict_keys)]).tolist()
+
     # creates a dictionary where each key maps to a list
     counts = defaultdict(list)
-    for year in YEARS:
+    for year_index, year in enumerate(YEARS):
         if print_step:
             print('Showing year:', year)
-        # remove rows from df that don't contain year in year column
-        year_df = df_filter_by(cleaned_df, 'year', year)
-
-        # handle possibility of column dict being a dict
-        column_dict_keys = column_dict
-        if isinstance(column_dict_keys, dict):
-            column_dict_keys = column_dict_keys.keys()
-
-        for column_value in column_dict_keys:
-            # remove rows from df that don't contain column_value in column_name column
-            column_value_df = df_filter_by(year_df, column_name, column_value)
+        for value_index, column_value in enumerate(column_dict_keys):
             if print_step:
-                print('   ', column_dict[column_value] if(isinstance(column_dict, dict)) else column_value, column_value_df.shape[0])
-            # append number of remaining rows in month_df,
+                print('   ', column_dict[column_value] if(isinstance(column_dict, dict)) else column_value, year_value_counts[year_index][value_index])
             # each index of counts[value] correlates with year
-            counts[column_dict[column_value] if(isinstance(column_dict, dict)) else column_value].append(column_value_df.shape[0])
+            counts[column_dict[column_value] if(isinstance(column_dict, dict)) else column_value].append(year_value_counts[year_index][value_index])
 
     # return dictionary of mapping of values to a list of accident counts by year
     return counts
 
 
-def query_accidents_by_weekday_and_time_and_year(cleaned_df, print_step=False):
+@profiled(category='query')
+def query_accidents_by_weekday_and_time_and_year(cleaned_df, print_step=False, cube=None):
     """
     Parses dataframe and returns a dictionary indicating accidents each hour
     for each day of the week in each year.
     """
-    counts = defaultdict(lambda: defaultdict(list))
-    for year in YEARS:
-        if print_step:
-            print('Showing year:', year)
-        year_df = df_filter_by(cleaned_df, 'year', year)
-        for hour in HOURS:
-            if print_step:
-                print('   ', hour)
-            # quantize times by top of the hour
-            hour_df = df_filter_by(year_df, 'hour', hour)
-            for day in DAYS:
-                day_df = df_filter_by(hour_df, 'day', day)
-                if print_step:
-                    print('       ', day, day_df.shape[0])
-                counts[year][day].append(day_df.shape[0])
-    return counts
+    counts = accident_counter(cleaned_df, cube).count_by([('year', YEARS), ('day', DAYS), ('hour', HOURS)])
+    return nested_counts(counts, YEARS, DAYS, print_step=print_step)
 
 
-def query_accidents_by_borough_and_month_and_year(cleaned_df, print_step=False):
+@profiled(category='query')
+def query_accidents_by_borough_and_month_and_year(cleaned_df, print_step=False, cube=None):
     """
     Parses dataframe and returns a dictionary indicating accidents by borough
     for each month in each year.
     """
-    counts = defaultdict(lambda: defaultdict(list))
-    for year in YEARS:
-        if print_step:
-            print('Showing year:', year)
-        year_df = df_filter_by(cleaned_df, 'year', year)
-        for borough in BOROUGH_COORDS.keys():
-            if print_step:
-                print('   ', borough)
-            borough_df = df_filter_by(year_df, 'borough', borough)
-            for month in MONTHS.keys():
-                month_df = df_filter_by(borough_df, 'month', month)
-                if print_step:
-                    print('       ', MONTHS[month], month_df.shape[0])
-                counts[year][borough].append(month_df.shape[0])
-    return counts
+    counts = accident_counter(cleaned_df, cube).count_by([('year', YEARS), ('borough', BOROUGH_COORDS.keys()), ('month', MONTHS.keys())])
+    return nested_counts(counts, YEARS, BOROUGH_COORDS.keys(), print_step=print_step)
 
 
-def query_accidents_by_borough_and_day_and_year(cleaned_df, print_step=False):
+@profiled(category='query')
+def query_accidents_by_borough_and_day_and_year(cleaned_df, print_step=False, cube=None):
     """
     Parses dataframe and returns a dictionary indicating accidents by borough
     for each day of the week in each year.
     """
-    counts = defaultdict(lambda: defaultdict(list))
-    for year in YEARS:
-        if print_step:
-            print('Showing year:', year)
-        year_df = df_filter_by(cleaned_df, 'year', year)
-        for borough in BOROUGH_COORDS.keys():
-            if print_step:
-                print('   ', borough)
-            borough_df = df_filter_by(year_df, 'borough', borough)
-            for day in DAYS:
-                day_df = df_filter_by(borough_df, 'day', day)
-                if print_step:
-                    print('       ', day, day_df.shape[0])
-                counts[year][borough].append(day_df.shape[0])
-    return counts
+    counts = accident_counter(cleaned_df, cube).count_by([('year', YEARS), ('borough', BOROUGH_COORDS.keys()), ('day', DAYS)])
+    return nested_counts(counts, YEARS, BOROUGH_COORDS.keys(), print_step=print_step)
 
 
-def query_accidents_by_borough_and_hour_and_year(cleaned_df, print_step=False):
+@profiled(category='query')
+def query_accidents_by_borough_and_hour_and_year(cleaned_df, print_step=False, cube=None):
     """
     Parses dataframe and returns a dictionary indicating accidents by borough
     for each hour of the day in each year.
     """
-    counts = defaultdict(lambda: defaultdict(list))
-    for year in YEARS:
-        if print_step:
-            print('Showing year:', year)
-        year_df = df_filter_by(cleaned_df, 'year', year)
-        for borough in BOROUGH_COORDS.keys():
-            if print_step:
-                print('   ', borough)
-            borough_df = df_filter_by(year_df, 'borough', borough)
-            for hour in HOURS:
-                # quantize times by top of the hour
-                hour_df = df_filter_by(borough_df, 'hour', hour)
-                if print_step:
-                    print('       ', hour, hour_df.shape[0])
-                counts[year][borough].append(hour_df.shape[0])
-    return counts
+    counts = accident_counter(cleaned_df, cube).count_by([('year', YEARS), ('borough', BOROUGH_COORDS.keys()), ('hour', HOURS)])
+    return nested_counts(counts, YEARS, BOROUGH_COORDS.keys(), print_step=print_step)
+
+
+def bar_series(data, series=None):
+    """
+    Labels and values of each series of bars, from a dictionary of label to values
+    or from a matrix with one row of values per series labelled by series.
+    """
+    if isinstance(data, np.ndarray):
+        labels = list(range(len(data))) if series is None else list(series)
+        return labels, list(data)
+    return list(data.keys()), [np.asarray(values) for values in data.values()]
 
 
-def plot_multiple_bar_by_metric(data, metric, title='', xlabel='', ylabel='', colors=None, total_width=0.8, single_width=1, legend=True):
+def plot_multiple_bar_by_metric(data, metric, title='', xlabel='', ylabel='', colors=None, total_width=0.8, single_width=1, legend=True, series=None):
     """
     Dynamically generate multiple bar graph/histogram
+    data is a dictionary of series label to values or a matrix with one row per series, labelled by series.
     """
     _, ax = plt.subplots()
     # default bar and legend colors
@@ -324,27 +631,27 @@ def plot_multiple_bar_by_metric(data, metric, title='', xlabel='', ylabel='', co
         colors = plt.rcParams['axes.prop_cycle'].by_key()['color']
         colors.append(u'slateblue')
         colors.append(u'lightgreen')
-    n_bars = len(data)
+    labels, series_values = bar_series(data, series)
+    n_bars = len(series_values)
     bar_width = total_width / n_bars
     # legend bars
     bars = []
-    for i, (_, values) in enumerate(data.items()):
+    for i, values in enumerate(series_values):
         # where to reposition bar from x
         x_offset = (i - n_bars / 2) * bar_width + bar_width / 2
 
-        # x and y position for each bar
-        for x, y in enumerate(values):
-            bar = ax.bar(x + x_offset, y, width=bar_width * single_width, color=colors[i % len(colors)])
+        # all bars of the series at once
+        bar = ax.bar(np.arange(len(values)) + x_offset, values, width=bar_width * single_width, color=colors[i % len(colors)])
 
         bars.append(bar[0])
     # add title, labels, legend
     if legend:
-        ax.legend(bars, data.keys())
+        ax.legend(bars, labels)
     plt.xticks(range(len(metric)), metric)
     plt.title(title)
     plt.xlabel(xlabel)
     plt.ylabel(ylabel)
-    plt.show()
+    show_figure()
 
 
 def plot_density_by_metric(df, metric, metric_name, hue, hue_order=[], title='', xlabel='', ylabel='', colors=None, legend=True):
@@ -365,34 +672,35 @@ def plot_density_by_metric(df, metric, metric_name, hue, hue_order=[], title='',
     plt.title(title)
     plt.xlabel(xlabel)
     plt.ylabel(ylabel)
-    plt.show()
+    show_figure()
 
 
-def subplot_multiple_bar_by_metric(ax, data, metric, title='', xlabel='', ylabel='', y_max=0, y_scale=None, total_width=0.8, single_width=1, legend=True):
+def subplot_multiple_bar_by_metric(ax, data, metric, title='', xlabel='', ylabel='', y_max=0, y_scale=None, total_width=0.8, single_width=1, legend=True, series=None):
     """
     Dynamically generate multiple bar graph/histogram
+    data is a dictionary of series label to values or a matrix with one row per series, labelled by series.
     """
     # default bar and legend colors
     colors = plt.rcParams['axes.prop_cycle'].by_key()['color']
     colors.append(u'slateblue')
     colors.append(u'lightgreen')
-    n_bars = len(data)
+    labels, series_values = bar_series(data, series)
+    n_bars = len(series_values)
     bar_width = total_width / n_bars
     # legend bars
     bars = []
-    for i, (_, values) in enumerate(data.items()):
+    for i, values in enumerate(series_values):
         # where to reposition bar from x
         x_offset = (i - n_bars / 2) * bar_width + bar_width / 2
 
-        # x and y position for each bar
-        for x, y in enumerate(values):
-            y_max = max(y_max, y)
-            bar = ax.bar(x + x_offset, y, width=bar_width * single_width, color=colors[i % len(colors)])
+        # all bars of the series at once
+        y_max = max(y_max, values.max())
+        bar = ax.bar(np.arange(len(values)) + x_offset, values, width=bar_width * single_width, color=colors[i % len(colors)])
 
         bars.append(bar[0])
     # add title, labels, legend
     if legend:
-        ax.legend(bars, data.keys())
+        ax.legend(bars, labels)
     plt.xticks(range(len(metric)), metric)
     if y_scale is not None:
         plt.yticks(np.arange(0, y_max, y_scale))
@@ -401,45 +709,153 @@ def subplot_multiple_bar_by_metric(ax, data, metric, title='', xlabel='', ylabel
     plt.ylabel(ylabel)
 
 
-def plot_basemap_scatter(cleaned_df):
+def plot_year_pages(data, metric, title='', xlabel='', ylabel='', y_max=0, y_scale=None, years=None):
+    """
+    Plot the data of each year, by default of YEARS, side by side on the same scale.
+    Each figure holds SUBPLOT_ROWS x SUBPLOT_COLUMNS years and the remaining years continue on the next figure.
+    title is formatted with the year of each plot.
+    """
+    years = list(YEARS if years is None else years)
+    per_page = SUBPLOT_ROWS * SUBPLOT_COLUMNS
+    for start in range(0, len(years), per_page):
+        page = years[start:start + per_page]
+        fig = plt.figure()
+        for index, year in enumerate(page):
+            ax = fig.add_subplot(SUBPLOT_ROWS, SUBPLOT_COLUMNS, index + 1)
+            subplot_multiple_bar_by_metric(ax, data[year], metric, title=title.format(year=year), xlabel=xlabel, ylabel=ylabel,
+                                           y_max=y_max, y_scale=y_scale, legend=index == 0)
+        show_figure(f'side_by_side_{page[0]}' if len(page) == 1 else f'side_by_side_{page[0]}-{page[-1]}')
+
+
+def plot_basemap_scatter(cleaned_df, rasterize=True, shading='eq_hist', cmap='Reds'):
     """
-    Scatterplot of latitude and longitude. Does not display density of points well.
+    Scatterplot of latitude and longitude.
+    By default the points are counted into an image of one bin per pixel of the map, shaded by shading
+    and drawn as a single image, which shows their density and takes the same time for any number of points.
+    Without rasterize every point is drawn as a marker, which does not display density of points well.
     """
     latlon = cleaned_df.loc[cleaned_df['LONGITUDE'] != 0, ['LATITUDE', 'LONGITUDE']].to_numpy()
 
-    map = Basemap(llcrnrlon=MIN_LONGITUDE,
-                  llcrnrlat=MIN_LATITUDE,
-                  urcrnrlon=MAX_LONGITUDE,
-                  urcrnrlat=MAX_LATITUDE,
-                  ellps='WGS84',
-                  resolution='f',
-                  area_thresh=0.6)
+    # the full resolution coastlines are only read the first time
+    map = MAP_CACHE.basemap(llcrnrlon=MIN_LONGITUDE,
+                            llcrnrlat=MIN_LATITUDE,
+                            urcrnrlon=MAX_LONGITUDE,
+                            urcrnrlat=MAX_LATITUDE,
+                            ellps='WGS84',
+                            resolution='f',
+                            area_thresh=0.6)
     map.drawcoastlines(color='gray', zorder=2)
     map.drawcountries(color='gray', zorder=2)
     map.fillcontinents(color='#FFEEDD')
     map.drawstates(color='gray', zorder=2)
     map.drawmapboundary(fill_color='#DDEEFF')
 
-    map.scatter(latlon[:, 1], latlon[:, 0], marker='o', c='red', zorder=3, latlon=True)
-    plt.show()
+    if rasterize:
+        # one bin per pixel of the axes the map is drawn on
+        bbox = plt.gca().get_window_extent()
+        width, height = max(int(round(bbox.width)), 1), max(int(round(bbox.height)), 1)
+        x, y = map(latlon[:, 1], latlon[:, 0])
+        counts = count_image(x, y, (map.llcrnrx, map.urcrnrx, map.llcrnry, map.urcrnry), width, height)
+        map.imshow(shade_counts(counts, shading), origin='lower', cmap=cmap, interpolation='nearest', zorder=3)
+    else:
+        map.scatter(latlon[:, 1], latlon[:, 0], marker='o', c='red', zorder=3, latlon=True)
+    show_figure()
 
 
-def density_estimation(lon, lat):
+@profiled(category='density')
+def density_estimation(lon, lat, method='exact', extent=None, resolution=DEFAULT_RESOLUTION, bandwidth='scott', cache=None):
     """
-    Compute the kernel density of lat and long into a third dimension using a Gaussian
+    Compute the kernel density of lat and long into a third dimension using a Gaussian.
+    The 'fft' method bins the points onto the grid and convolves them with the same kernel,
+    it takes milliseconds instead of evaluating the kernel of every point at every grid point.
+    Pass a fixed extent, such as the borough's BOROUGH_EXTENT, so densities of different years
+    share the same grid, otherwise the grid spans the points. bandwidth is 'scott', 'silverman',
+    'adaptive' or a bandwidth factor. With a DensityCache the surface is loaded from it when
+    the same coordinates were estimated with the same settings before.
     """
-    lon_values, lat_values = np.mgrid[lon.min():lon.max():100j, lat.min():lat.max():100j]
-    positions = np.vstack([lon_values.ravel(), lat_values.ravel()])
-    # compute the kernel from latitude and longitude values
-    kernel = gaussian_kde(np.vstack([lon, lat]))
-    density_values = np.reshape(kernel(positions).T, lon_values.shape)
+    if method not in DENSITY_METHODS:
+        raise ValueError(f'method must be one of {DENSITY_METHODS}, got {method!r}')
+    if extent is None:
+        extent = (lon.min(), lon.max(), lat.min(), lat.max())
+    lon_grid, lat_grid = density_grid(extent, resolution)
+    lon_values, lat_values = np.meshgrid(lon_grid, lat_grid, indexing='ij')
+    estimate = binned_kde if method == 'fft' else exact_kde
+    if cache is None:
+        density_values = estimate(lon, lat, lon_grid, lat_grid, bandwidth=bandwidth)
+    else:
+        density_values = cache.surface(lon, lat, lambda: estimate(lon, lat, lon_grid, lat_grid, bandwidth=bandwidth),
+                                       method=method, extent=[float(value) for value in extent],
+                                       resolution=resolution, bandwidth=bandwidth)
     return lon_values, lat_values, density_values
 
 
-def plot_basemap_heat_density(borough_df, borough, xprecision=3, yprecision=3, num_levels=11, cmap='Reds', colorbar=True, title=""):
+def spatial_indexes(year_df_dict, years=None):
+    """
+    SpatialGridIndex of the coordinates of each year's dataframe, by default of every year,
+    built once so every borough of a year is looked up in the same index.
+    """
+    # spatial_index takes the bounds of NYC from this module, so it is imported once this module is loaded
+    from spatial_index import build_spatial_index
+    return {year: build_spatial_index(year_df_dict[year]) for year in (year_df_dict.keys() if years is None else years)}
+
+
+def borough_accidents(year_df, borough, index=None):
+    """
+    Accidents of year_df in the borough, only keeping coordinates within its bounds.
+    With a SpatialGridIndex built over year_df only the boroughs of the rows within the bounds are compared,
+    and the accidents are taken from year_df at once.
+    """
+    c1, c2 = BOROUGH_BOUNDS[borough]
+    if index is not None:
+        rows = index.within_box(c1, c2)
+        return year_df.iloc[rows[(year_df['BOROUGH'].iloc[rows] == borough).to_numpy()]]
+    return df_between_coords(df_filter_by(year_df, 'borough', borough), c1, c2)
+
+
+def borough_coordinates(year_df, borough, index=None):
+    """
+    Longitude and latitude of the accidents in the borough, only keeping coordinates within its bounds.
+    With a SpatialGridIndex built over year_df only the rows within the bounds are filtered by borough.
+    """
+    borough_df = borough_accidents(year_df, borough, index=index)
+    return borough_df['LONGITUDE'].to_numpy(dtype=np.float64), borough_df['LATITUDE'].to_numpy(dtype=np.float64)
+
+
+def borough_density_surfaces(year_df_dict, borough, method='fft', resolution=DEFAULT_RESOLUTION, bandwidth='scott', cache=None,
+                             indexes=None):
+    """
+    Accident density of the borough for every year on the borough's fixed grid, so years can be
+    compared cell by cell. Returns the grid and an array of densities indexed by year position.
+    Pass the spatial_indexes of year_df_dict when computing the surfaces of several boroughs.
+    """
+    indexes = spatial_indexes(year_df_dict) if indexes is None else indexes
+    densities = []
+    for year in year_df_dict.keys():
+        lon, lat = borough_coordinates(year_df_dict[year], borough, index=indexes[year])
+        lon_values, lat_values, density_values = density_estimation(lon, lat, method=method, extent=BOROUGH_EXTENT[borough],
+                                                                    resolution=resolution, bandwidth=bandwidth, cache=cache)
+        densities.append(density_values)
+    return lon_values, lat_values, np.stack(densities)
+
+
+def borough_basemap(borough):
+    """
+    Basemap of the borough's extent and the decoded image of the borough map, built once per process.
+    """
+    llcrnrlon, urcrnrlon, llcrnrlat, urcrnrlat = BOROUGH_EXTENT[borough]
+    map = MAP_CACHE.basemap(llcrnrlon=llcrnrlon,
+                            llcrnrlat=llcrnrlat,
+                            urcrnrlon=urcrnrlon,
+                            urcrnrlat=urcrnrlat)
+    return map, MAP_CACHE.background(f'{borough.lower()}.png')
+
+
+def plot_basemap_heat_density(borough_df, borough, xprecision=3, yprecision=3, num_levels=11, cmap='Reds', colorbar=True, title="", method='fft',
+                              resolution=DEFAULT_RESOLUTION, bandwidth='scott', cache=None, save_path=None):
     """
     Generate the heatmap density contours for the given data that has already been
     filtered to only contain the borough and only valid coordinates in that borough.
+    The figure is saved to save_path and closed when one is given, otherwise shown or exported.
     """
     _, ax = plt.subplots()
     latlon = borough_df[['LATITUDE', 'LONGITUDE']].to_numpy()
@@ -449,16 +865,13 @@ def plot_basemap_heat_density(borough_df, borough, xprecision=3, yprecision=3, n
     lat = latlon[:, 0]
 
     # perform kernel density estimation on longitude, latitude
-    lon_values, lat_values, density_values = density_estimation(lon, lat)
+    lon_values, lat_values, density_values = density_estimation(lon, lat, method=method, extent=BOROUGH_EXTENT[borough],
+                                                                resolution=resolution, bandwidth=bandwidth, cache=cache)
 
     extent = BOROUGH_EXTENT[borough]
     llcrnrlon, urcrnrlon, llcrnrlat, urcrnrlat = extent
     # use image of borough map as background
-    map = Basemap(llcrnrlon=llcrnrlon,
-                  llcrnrlat=llcrnrlat,
-                  urcrnrlon=urcrnrlon,
-                  urcrnrlat=urcrnrlat)
-    im = Image.open(f'{borough.lower()}.png')
+    map, im = borough_basemap(borough)
     map.imshow(im, origin='upper', alpha=0.85, extent=extent)
 
     # add axis settings
@@ -468,8 +881,9 @@ def plot_basemap_heat_density(borough_df, borough, xprecision=3, yprecision=3, n
     ax.set_ylim(llcrnrlat, urcrnrlat)
     ax.set_xticks(xlabels)
     ax.set_yticks(ylabels)
-    map.drawmeridians(xlabels, labels=[1,0,0,0], linewidth=0)
-    map.drawparallels(ylabels, labels=[0,0,0,1], linewidth=0)
+    # no dashes, zero width dashed lines cannot be drawn when the figure is saved
+    map.drawmeridians(xlabels, labels=[1,0,0,0], linewidth=0, dashes=[])
+    map.drawparallels(ylabels, labels=[0,0,0,1], linewidth=0, dashes=[])
 
     # generate density contours
     levels = np.linspace(0, density_values.max(), num_levels)
@@ -482,99 +896,150 @@ def plot_basemap_heat_density(borough_df, borough, xprecision=3, yprecision=3, n
 
     plt.title(title)
 
-    plt.show()
+    if save_path is None:
+        show_figure()
+    else:
+        plt.savefig(save_path)
+        plt.close()
+
+
+def use_agg_backend():
+    """
+    Render with the non-interactive Agg backend, used to start each rendering process.
+    """
+    plt.switch_backend('Agg')
+
+
+def start_render_process(boroughs, map_cache_dir):
+    """
+    Start a rendering process: render with Agg and build the maps of the boroughs before its first job.
+    Maps built by the parent are inherited under fork, otherwise they are built here, or loaded from map_cache_dir.
+    """
+    use_agg_backend()
+    MAP_CACHE.cache_dir = map_cache_dir
+    for borough in boroughs:
+        borough_basemap(borough)
+
+
+def render_heat_density(job):
+    """
+    Render and save a single heat density map, a job is the borough dataframe, the borough,
+    the path to save to and the keyword arguments of plot_basemap_heat_density.
+    """
+    borough_df, borough, save_path, kwargs = job
+    plot_basemap_heat_density(borough_df, borough, save_path=save_path, **kwargs)
+    return save_path
+
+
+def heat_density_path(output_dir, borough, year):
+    """
+    File the heat density map of a borough and year is saved to.
+    """
+    return os.path.join(output_dir, f"heat_density_{borough.lower().replace(' ', '_')}_{year}.png")
+
 
+def render_heat_densities(jobs, workers=None, mp_context=None):
+    """
+    Render the heat density map jobs in a pool of workers processes, all cores by default.
+    Each map is saved to its own file so the output does not depend on the order the jobs finish in,
+    and the paths are returned in the order of the jobs.
+    mp_context is the multiprocessing context the processes are started with, the default start method by default.
+    """
+    if workers == 1:
+        return [render_heat_density(job) for job in jobs]
+    boroughs = sorted({job[1] for job in jobs})
+    # processes started with fork inherit the maps built here, the others build them in start_render_process
+    for borough in boroughs:
+        borough_basemap(borough)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=start_render_process,
+                             initargs=(boroughs, MAP_CACHE.cache_dir)) as executor:
+        return list(executor.map(render_heat_density, jobs))
 
-def visualize_one(cleaned_df):
+
+@profiled(category='visualize')
+def visualize_one(cleaned_df, cube=None):
     """
     Filter the dataframe to get the data for plotting a histogram and density plot by borough and year.
     """
     print('Question 1')
-    data = query_accidents_by_value_and_year(cleaned_df, 'borough', BOROUGH_COORDS)
-    plot_multiple_bar_by_metric(data, YEARS, title='Accidents by Borough from 2013 to 2020', xlabel='Year', ylabel='Accidents')
-    metric = [datetime(2013, 1, 1), datetime(2021, 1, 1)]
-    plot_density_by_metric(cleaned_df, metric, 'CRASH TIME', 'BOROUGH', hue_order=BOROUGH_COORDS.keys(), title='Accident Density by Borough from 2013 to 2020', xlabel='Year', ylabel='Accident Density')
+    export_question(1)
+    data = query_accidents_by_value_and_year(cleaned_df, 'borough', BOROUGH_COORDS, cube=cube)
+    plot_multiple_bar_by_metric(data, YEARS, title=f'Accidents by Borough from {YEARS[0]} to {YEARS[-1]}', xlabel='Year', ylabel='Accidents')
+    metric = [datetime(YEARS[0], 1, 1), datetime(YEARS[-1] + 1, 1, 1)]
+    plot_density_by_metric(cleaned_df, metric, 'CRASH TIME', 'BOROUGH', hue_order=BOROUGH_COORDS.keys(), title=f'Accident Density by Borough from {YEARS[0]} to {YEARS[-1]}', xlabel='Year', ylabel='Accident Density')
 
 
-def visualize_two(cleaned_df):
+@profiled(category='visualize')
+def visualize_two(cleaned_df, cube=None):
     """
     Filter the dataframe to get the data for plotting a histogram by month and year.
     """
     print('Question 2')
-    data = query_accidents_by_value_and_year(cleaned_df, 'month', MONTHS)
-    plot_multiple_bar_by_metric(data, YEARS, title='Accidents by Month from 2013 to 2020', xlabel='Year', ylabel='Accidents')
+    export_question(2)
+    data = query_accidents_by_value_and_year(cleaned_df, 'month', MONTHS, cube=cube)
+    plot_multiple_bar_by_metric(data, YEARS, title=f'Accidents by Month from {YEARS[0]} to {YEARS[-1]}', xlabel='Year', ylabel='Accidents')
 
 
-def visualize_four(cleaned_df):
+@profiled(category='visualize')
+def visualize_four(cleaned_df, cube=None):
     """
     Filter the dataframe to get the data for plotting a histogram by by day of the week and year.
     """
     print('Question 4')
-    data = query_accidents_by_value_and_year(cleaned_df, 'day', DAYS)
-    plot_multiple_bar_by_metric(data, YEARS, title='Accidents by Day of the Week from 2013 to 2020', xlabel='Year', ylabel='Accidents')
+    export_question(4)
+    data = query_accidents_by_value_and_year(cleaned_df, 'day', DAYS, cube=cube)
+    plot_multiple_bar_by_metric(data, YEARS, title=f'Accidents by Day of the Week from {YEARS[0]} to {YEARS[-1]}', xlabel='Year', ylabel='Accidents')
 
 
-def visualize_five(cleaned_df, year_df_dict, subplot=False):
+@profiled(category='visualize')
+def visualize_five(cleaned_df, year_df_dict, subplot=False, cube=None, executor=None):
     """
     Set subplot to True for side-by-side and similarly scaled plots. Easier for comparisons.
     Otherwise plot each year individually.
+    During a batch export the yearly plots are rendered by the YearExecutor when one is given.
     """
     print('Question 5')
-    data = query_accidents_by_weekday_and_time_and_year(cleaned_df)
+    export_question(5)
+    data = query_accidents_by_weekday_and_time_and_year(cleaned_df, cube=cube)
 
     if subplot:
-        fig = plt.figure()
-        for index, year in enumerate(YEARS[:4]):
-            legend = index == 0
-            ax = fig.add_subplot(2, 2, index + 1)
-            subplot_multiple_bar_by_metric(ax, data[year], HOURS, title=f'Accidents by Hour each Day of the Week in {year}', xlabel='Hour', ylabel='Accidents', y_max=2800, y_scale=500, legend=legend)
-        plt.show()
+        plot_year_pages(data, HOURS, title='Accidents by Hour each Day of the Week in {year}', xlabel='Hour', ylabel='Accidents', y_max=2800, y_scale=500)
+    if executor is not None and active_exporter() is not None:
+        executor.render(plot_weekday_hours_year, years=YEARS)
+    else:
+        for year in YEARS:
+            plot_weekday_hours_year(year, year_df_dict[year], data[year])
 
-        fig = plt.figure()
-        for index, year in enumerate(YEARS[4:]):
-            legend = index == 0
-            ax = fig.add_subplot(2, 2, index + 1)
-            subplot_multiple_bar_by_metric(ax, data[year], HOURS, title=f'Accidents by Hour each Day of the Week in {year}', xlabel='Hour', ylabel='Accidents', y_max=2800, y_scale=500, legend=legend)
-        plt.show()
-    for year in YEARS:
-        plot_multiple_bar_by_metric(data[year], HOURS, title=f'Accidents by Hour each Day of the Week in {year}', xlabel='Hour', ylabel='Accidents')
-        year_df = year_df_dict[year]
-        # make a copy to overwrite columns for visualization
-        year_copy_df = year_df.copy()
-        year_copy_df['DAY'] = year_copy_df['CRASH TIME'].dt.day_name()
-        year_copy_df['CRASH TIME'] = year_copy_df['CRASH TIME'].dt.hour
-        cat_type = CategoricalDtype(categories=DAYS, ordered=True)
-        year_copy_df['DAY'] = year_copy_df['DAY'].astype(cat_type)
-        metric = [0, 23]
-        plot_density_by_metric(year_copy_df, metric, 'CRASH TIME', 'DAY', title=f'Accident Density by Hour each Day of the Week in {year}', xlabel='Hour', ylabel='Accident Density')
-
-
-def visualize_six(cleaned_df, year_df_dict, month=True, weekday=True, hour=True, subplot=False):
+
+def plot_weekday_hours_year(year, year_df, data=None):
+    """
+    Plot the accidents by hour each day of the week of a single year, counted from year_df when data is not given.
+    """
+    if data is None:
+        data = year_nested_counts(year, year_df, 'day', DAYS, 'hour', HOURS)
+    plot_multiple_bar_by_metric(data, HOURS, title=f'Accidents by Hour each Day of the Week in {year}', xlabel='Hour', ylabel='Accidents')
+    metric = [0, 23]
+    plot_density_by_metric(year_df, metric, 'HOUR', 'DAY', title=f'Accident Density by Hour each Day of the Week in {year}', xlabel='Hour', ylabel='Accident Density')
+
+
+@profiled(category='visualize')
+def visualize_six(cleaned_df, year_df_dict, month=True, weekday=True, hour=True, subplot=False, cube=None, executor=None):
     """
     Filter the dataframe to get the data for plotting histograms and density plots for each individual year
     by month, day of the week, and hour.
     Set subplot to True for side-by-side and similarly scaled plots. Easier for comparisons.
     Otherwise plot each year individually.
+    During a batch export the yearly hour plots are rendered by the YearExecutor when one is given.
     """
     print('Question 6')
+    export_question(6)
     if month:
         print('months')
-        data = query_accidents_by_borough_and_month_and_year(cleaned_df)
-        # plot 2013-2017 and 2018-2021 side by side
+        export_question('6/month')
+        data = query_accidents_by_borough_and_month_and_year(cleaned_df, cube=cube)
+        # plot the years side by side
         if subplot:
-            fig = plt.figure()
-            for index, year in enumerate(YEARS[:4]):
-                legend = index == 0
-                ax = fig.add_subplot(2, 2, index + 1)
-                subplot_multiple_bar_by_metric(ax, data[year], MONTHS.keys(), title=f'Accidents in Boroughs by Month in {year}', xlabel='Month', ylabel='Accidents', y_max=5000, y_scale=1000, legend=legend)
-            plt.show()
-
-            fig = plt.figure()
-            for index, year in enumerate(YEARS[4:]):
-                legend = index == 0
-                ax = fig.add_subplot(2, 2, index + 1)
-                subplot_multiple_bar_by_metric(ax, data[year], MONTHS.keys(), title=f'Accidents in Boroughs by Month in {year}', xlabel='Month', ylabel='Accidents', y_max=5000, y_scale=1000, legend=legend)
-            plt.show()
+            plot_year_pages(data, MONTHS.keys(), title='Accidents in Boroughs by Month in {year}', xlabel='Month', ylabel='Accidents', y_max=5000, y_scale=1000)
         for year in YEARS:
             plot_multiple_bar_by_metric(data[year], MONTHS.keys(), title=f'Accidents in Boroughs by Month in {year}', xlabel='Month', ylabel='Accidents')
             metric = [datetime(year, 1, 1), datetime(year, 12, 31)]
@@ -582,204 +1047,204 @@ def visualize_six(cleaned_df, year_df_dict, month=True, weekday=True, hour=True,
 
     if weekday:
         print('weekdays')
-        data = query_accidents_by_borough_and_day_and_year(cleaned_df)
-        # plot 2013-2017 and 2018-2021 side by side
+        export_question('6/day')
+        data = query_accidents_by_borough_and_day_and_year(cleaned_df, cube=cube)
+        # plot the years side by side
         if subplot:
-            fig = plt.figure()
-            for index, year in enumerate(YEARS[:4]):
-                legend = index == 0
-                ax = fig.add_subplot(2, 2, index + 1)
-                subplot_multiple_bar_by_metric(ax, data[year], DAYS, title=f'Accidents in Boroughs by Day of the Week in {year}', xlabel='Day of the Week', ylabel='Accidents', y_max=7900, y_scale=1000, legend=legend)
-            plt.show()
-
-            fig = plt.figure()
-            for index, year in enumerate(YEARS[4:]):
-                legend = index == 0
-                ax = fig.add_subplot(2, 2, index + 1)
-                subplot_multiple_bar_by_metric(ax, data[year], DAYS, title=f'Accidents in Boroughs by Day of the Week in {year}', xlabel='Day of the Week', ylabel='Accidents', y_max=7900, y_scale=1000, legend=legend)
-            plt.show()
+            plot_year_pages(data, DAYS, title='Accidents in Boroughs by Day of the Week in {year}', xlabel='Day of the Week', ylabel='Accidents', y_max=7900, y_scale=1000)
         for year in YEARS:
             plot_multiple_bar_by_metric(data[year], DAYS, title=f'Accidents in Boroughs by Day of the Week in {year}', xlabel='Day of the Week', ylabel='Accidents')
 
     if hour:
         print('hours')
-        data = query_accidents_by_borough_and_hour_and_year(cleaned_df)
+        export_question('6/hour')
+        data = query_accidents_by_borough_and_hour_and_year(cleaned_df, cube=cube)
         if subplot:
-            fig = plt.figure()
-            for index, year in enumerate(YEARS[:4]):
-                legend = index == 0
-                ax = fig.add_subplot(2, 2, index + 1)
-                subplot_multiple_bar_by_metric(ax, data[year], HOURS, title=f'Accidents in Boroughs by Hour in {year}', xlabel='Hour', ylabel='Accidents', y_max=4000, y_scale=500, legend=legend)
-            plt.show()
-
-            fig = plt.figure()
-            for index, year in enumerate(YEARS[4:]):
-                legend = index == 0
-                ax = fig.add_subplot(2, 2, index + 1)
-                subplot_multiple_bar_by_metric(ax, data[year], HOURS, title=f'Accidents in Boroughs by Hour in {year}', xlabel='Hour', ylabel='Accidents', y_max=4000, y_scale=500, legend=legend)
-            plt.show()
-        for year in YEARS:
-            plot_multiple_bar_by_metric(data[year], HOURS, title=f'Accidents in Boroughs by Hour in {year}', xlabel='Hour', ylabel='Accidents')
-            year_df = year_df_dict[year]
-            # make a copy to overwrite columns for visualization
-            year_df = year_df.copy()
-            year_df['HOUR'] = year_df['CRASH TIME'].dt.hour
-            metric = [0, 23]
-            plot_density_by_metric(year_df, metric, 'HOUR', 'BOROUGH', hue_order=BOROUGH_COORDS.keys(), title=f'Accident Density in Boroughs by Hour in {year}', xlabel='Hour', ylabel='Accident Density')
-        # density plot by hour for each year from 2013 to 2020
+            plot_year_pages(data, HOURS, title='Accidents in Boroughs by Hour in {year}', xlabel='Hour', ylabel='Accidents', y_max=4000, y_scale=500)
+        if executor is not None and active_exporter() is not None:
+            executor.render(plot_borough_hours_year, years=YEARS)
+        else:
+            for year in YEARS:
+                plot_borough_hours_year(year, year_df_dict[year], data[year])
+        # density plot by hour for each year
         for borough in BOROUGH_COORDS.keys():
             temp_df = df_filter_by(cleaned_df, 'borough', borough)
-            temp_df = temp_df.copy()
-            temp_df = df_between_years(temp_df, 2013, 2020)
-            temp_df['HOUR'] = temp_df['CRASH TIME'].dt.hour
-            temp_df['YEAR'] = temp_df['CRASH TIME'].dt.year
+            temp_df = df_between_years(temp_df, YEARS[0], YEARS[-1])
             metric = [0, 23]
             plot_density_by_metric(temp_df, metric, 'HOUR', 'YEAR', hue_order=list(YEARS), title=f'Accident Density by Hour in {borough.title()} for Each Year', xlabel='Hour', ylabel='Accident Density')
 
 
-def visualize_seven(year_df_dict, boroughs=BOROUGH_COORDS.keys(), selected_year=None):
+def plot_borough_hours_year(year, year_df, data=None):
+    """
+    Plot the accidents in each borough by hour of a single year, counted from year_df when data is not given.
+    """
+    if data is None:
+        data = year_nested_counts(year, year_df, 'borough', BOROUGH_COORDS.keys(), 'hour', HOURS)
+    plot_multiple_bar_by_metric(data, HOURS, title=f'Accidents in Boroughs by Hour in {year}', xlabel='Hour', ylabel='Accidents')
+    metric = [0, 23]
+    plot_density_by_metric(year_df, metric, 'HOUR', 'BOROUGH', hue_order=BOROUGH_COORDS.keys(), title=f'Accident Density in Boroughs by Hour in {year}', xlabel='Hour', ylabel='Accident Density')
+
+
+@profiled(category='visualize')
+def visualize_seven(year_df_dict, boroughs=BOROUGH_COORDS.keys(), selected_year=None, method='fft',
+                    resolution=DEFAULT_RESOLUTION, bandwidth='scott', cache=None, output_dir=None, workers=None):
     """
     Filter the dataframe to get the data for plotting a density heat map plot
     by borough for each year.
     By default plot all years in the dict and for all boroughs.
-    Optionally specify a single year or list of boroughs.
+    Optionally specify a single year or list of boroughs, the 'exact' density method,
+    the grid resolution or the bandwidth rule.
+    Densities are reused from the DensityCache when one is given.
+    With an output_dir, or during a batch export, the maps are rendered in parallel by workers
+    processes and saved instead of shown, and the saved paths are returned.
     """
-    # make sure the optional selected year is within acceptable range
-    if selected_year is not None:
-        assert selected_year > 2012 and selected_year < 2021
-    for borough in boroughs:
-        if selected_year is None:
-            for year in year_df_dict.keys():
-                # filter by year and borough
-                year_df = year_df_dict[year]
-                borough_df = df_filter_by(year_df, 'borough', borough)
-                # make sure coordinates are in borough
-                c1, c2 = BOROUGH_BOUNDS[borough]
-                borough_df = df_between_coords(borough_df, c1, c2)
+    # make sure the optional selected year is one of the loaded years
+    if selected_year is not None and selected_year not in year_df_dict:
+        raise ValueError(f'selected_year must be one of {list(year_df_dict)}, got {selected_year!r}')
+    export_question(7)
+    exporter = active_exporter()
+    if output_dir is None and exporter is not None:
+        output_dir = exporter.question_dir()
+    years = year_df_dict.keys() if selected_year is None else [selected_year]
+    # one index per year, shared by the boroughs
+    indexes = spatial_indexes(year_df_dict, years)
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+        kwargs = {'method': method, 'resolution': resolution, 'bandwidth': bandwidth, 'cache': cache}
+        jobs = []
+        for borough in boroughs:
+            for year in years:
+                # only send the coordinates of the borough to the rendering processes
+                borough_df = borough_accidents(year_df_dict[year], borough, index=indexes[year])[['LATITUDE', 'LONGITUDE']]
                 title = f'Accident Density in {borough.title()} in {year}'
-                plot_basemap_heat_density(borough_df, borough, title=title)
-        else:
-            # filter by year and borough
-            year_df = year_df_dict[selected_year]
-            borough_df = df_filter_by(year_df, 'borough', borough)
-            # make sure coordinates are in borough
-            c1, c2 = BOROUGH_BOUNDS[borough]
-            borough_df = df_between_coords(borough_df, c1, c2)
-            title = f'Accident Density in {borough.title()} in {selected_year}'
-            plot_basemap_heat_density(borough_df, borough, title=title)
-
-def query_accidents_by_deaths_and_month(cleaned_df, print_step=False):
+                jobs.append((borough_df, borough, heat_density_path(output_dir, borough, year), {'title': title, **kwargs}))
+        paths = render_heat_densities(jobs, workers=workers)
+        if exporter is not None:
+            for (_, _, _, job_kwargs), path in zip(jobs, paths):
+                exporter.record(path, job_kwargs['title'])
+        return paths
+    for borough in boroughs:
+        for year in years:
+            # filter by year and borough, only keeping coordinates in the borough
+            borough_df = borough_accidents(year_df_dict[year], borough, index=indexes[year])
+            title = f'Accident Density in {borough.title()} in {year}'
+            plot_basemap_heat_density(borough_df, borough, title=title, method=method, resolution=resolution, bandwidth=bandwidth, cache=cache)
+
+@profiled(category='query')
+def query_accidents_by_deaths_and_month(cleaned_df, print_step=False, cube=None):
     """
     retrieves the number of accident deaths by each month, also returns
     the ratio of deaths to accidents in each month
     """
+    dimensions = [('year', YEARS), ('month', MONTHS.keys())]
+    if cube is not None:
+        accidents = cube.count_by(dimensions)
+        deaths_by_month = cube.count_by(dimensions, measure='NUMBER OF PERSONS KILLED')
+    else:
+        keys = aggregation_keys(cleaned_df)
+        accidents = keys.count_by(dimensions)
+        deaths_by_month = keys.count_by(dimensions, weights=cleaned_df['NUMBER OF PERSONS KILLED'].to_numpy(dtype=np.float64, na_value=0))
+    # months without accidents, such as those after the data ends within the last year, have a ratio of 0
+    ratios = np.divide(deaths_by_month, accidents, out=np.zeros(deaths_by_month.shape), where=accidents > 0)
     death_counts = defaultdict(list)
     death_ratio = defaultdict(list)
-    for year in YEARS:
+    for year_index, year in enumerate(YEARS):
         if print_step:
             print('Showing year:', year)
-        year_df = df_filter_by(cleaned_df, 'year', year)
-        for month in MONTHS.keys():
-            month_df = df_filter_by(year_df, 'month', month)
-            deaths = month_df['NUMBER OF PERSONS KILLED'].sum()
+        for month_index, month in enumerate(MONTHS.keys()):
+            deaths = deaths_by_month[year_index, month_index]
             if print_step:
                 print('   ', MONTHS[month], deaths)
             death_counts[MONTHS[month]].append(deaths)
-            death_ratio[MONTHS[month]].append(deaths/month_df.shape[0])
+            death_ratio[MONTHS[month]].append(ratios[year_index, month_index])
     return YEARS, death_counts, death_ratio
 
 
-def visualize_nine(cleaned_df):
+@profiled(category='visualize')
+def visualize_nine(cleaned_df, cube=None):
     """ graphs the histograms for 9, accident deaths by month and accident death ratio by month"""
-    years, data, data_with_ratio = query_accidents_by_deaths_and_month(cleaned_df, print_step=True)
-    fig = plt.figure()
+    export_question(9)
+    years, data, data_with_ratio = query_accidents_by_deaths_and_month(cleaned_df, print_step=True, cube=cube)
     plot_multiple_bar_by_metric(data, years,
-                                title=f'Accidents Deaths by Month from 2013 to 2020', xlabel='Month',
+                                title=f'Accidents Deaths by Month from {years[0]} to {years[-1]}', xlabel='Month',
                                 ylabel='Deaths')
-    plt.show()
-    fig = plt.figure()
     plot_multiple_bar_by_metric(data_with_ratio, years,
-                                title=f'Death to Accident Ratio by Month from 2013 to 2020', xlabel='Month',
+                                title=f'Death to Accident Ratio by Month from {years[0]} to {years[-1]}', xlabel='Month',
                                 ylabel='Death to Accident Ratio')
-    plt.show()
 
+@profiled(category='visualize')
 def visualize_three():
     """
     Create a visualization for each type of accident per year.
     Accident type is classified by contributing factors and/or involved parties.
     """
+    export_question(3)
     # read in cleaned data - visualization specific
     cleaned_df = pd.read_csv(CLEAN_MOTOR_VEHICLE_COLLISIONS_CSV)
-    # creates a dictionary where each key maps to a list
-    counts_total = defaultdict(list)
-    counts_percentage= defaultdict(list)
-    for year in YEARS:
-        filtered_data = cleaned_df[cleaned_df['CRASH YEAR {}'.format(year)] == 1]
-        total_year_count = 0
-        for column in ['Drug Related Factor', 'Personal Factor', 'Environmental Cause Factor', 'Failure To Obey Traffic Factor']:
-            # remove rows from df that don't contain column_value in column_name column
-            column_value_df = filtered_data[filtered_data[column] == 1]
-
-            counts_total[column].append(column_value_df.shape[0])
-            total_year_count += column_value_df.shape[0]
-        for column in counts_total:
-            counts_percentage[column].append(counts_total[column][-1] / total_year_count)
-
-    plot_multiple_bar_by_metric(counts_total, YEARS, title='Accident Causation Counts by Year', xlabel='Year', ylabel='Accidents')
+    factor_columns = ['Drug Related Factor', 'Personal Factor', 'Environmental Cause Factor', 'Failure To Obey Traffic Factor']
+    years, factor_counts = one_hot_counts_by_year(cleaned_df, cleaned_df[factor_columns].to_numpy() == 1)
+    year_totals = factor_counts.sum(axis=1)
+    counts_total = {column: factor_counts[:, index].tolist() for index, column in enumerate(factor_columns)}
+    counts_percentage = {column: (factor_counts[:, index] / year_totals).tolist() for index, column in enumerate(factor_columns)}
 
-    plot_multiple_bar_by_metric(counts_percentage, YEARS, title='Accident Causation Percentages by Year', xlabel='Year', ylabel='Accidents')
+    plot_multiple_bar_by_metric(counts_total, years, title='Accident Causation Counts by Year', xlabel='Year', ylabel='Accidents')
 
-    # creates a dictionary where each key maps to a list
-    counts = defaultdict(list)
-    for year in YEARS:
-        filtered_data = cleaned_df[cleaned_df['CRASH YEAR {}'.format(year)] == 1]
-        column ='INVOLVED TYPE PEDESTRIAN'
-        # remove rows from df that don't contain column_value in column_name column
-        column_value_df = filtered_data[filtered_data[column] == 1]
-        counts[column].append(column_value_df.shape[0])
+    plot_multiple_bar_by_metric(counts_percentage, years, title='Accident Causation Percentages by Year', xlabel='Year', ylabel='Accidents')
 
-        # remove rows from df that don't contain column_value in column_name column
-        column_value_df = filtered_data[filtered_data[column] == 0]
-        counts['VEHICLE ONLY'].append(column_value_df.shape[0])
-    plot_multiple_bar_by_metric(counts, YEARS, title='Involved Parties by Year', xlabel='Year', ylabel='Accidents')
+    years, counts = involved_party_counts(cleaned_df)
+    plot_multiple_bar_by_metric(counts, years, title='Involved Parties by Year', xlabel='Year', ylabel='Accidents')
 
 
+@profiled(category='visualize')
 def visualize_eight():
     """
     Create a visualization depicting involved parties in accidents by year.
     Involved party is either vehicle only or vehicle and pedestrian
     """
+    export_question(8)
     # read in cleaned data - visualization specific
     cleaned_df = pd.read_csv(CLEAN_MOTOR_VEHICLE_COLLISIONS_CSV)
 
-    # creates a dictionary where each key maps to a list
-    counts = defaultdict(list)
-    for year in YEARS:
-        filtered_data = cleaned_df[cleaned_df['CRASH YEAR {}'.format(year)] == 1]
-        column ='INVOLVED TYPE PEDESTRIAN'
-        # remove rows from df that don't contain column_value in column_name column
-        column_value_df = filtered_data[filtered_data[column] == 1]
-        counts[column].append(column_value_df.shape[0])
+    years, counts = involved_party_counts(cleaned_df)
+    plot_multiple_bar_by_metric(counts, years, title='Involved Parties by Year', xlabel='Year', ylabel='Accidents')
+
 
-        # remove rows from df that don't contain column_value in column_name column
-        column_value_df = filtered_data[filtered_data[column] == 0]
-        counts['VEHICLE ONLY'].append(column_value_df.shape[0])
-    plot_multiple_bar_by_metric(counts, YEARS, title='Involved Parties by Year', xlabel='Year', ylabel='Accidents')
+def one_hot_counts_by_year(cleaned_df, masks, years=None):
+    """
+    Count the rows of the data cleaner's one hot coded output within each column of the boolean masks,
+    for every year of YEARS it has a CRASH YEAR column of. One matrix product over the CRASH YEAR columns
+    counts every year at once. Returns the years and an array of counts indexed by year and mask.
+    """
+    years = [year for year in (YEARS if years is None else years) if 'CRASH YEAR {}'.format(year) in cleaned_df]
+    year_masks = cleaned_df[['CRASH YEAR {}'.format(year) for year in years]].to_numpy() == 1
+    counts = year_masks.T.astype(np.float64) @ np.asarray(masks).astype(np.float64)
+    return years, np.rint(counts).astype(np.int64)
+
+
+def involved_party_counts(cleaned_df):
+    """
+    Accidents involving a pedestrian and involving vehicles only in each year of the data cleaner's output.
+    """
+    pedestrian = cleaned_df['INVOLVED TYPE PEDESTRIAN'].to_numpy()
+    years, counts = one_hot_counts_by_year(cleaned_df, np.column_stack([pedestrian == 1, pedestrian == 0]))
+    return years, {'INVOLVED TYPE PEDESTRIAN': counts[:, 0].tolist(), 'VEHICLE ONLY': counts[:, 1].tolist()}
 
 
-def run_visualizations(cleaned_df, year_df_dict, subplot=False):
+def run_visualizations(cleaned_df, year_df_dict, subplot=False, cube=None, density_cache=None, executor=None):
     """
     Run all possible visualizations.
+    Accident counts are taken from the count cube and densities from the density cache when they are given.
+    During a batch export the yearly plots are rendered in parallel by the YearExecutor when one is given.
     """
-    visualize_one(cleaned_df)
-    visualize_two(cleaned_df)
+    visualize_one(cleaned_df, cube=cube)
+    visualize_two(cleaned_df, cube=cube)
     visualize_three()
-    visualize_four(cleaned_df)
-    visualize_five(cleaned_df, year_df_dict, subplot=subplot)
-    visualize_six(cleaned_df, year_df_dict, month=False, weekday=False, subplot=subplot)
-    visualize_seven(year_df_dict)
+    visualize_four(cleaned_df, cube=cube)
+    visualize_five(cleaned_df, year_df_dict, subplot=subplot, cube=cube, executor=executor)
+    visualize_six(cleaned_df, year_df_dict, month=False, weekday=False, subplot=subplot, cube=cube, executor=executor)
+    visualize_seven(year_df_dict, cache=density_cache)
     visualize_eight()
-    visualize_nine(cleaned_df)
+    visualize_nine(cleaned_df, cube=cube)
 
 
 # ============================================================== #
@@ -788,6 +1253,13 @@ def run_visualizations(cleaned_df, year_df_dict, subplot=False):
 
 
 if __name__ == '__main__':
-    cleaned_df, year_df_dict = read_data()
-    # cleaned_df, year_df_dict = load_from_saved()
-    run_visualizations(cleaned_df, year_df_dict)
+    # run as a script this file is __main__, the years are discovered into the analytics module the cache manager loads
+    from analytics import load_cube, run_visualizations
+    from cache_manager import load_analytics_data, ensure_clean_collisions_csv
+
+    # pass --profile to print the time spent in every stage and write its trace
+    with profiling(enabled='--profile' in sys.argv):
+        # only reads and cleans the data again when it or the cleaning has changed
+        cleaned_df, year_df_dict = load_analytics_data(print_step=True)
+        ensure_clean_collisions_csv(print_step=True)
+        run_visualizations(cleaned_df, year_df_dict, cube=load_cube(cleaned_df), density_cache=DensityCache())
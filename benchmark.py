@@ -0,0 +1,225 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+import argparse
+from contextlib import contextmanager
+import gc
+import json
+import os
+import platform
+import tempfile
+import time
+
+# third party library
+import numpy as np
+import pandas as pd
+
+# local
+import analytics
+from analytics import BOROUGH_COORDS, BOROUGH_EXTENT, MOTOR_VEHICLE_COLLISIONS_CSV, borough_coordinates, \
+    density_estimation, read_data
+from cleaning_pipeline import clean_collisions
+from count_cube import build_count_cube
+from data_cleaner import clean_collisions_iterrows
+from instrumentation import MemorySampler
+from synthetic_data import DEFAULT_SEED, write_collisions_csv
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# rows of synthetic collisions every stage is timed at
+BENCHMARK_SIZES = [10000, 100000, 1000000, 5000000]
+
+# JSON file the results are recorded in as the baseline later runs are compared with
+BENCHMARK_BASELINE = 'benchmark_baseline.json'
+
+# largest input the row by row cleaning is timed at, it takes minutes beyond that
+ITERROWS_MAX_ROWS = 10000
+
+# most points the exact kernel density is timed at, it evaluates every point at every grid point
+EXACT_KDE_MAX_POINTS = 20000
+
+# borough the density estimation is timed on
+DENSITY_BOROUGH = 'BROOKLYN'
+
+# query functions timed on the rows and on the count cube
+QUERIES = ['query_accidents_by_weekday_and_time_and_year', 'query_accidents_by_borough_and_month_and_year',
+           'query_accidents_by_borough_and_day_and_year', 'query_accidents_by_borough_and_hour_and_year',
+           'query_accidents_by_deaths_and_month']
+
+# a stage slower than the baseline by more than this factor is reported as a regression
+REGRESSION_TOLERANCE = 1.25
+
+
+# ============================================================== #
+#  SECTION: Class Definitions                                   #
+# ============================================================== #
+
+class BenchmarkRun:
+    """
+    Times the stages of a benchmark at one input size, recording the wall time, throughput and peak memory of each.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name, rows):
+        """
+        Time the block as the stage name processing rows rows.
+        """
+        gc.collect()
+        with MemorySampler() as sampler:
+            start = time.perf_counter()
+            yield
+            seconds = time.perf_counter() - start
+        self.stages[name] = {'seconds': seconds, 'rows': int(rows), 'rows_per_second': rows / seconds if seconds else None,
+                             'peak_memory_bytes': sampler.peak, 'peak_memory_increase_bytes': sampler.peak - sampler.start}
+        print('  {:<55} {:>9.3f}s {:>14,.0f} rows/s {:>9.1f} MB peak'.format(
+            name, seconds, rows / seconds if seconds else 0, sampler.peak / 1024 ** 2))
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+@contextmanager
+def working_directory(directory):
+    """
+    Run the block from directory, read_data reads the Dataset from the working directory.
+    """
+    previous_directory = os.getcwd()
+    os.chdir(directory)
+    try:
+        yield directory
+    finally:
+        os.chdir(previous_directory)
+
+
+def benchmark_size(rows, seed=DEFAULT_SEED, work_dir=None):
+    """
+    Time every stage on rows synthetic collisions written to work_dir, by default a temporary directory.
+    Returns the BenchmarkRun with the results of the stages.
+    """
+    run = BenchmarkRun(rows)
+    with tempfile.TemporaryDirectory(prefix='benchmark_', dir=work_dir) as directory:
+        csv_path = os.path.join(directory, MOTOR_VEHICLE_COLLISIONS_CSV)
+        with run.stage('generate_collisions', rows):
+            write_collisions_csv(csv_path, rows, seed=seed)
+
+        # the data cleaner's passes on the whole Dataset
+        with run.stage('read_raw_csv', rows):
+            collision_df = pd.read_csv(csv_path)
+        with run.stage('clean_collisions', rows):
+            clean_collisions(collision_df)
+        if rows <= ITERROWS_MAX_ROWS:
+            with run.stage('clean_collisions_iterrows', rows):
+                clean_collisions_iterrows(collision_df.copy())
+        del collision_df
+
+        with working_directory(directory):
+            with run.stage('read_data', rows):
+                cleaned_df, year_df_dict = read_data()
+            with run.stage('read_data_chunked', rows):
+                read_data(chunk_size=max(rows // 10, 1))
+
+    # the queries counting the cleaned rows, and the count cube they can count from instead
+    cleaned_rows = len(cleaned_df)
+    with run.stage('build_count_cube', cleaned_rows):
+        cube = build_count_cube(cleaned_df, BOROUGH_COORDS.keys())
+    for query_name in QUERIES:
+        query = getattr(analytics, query_name)
+        with run.stage(query_name, cleaned_rows):
+            query(cleaned_df)
+        with run.stage(f'{query_name}_cube', cleaned_rows):
+            query(cleaned_df, cube=cube)
+
+    lon, lat = borough_coordinates(cleaned_df, DENSITY_BOROUGH)
+    with run.stage('density_estimation_fft', len(lon)):
+        density_estimation(lon, lat, method='fft', extent=BOROUGH_EXTENT[DENSITY_BOROUGH])
+    if len(lon) <= EXACT_KDE_MAX_POINTS:
+        with run.stage('density_estimation_exact', len(lon)):
+            density_estimation(lon, lat, method='exact', extent=BOROUGH_EXTENT[DENSITY_BOROUGH])
+    return run
+
+
+def environment():
+    """
+    Versions and machine the benchmark ran on, timings are only comparable on the same environment.
+    """
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'machine': platform.machine(), 'processor': platform.processor(), 'cpus': os.cpu_count()}
+
+
+def run_benchmarks(sizes=BENCHMARK_SIZES, seed=DEFAULT_SEED, work_dir=None):
+    """
+    Time every stage at every size. Returns the results as recorded in the baseline.
+    """
+    results = {'environment': environment(), 'seed': seed, 'sizes': {}}
+    for rows in sizes:
+        print(f'\n{rows:,} rows')
+        results['sizes'][str(rows)] = benchmark_size(rows, seed=seed, work_dir=work_dir).stages
+    return results
+
+
+def write_baseline(results, baseline_path=BENCHMARK_BASELINE):
+    """
+    Record the results as the baseline.
+    """
+    with open(baseline_path, 'w') as file:
+        json.dump(results, file, indent=2)
+    return baseline_path
+
+
+def read_baseline(baseline_path=BENCHMARK_BASELINE):
+    """
+    Results recorded in the baseline, None when there is none.
+    """
+    if not os.path.isfile(baseline_path):
+        return None
+    with open(baseline_path) as file:
+        return json.load(file)
+
+
+def compare_with_baseline(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """
+    Stages that got slower than the baseline by more than tolerance, as a list of size, stage, baseline and new seconds.
+    Only sizes and stages in both are compared.
+    """
+    regressions = []
+    for rows, stages in results['sizes'].items():
+        baseline_stages = baseline['sizes'].get(rows, {})
+        for name, stage in stages.items():
+            if name in baseline_stages and stage['seconds'] > baseline_stages[name]['seconds'] * tolerance:
+                regressions.append((int(rows), name, baseline_stages[name]['seconds'], stage['seconds']))
+    return regressions
+
+
+# ============================================================== #
+#  SECTION: Main                                                 #
+# ============================================================== #
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time reading, cleaning, querying and density estimation '
+                                                 'on synthetic collisions.')
+    parser.add_argument('sizes', nargs='*', type=int, default=BENCHMARK_SIZES, help='rows of collisions to time at')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--baseline', default=BENCHMARK_BASELINE, help='JSON file the results are compared with')
+    parser.add_argument('--save', action='store_true', help='record the results as the new baseline')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, seed=args.seed)
+    baseline = read_baseline(args.baseline)
+    if baseline is not None and not args.save:
+        regressions = compare_with_baseline(results, baseline)
+        for rows, name, baseline_seconds, seconds in regressions:
+            print(f'Regression at {rows:,} rows in {name}: {baseline_seconds:.3f}s -> {seconds:.3f}s')
+        print(f'Complete! {len(regressions)} regressions against {args.baseline}')
+    else:
+        print('Complete! Baseline written to', write_baseline(results, args.baseline))
@@ -0,0 +1,249 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+import hashlib
+import inspect
+import json
+import os
+
+# third party library
+import pandas as pd
+
+# local
+import analytics
+import cleaning_pipeline
+import columnar_cache
+import data_cleaner
+import factor_index
+import vehicle_classifier
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# file next to or within a cache that holds the fingerprint it was built from,
+# parquet readers skip files starting with an underscore
+FINGERPRINT_FILE = '_fingerprint.json'
+
+# number of blocks sampled from a file for its sampled hash
+SAMPLE_BLOCKS = 16
+
+# size of each sampled block, in bytes
+SAMPLE_BLOCK_SIZE = 64 * 1024
+
+# bytes read at a time while hashing the content of a file
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# keys of a fingerprint that decide whether a cache is up to date,
+# the content hash saved with them only decides whether the cache can be appended to
+FINGERPRINT_KEYS = ['input', 'config']
+
+
+# ============================================================== #
+#  SECTION: Class Definitions                                   #
+# ============================================================== #
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def sampled_hash(path, blocks=SAMPLE_BLOCKS, block_size=SAMPLE_BLOCK_SIZE):
+    """
+    Hash evenly spaced blocks of a file, including its first and last block,
+    to notice content changes without reading the whole file.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        last_offset = max(size - block_size, 0)
+        offsets = sorted({last_offset * index // max(blocks - 1, 1) for index in range(blocks)})
+        for offset in offsets:
+            file.seek(offset)
+            digest.update(file.read(block_size))
+    return digest.hexdigest()
+
+
+def content_hash(path, size=None, chunk_size=HASH_CHUNK_SIZE):
+    """
+    Hash the first size bytes of a file, by default all of it.
+    """
+    remaining = os.path.getsize(path) if size is None else size
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while remaining > 0:
+            chunk = file.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def fingerprint_file(path, sample=False):
+    """
+    Fingerprint a file by its size and modification time, and optionally a hash of sampled blocks.
+    """
+    stat = os.stat(path)
+    fingerprint = {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if sample:
+        fingerprint['sampled_hash'] = sampled_hash(path)
+    return fingerprint
+
+
+def hash_config(config):
+    """
+    Hash a configuration of constants, sets are sorted so the hash does not depend on their order.
+    """
+    def encode(value):
+        if isinstance(value, (set, frozenset)):
+            return sorted(value)
+        if isinstance(value, type):
+            return value.__name__
+        return repr(value)
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=encode).encode()).hexdigest()
+
+
+def analytics_config():
+    """
+    Constants and code that decide how read_data cleans the collision data.
+    """
+    return {
+        'columns': analytics.ANALYTICS_COLUMNS,
+        'dtypes': analytics.ANALYTICS_DTYPES,
+        'latitude': (analytics.MIN_LATITUDE, analytics.MAX_LATITUDE),
+        'longitude': (analytics.MIN_LONGITUDE, analytics.MAX_LONGITUDE),
+        'schema': analytics.ANALYTICS_SCHEMA,
+        'cache_dtypes': columnar_cache.CACHE_DTYPES,
+        'clean_collision_df': inspect.getsource(analytics.clean_collision_df),
+        'apply_schema': [inspect.getsource(function) for function in (analytics.apply_schema,
+                                                                      analytics.fitting_integer_dtype)]
+    }
+
+
+def cleaner_config():
+    """
+    Constants and code that decide how data_cleaner cleans the collision data.
+    """
+    return {
+        'years': data_cleaner.YEARS,
+        'months': data_cleaner.MONTHS,
+        'bin_sizes': (data_cleaner.LATITUDE_BIN_SIZE, data_cleaner.LONGITUDE_BIN_SIZE),
+        'causes': data_cleaner.GENERALIZED_CAUSE_TO_SPECIFIC,
+        'vehicle': data_cleaner.VEHICLE,
+        'obstacle': data_cleaner.OBSTACLE,
+        'pedestrian': data_cleaner.PEDESTRIAN,
+        'unknown': data_cleaner.UNKNOWN,
+        'clean_collisions': [inspect.getsource(module) for module in (cleaning_pipeline, factor_index,
+                                                                       vehicle_classifier)]
+    }
+
+
+def build_fingerprint(csv_path, config, sample=False):
+    """
+    Fingerprint of a cache built from csv_path with the given configuration.
+    """
+    return {'input': fingerprint_file(csv_path, sample=sample), 'config': hash_config(config)}
+
+
+def read_fingerprint(fingerprint_path):
+    """
+    Read a saved fingerprint, None when there is none.
+    """
+    if not os.path.isfile(fingerprint_path):
+        return None
+    with open(fingerprint_path) as file:
+        return json.load(file)
+
+
+def write_fingerprint(fingerprint_path, fingerprint, csv_path=None):
+    """
+    Save a fingerprint next to the cache it describes, with the content hash of csv_path
+    when the cache can later be appended to.
+    """
+    if csv_path is not None:
+        fingerprint = {**fingerprint, 'content_hash': content_hash(csv_path)}
+    with open(fingerprint_path, 'w') as file:
+        json.dump(fingerprint, file, indent=2)
+
+
+def same_fingerprint(saved_fingerprint, fingerprint):
+    """
+    Whether a cache with the saved fingerprint was built from the same input and configuration.
+    """
+    return saved_fingerprint is not None and \
+        all(saved_fingerprint.get(key) == fingerprint[key] for key in FINGERPRINT_KEYS)
+
+
+def only_grew(saved_fingerprint, fingerprint, csv_path):
+    """
+    Whether the input of a cache only had content added at its end since the saved fingerprint while its
+    configuration stayed the same. The saved size of the input is hashed again, so edited or deleted
+    collisions are never mistaken for new ones.
+    """
+    return saved_fingerprint is not None and 'content_hash' in saved_fingerprint and \
+        saved_fingerprint['config'] == fingerprint['config'] and \
+        saved_fingerprint['input']['path'] == fingerprint['input']['path'] and \
+        saved_fingerprint['input']['size'] < fingerprint['input']['size'] and \
+        content_hash(csv_path, saved_fingerprint['input']['size']) == saved_fingerprint['content_hash']
+
+
+def load_analytics_data(sample=False, print_step=False):
+    """
+    Load the cleaned analytics data from its cache when the cache was built from the same
+    collision data and cleaning configuration, otherwise read, clean and cache the data again.
+    When the collision data only grew, as it does with every day published, and the cleaning
+    configuration is the same, only the new collisions are cleaned and appended to the cache.
+    When collisions already cached were edited or deleted the cache is built again.
+    """
+    csv_path = analytics.MOTOR_VEHICLE_COLLISIONS_CSV
+    cache_dir = columnar_cache.CLEANED_DATA_DIR
+    fingerprint = build_fingerprint(csv_path, analytics_config(), sample=sample)
+    fingerprint_path = os.path.join(cache_dir, FINGERPRINT_FILE)
+    saved_fingerprint = read_fingerprint(fingerprint_path)
+    if columnar_cache.cache_exists(cache_dir) and same_fingerprint(saved_fingerprint, fingerprint):
+        if print_step:
+            print('Loading cleaned data from', cache_dir)
+        return analytics.load_from_saved()
+    if columnar_cache.cache_exists(cache_dir) and only_grew(saved_fingerprint, fingerprint, csv_path) and \
+            columnar_cache.read_high_water_mark(cache_dir) is not None:
+        if print_step:
+            print('Appending new collisions of', csv_path, 'to', cache_dir)
+        try:
+            # the saved size of the input hashes the same, only the collisions after it are parsed
+            analytics.append_new_data(csv_path, print_step=print_step, start=saved_fingerprint['input']['size'])
+        except ValueError as error:
+            # the new counts need wider types than the saved ones, nothing was appended
+            if print_step:
+                print(error)
+        else:
+            write_fingerprint(fingerprint_path, fingerprint, csv_path)
+            return analytics.load_from_saved()
+    if print_step:
+        print('Cleaned data is missing or stale, reading', csv_path)
+    cleaned_df, year_df_dict = analytics.read_data(save_cleaned=True)
+    write_fingerprint(fingerprint_path, fingerprint, csv_path)
+    return cleaned_df, year_df_dict
+
+
+def ensure_clean_collisions_csv(csv_path=data_cleaner.MOTOR_VEHICLE_COLLISIONS_CSV,
+                                clean_csv_path=data_cleaner.CLEAN_MOTOR_VEHICLE_COLLISIONS_CSV,
+                                sample=False, print_step=False):
+    """
+    Run the data cleaner only when its output is missing or was built from other
+    collision data or another cleaning configuration.
+    """
+    fingerprint = build_fingerprint(csv_path, cleaner_config(), sample=sample)
+    fingerprint_path = os.path.splitext(clean_csv_path)[0] + FINGERPRINT_FILE
+    if os.path.isfile(clean_csv_path) and read_fingerprint(fingerprint_path) == fingerprint:
+        if print_step:
+            print(clean_csv_path, 'is up to date')
+        return
+    if print_step:
+        print(clean_csv_path, 'is missing or stale, cleaning', csv_path)
+    collision_df = pd.read_csv(csv_path)
+    cleaning_pipeline.clean_collisions(collision_df, print_step=print_step).to_csv(clean_csv_path, index=False)
+    write_fingerprint(fingerprint_path, fingerprint)
@@ -0,0 +1,256 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+import time
+
+# third party library
+import numpy as np
+import pandas as pd
+
+# local
+from data_cleaner import MOTOR_VEHICLE_COLLISIONS_CSV, YEARS, MONTHS, LATITUDE_BIN_SIZE, LONGITUDE_BIN_SIZE, \
+    GENERALIZED_TYPE_TO_SPECIFIC, USELESS_COLUMNS, \
+    COMPLETE_COLUMNS, FACTOR_COLUMNS, VEHICLE_TYPE_COLUMNS, PEDESTRIAN_COUNT_COLUMNS, DAYS, \
+    clean_collisions_iterrows
+from factor_index import build_factor_index, factor_matrix, CAUSE_COLUMNS
+from instrumentation import profiled
+from vehicle_classifier import VehicleTypeClassifier, CATEGORY_CODES
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# format of the CRASH DATE column
+CRASH_DATE_FORMAT = '%m/%d/%Y'
+
+# inverted index of contributing factor to generalized cause
+FACTOR_INDEX = build_factor_index(resolve='first')
+
+
+# ============================================================== #
+#  SECTION: Class Definitions                                   #
+# ============================================================== #
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def split_crash_date(crash_date):
+    """
+    Split the CRASH DATE column into month, day and year string columns.
+    Only the unique dates are split and the results are mapped back by code.
+    """
+    codes, unique_dates = pd.factorize(crash_date)
+    parts = pd.Series(unique_dates).str.split('/', expand=True)
+    month, day, year = (parts[index].to_numpy(dtype=object)[codes] for index in range(3))
+    return month, day, year
+
+
+def crash_weekday(crash_date):
+    """
+    Get the name of the day of the week of each CRASH DATE.
+    Only the unique dates are parsed and the results are mapped back by code.
+    """
+    codes, unique_dates = pd.factorize(crash_date)
+    day_names = pd.to_datetime(pd.Series(unique_dates), format=CRASH_DATE_FORMAT).dt.day_name()
+    return day_names.to_numpy(dtype=object)[codes]
+
+
+@profiled(category='clean')
+def drop_invalid_rows(collision_df, print_step=False):
+    """
+    Drop rows that have a date outside of the selected months and years or that are
+    missing any of the complete columns. Returns the remaining rows indexed sequentially.
+    """
+    if print_step:
+        print('Dropping invalid rows')
+    in_date_range = np.ones(len(collision_df), dtype=bool)
+    if MONTHS or YEARS:
+        month, _, year = split_crash_date(collision_df['CRASH DATE'])
+        if MONTHS:
+            in_date_range &= np.isin(month, list(MONTHS))
+        if YEARS:
+            in_date_range &= np.isin(year, list(YEARS))
+    complete = collision_df[COMPLETE_COLUMNS].notnull().all(axis=1).to_numpy()
+
+    # incomplete rows are only counted when they are within the date range
+    date_dropped = np.count_nonzero(~in_date_range)
+    incomplete_dropped = np.count_nonzero(in_date_range & ~complete)
+    collision_df = collision_df[in_date_range & complete].reset_index(drop=True)
+
+    # print statistics
+    if print_step:
+        print('Dropped {} rows for out of range dates'.format(date_dropped))
+        print('Dropped {} rows for incomplete data'.format(incomplete_dropped))
+        print('{} rows remaining'.format(len(collision_df)))
+        print('Complete!\n')
+    return collision_df
+
+
+@profiled(category='clean')
+def quantize_columns(collision_df, print_step=False):
+    """
+    Quantize the crash time to the hour and the coordinates to their bin sizes.
+    The quantized columns are moved to the end of the dataframe.
+    """
+    if print_step:
+        print('Quantizing data')
+    # quantize time via flooring, dropping the minutes keeps the string type the row by row version infers
+    new_crash_time_column = collision_df['CRASH TIME'].str.replace(r':.*', '', regex=True)
+    # quantize latitude and longitude via rounding, np.round rounds half to even just like round
+    new_latitude_column = np.round(collision_df['LATITUDE'].to_numpy() / LATITUDE_BIN_SIZE) * LATITUDE_BIN_SIZE
+    new_longitude_column = np.round(collision_df['LONGITUDE'].to_numpy() / LONGITUDE_BIN_SIZE) * LONGITUDE_BIN_SIZE
+
+    # replace old columns with new ones
+    del collision_df['CRASH TIME']
+    collision_df.insert(len(collision_df.columns), 'CRASH TIME', new_crash_time_column)
+    del collision_df['LATITUDE']
+    collision_df.insert(len(collision_df.columns), 'LATITUDE', new_latitude_column)
+    del collision_df['LONGITUDE']
+    collision_df.insert(len(collision_df.columns), 'LONGITUDE', new_longitude_column)
+    if print_step:
+        print('Complete!\n')
+    return collision_df
+
+
+def one_hot_column(mask):
+    """
+    Convert a boolean mask into a one hot coded column.
+    """
+    return np.asarray(mask, dtype=np.int64)
+
+
+@profiled(category='clean')
+def encode_factors(collision_df):
+    """
+    One hot code the contributing factor columns into their generalized causes.
+    A factor is generalized to the first cause in GENERALIZED_CAUSE_TO_SPECIFIC that contains it.
+    """
+    cause_matrix = factor_matrix(collision_df, FACTOR_COLUMNS, FACTOR_INDEX)
+    return {column_name: one_hot_column(cause_matrix[:, index]) for index, column_name in enumerate(CAUSE_COLUMNS)}
+
+
+@profiled(category='clean')
+def encode_vehicle_types(collision_df, vehicle_classifier):
+    """
+    One hot code the vehicle type columns into their generalized types.
+    Any pedestrian or cyclist casualty also marks a pedestrian as involved.
+    """
+    # even if a vehicle is not cited if a pedestrian is injured a pedestrian was involved, NaN counts as well
+    pedestrian_involved = (collision_df[PEDESTRIAN_COUNT_COLUMNS] != 0).any(axis=1).to_numpy()
+    category_codes = vehicle_classifier.classify_columns(collision_df, VEHICLE_TYPE_COLUMNS)
+    vehicle_type_columns = {column_name: (category_codes == CATEGORY_CODES[column_name]).any(axis=1)
+                            for column_name in GENERALIZED_TYPE_TO_SPECIFIC.keys()}
+    vehicle_type_columns['PEDESTRIAN'] |= pedestrian_involved
+    return {column_name: one_hot_column(mask) for column_name, mask in vehicle_type_columns.items()}
+
+
+@profiled(category='clean')
+def one_hot_encode(collision_df, unique_boroughs, vehicle_classifier, print_step=False):
+    """
+    One hot code boroughs, crash dates, contributing factors and vehicle types.
+    The source columns are replaced by the generated columns.
+    """
+    if print_step:
+        print('One hot coding data')
+    borough = collision_df['BOROUGH'].to_numpy(dtype=object)
+    unique_borough_columns = {borough_name: one_hot_column(borough == borough_name) for borough_name in unique_boroughs}
+
+    # years and months are coded in the order they first appear
+    month, _, year = split_crash_date(collision_df['CRASH DATE'])
+    year_columns = {year_value: one_hot_column(year == year_value) for year_value in pd.unique(year)}
+    month_columns = {month_value: one_hot_column(month == month_value) for month_value in pd.unique(month)}
+    weekday = crash_weekday(collision_df['CRASH DATE'])
+    day_columns = {day: one_hot_column(weekday == day) for day in DAYS}
+
+    unique_factor_columns = encode_factors(collision_df)
+    vehicle_type_columns = encode_vehicle_types(collision_df, vehicle_classifier)
+
+    # add new generated columns
+    for column_name in list(unique_borough_columns.keys()):
+        collision_df.insert(len(unique_borough_columns.keys()), 'BOROUGH OF {}'.format(column_name),
+                            unique_borough_columns[column_name])
+    for column_name in list(vehicle_type_columns.keys()):
+        collision_df.insert(len(vehicle_type_columns.keys()), 'INVOLVED TYPE {}'.format(column_name),
+                            vehicle_type_columns[column_name])
+    for column_name in list(unique_factor_columns.keys()):
+        collision_df.insert(len(unique_factor_columns.keys()), column_name,
+                            unique_factor_columns[column_name])
+    for column_name in list(day_columns.keys()):
+        collision_df.insert(0, 'CRASH WEEKDAY {}'.format(column_name),
+                            day_columns[column_name])
+    for column_name in list(month_columns.keys()):
+        collision_df.insert(0, 'CRASH MONTH {}'.format(column_name),
+                            month_columns[column_name])
+    for column_name in list(year_columns.keys()):
+        collision_df.insert(0, 'CRASH YEAR {}'.format(column_name),
+                            year_columns[column_name])
+    # delete now depreciated columns
+    collision_df.drop(columns=FACTOR_COLUMNS + VEHICLE_TYPE_COLUMNS + ['CRASH DATE', 'BOROUGH'], inplace=True)
+    if print_step:
+        print('Complete!')
+    return collision_df
+
+
+@profiled(category='clean')
+def clean_collisions(collision_df, vehicle_classifier=None, print_step=False):
+    """
+    Clean the motor vehicle collision data with whole column operations.
+    Produces the same dataframe as clean_collisions_iterrows without modifying collision_df.
+    Optionally classify vehicle types with a VehicleTypeClassifier using another fallback policy.
+    """
+    if vehicle_classifier is None:
+        vehicle_classifier = VehicleTypeClassifier()
+    # remove columns of little value
+    collision_df = collision_df.drop(columns=USELESS_COLUMNS)
+    collision_df = drop_invalid_rows(collision_df, print_step=print_step)
+    collision_df = quantize_columns(collision_df, print_step=print_step)
+
+    # boroughs are kept in order of first appearance, like the row by row version does,
+    # so the borough columns come out in the same order
+    unique_boroughs = list(dict.fromkeys(pd.unique(collision_df['BOROUGH'])))
+    if print_step:
+        print('{} unique boroughs found'.format(len(unique_boroughs)))
+        print('Unique boroughs: {}\n'.format(unique_boroughs))
+
+    return one_hot_encode(collision_df, unique_boroughs, vehicle_classifier, print_step=print_step)
+
+
+def compare_with_iterrows(collision_df):
+    """
+    Run both the row by row and the vectorized cleaning on collision_df.
+    Verifies the cleaned CSV output is identical and reports the speedup.
+    """
+    start = time.perf_counter()
+    iterrows_csv = clean_collisions_iterrows(collision_df.copy()).to_csv(index=False)
+    iterrows_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized_csv = clean_collisions(collision_df).to_csv(index=False)
+    vectorized_seconds = time.perf_counter() - start
+
+    identical = iterrows_csv == vectorized_csv
+    speedup = iterrows_seconds / vectorized_seconds
+    print('\nRow by row cleaning: {:.2f}s'.format(iterrows_seconds))
+    print('Vectorized cleaning: {:.2f}s'.format(vectorized_seconds))
+    print('Speedup: {:.1f}x'.format(speedup))
+    print('Identical output: {}'.format(identical))
+    return identical, speedup
+
+
+# ============================================================== #
+#  SECTION: Main                                                 #
+# ============================================================== #
+
+
+if __name__ == '__main__':
+    # read motor_vehicle_collision data into data frame
+    print('Reading CSV into dataframe ')
+    collision_df = pd.read_csv(MOTOR_VEHICLE_COLLISIONS_CSV)
+    print('Complete!\n')
+
+    compare_with_iterrows(collision_df)
@@ -0,0 +1,256 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+import json
+import os
+import shutil
+
+# third party library
+import numpy as np
+import pandas as pd
+import pyarrow.dataset
+import pyarrow.types
+
+# local
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# directory of the cleaned analytics data, a parquet dataset partitioned by year
+CLEANED_DATA_DIR = 'cleaned_analytics_data'
+
+# column the dataset is partitioned on
+PARTITION_COLUMN = 'YEAR'
+
+# file within the dataset recording the newest collision it holds,
+# parquet readers skip files starting with an underscore
+HIGH_WATER_MARK_FILE = '_high_water_mark.json'
+
+# file within the dataset recording an append that has not been committed yet
+PENDING_APPEND_FILE = '_pending_append.json'
+
+# column identifying a collision of the Dataset, new collisions have higher ids
+COLLISION_ID_COLUMN = 'COLLISION_ID'
+
+# types of the cached columns, counts are small nullable integers as some are missing
+CACHE_DTYPES = {
+    'BOROUGH': 'category',
+    'NUMBER OF PERSONS INJURED': 'UInt16',
+    'NUMBER OF PERSONS KILLED': 'UInt8',
+    'NUMBER OF PEDESTRIANS INJURED': 'UInt8',
+    'NUMBER OF PEDESTRIANS KILLED': 'UInt8',
+    'NUMBER OF CYCLIST INJURED': 'UInt8',
+    'NUMBER OF CYCLIST KILLED': 'UInt8',
+    'NUMBER OF MOTORIST INJURED': 'UInt16',
+    'NUMBER OF MOTORIST KILLED': 'UInt8'
+}
+
+
+# ============================================================== #
+#  SECTION: Class Definitions                                   #
+# ============================================================== #
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def cache_exists(cache_dir=CLEANED_DATA_DIR):
+    """
+    Whether a cleaned dataset has been saved to cache_dir.
+    """
+    return os.path.isdir(cache_dir) and any(name.startswith(f'{PARTITION_COLUMN}=') for name in os.listdir(cache_dir))
+
+
+def saved_years(cache_dir=CLEANED_DATA_DIR):
+    """
+    Years that have a partition in the saved dataset, in order.
+    """
+    prefix = f'{PARTITION_COLUMN}='
+    return sorted(int(name[len(prefix):]) for name in os.listdir(cache_dir) if name.startswith(prefix))
+
+
+def nullable_dtype(dtype):
+    """
+    Nullable pandas type of a numpy integer type, such as UInt16 for uint16.
+    """
+    return np.dtype(dtype).name.replace('u', 'U').replace('int', 'Int')
+
+
+def cache_dtypes(cleaned_df):
+    """
+    Cached type of each column of cleaned_df in CACHE_DTYPES. A count column widened by apply_schema, as its
+    values do not fit the type of ANALYTICS_SCHEMA, keeps its wider type.
+    """
+    dtypes = {}
+    for column, dtype in CACHE_DTYPES.items():
+        if column not in cleaned_df:
+            continue
+        column_dtype = cleaned_df[column].dtype
+        if pd.api.types.is_integer_dtype(dtype) and pd.api.types.is_integer_dtype(column_dtype):
+            cached_dtype = pd.api.types.pandas_dtype(dtype).numpy_dtype
+            column_dtype = getattr(column_dtype, 'numpy_dtype', column_dtype)
+            dtype = nullable_dtype(np.promote_types(cached_dtype, column_dtype))
+        dtypes[column] = dtype
+    return dtypes
+
+
+def saved_integer_dtypes(cache_dir=CLEANED_DATA_DIR):
+    """
+    numpy type of every integer column saved in the dataset, besides the partition column.
+    """
+    schema = pyarrow.dataset.dataset(cache_dir, format='parquet', partitioning='hive').schema
+    return {field.name: np.dtype(field.type.to_pandas_dtype()) for field in schema
+            if pyarrow.types.is_integer(field.type) and field.name != PARTITION_COLUMN}
+
+
+def partitioned_df(cleaned_df):
+    """
+    Cleaned dataframe with the cached column types and the partition column.
+    """
+    typed_df = cleaned_df.astype(cache_dtypes(cleaned_df))
+    typed_df[PARTITION_COLUMN] = typed_df['CRASH TIME'].dt.year
+    return typed_df
+
+
+def save_cleaned_data(cleaned_df, cache_dir=CLEANED_DATA_DIR, high_water_mark=None):
+    """
+    Save the cleaned dataframe as a parquet dataset with one partition per year of CRASH TIME.
+    Any previously saved dataset in cache_dir is replaced. With a high water mark, new collisions
+    can later be appended to the dataset with append_cleaned_data.
+    """
+    typed_df = partitioned_df(cleaned_df)
+    if os.path.isdir(cache_dir):
+        shutil.rmtree(cache_dir)
+    typed_df.to_parquet(cache_dir, partition_cols=[PARTITION_COLUMN])
+    if high_water_mark is not None:
+        write_high_water_mark(high_water_mark, cache_dir)
+
+
+def append_cleaned_data(cleaned_df, cache_dir=CLEANED_DATA_DIR, name=None):
+    """
+    Add the rows of the cleaned dataframe to the saved dataset as new files in the partitions of their years,
+    the files already saved are left as they are. Index cleaned_df after the saved rows so they load last.
+    New integer columns take the types saved, a dataset cannot be read with differing types across its files,
+    so a ValueError is raised without appending when new values do not fit them.
+    With a name the new files are named after it, so remove_appended can take them out again.
+    """
+    if not len(cleaned_df):
+        return
+    typed_df = partitioned_df(cleaned_df)
+    for column, dtype in saved_integer_dtypes(cache_dir).items():
+        if column not in typed_df:
+            continue
+        values = typed_df[column]
+        info = np.iinfo(dtype)
+        if values.notna().any() and (values.min() < info.min or values.max() > info.max):
+            raise ValueError(f'{column} of the new collisions ranges from {values.min()} to {values.max()}, '
+                             f'beyond the saved {dtype.name}, save the cleaned data again')
+        typed_df[column] = values.astype(nullable_dtype(dtype))
+    if name is None:
+        typed_df.to_parquet(cache_dir, partition_cols=[PARTITION_COLUMN])
+    else:
+        typed_df.to_parquet(cache_dir, partition_cols=[PARTITION_COLUMN], basename_template=f'{name}-{{i}}.parquet')
+
+
+def remove_appended(name, cache_dir=CLEANED_DATA_DIR):
+    """
+    Remove the files append_cleaned_data wrote under name, and the partitions left without files.
+    """
+    prefix = f'{PARTITION_COLUMN}='
+    for partition in [entry for entry in os.listdir(cache_dir) if entry.startswith(prefix)]:
+        partition_dir = os.path.join(cache_dir, partition)
+        for file_name in os.listdir(partition_dir):
+            if file_name.startswith(f'{name}-'):
+                os.remove(os.path.join(partition_dir, file_name))
+        if not os.listdir(partition_dir):
+            os.rmdir(partition_dir)
+
+
+def replace_json(path, content):
+    """
+    Write content as json to path through a temporary file, so path holds either the old or the new content
+    even when the process stops part way.
+    """
+    temporary_path = f'{path}.tmp'
+    with open(temporary_path, 'w') as file:
+        json.dump(content, file, indent=2)
+    os.replace(temporary_path, path)
+
+
+def high_water_mark(collision_df, previous_mark=None):
+    """
+    Newest collision id and crash date among the raw rows of collision_df and the previous mark,
+    and the index the rows read after them start at.
+    """
+    mark = {'collision_id': None, 'crash_date': None, 'next_index': 0} if previous_mark is None else dict(previous_mark)
+    if len(collision_df):
+        collision_id = int(collision_df[COLLISION_ID_COLUMN].max())
+        crash_date = pd.to_datetime(collision_df['CRASH DATE'], format='%m/%d/%Y').max().strftime('%Y-%m-%d')
+        mark['collision_id'] = collision_id if mark['collision_id'] is None else max(mark['collision_id'], collision_id)
+        mark['crash_date'] = crash_date if mark['crash_date'] is None else max(mark['crash_date'], crash_date)
+        mark['next_index'] = max(mark['next_index'], int(collision_df.index.max()) + 1)
+    return mark
+
+
+def read_high_water_mark(cache_dir=CLEANED_DATA_DIR):
+    """
+    High water mark of the saved dataset, None when the dataset was saved without one.
+    """
+    path = os.path.join(cache_dir, HIGH_WATER_MARK_FILE)
+    if not os.path.isfile(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def write_high_water_mark(mark, cache_dir=CLEANED_DATA_DIR):
+    """
+    Save the high water mark in the dataset, replacing the previous one at once.
+    """
+    replace_json(os.path.join(cache_dir, HIGH_WATER_MARK_FILE), mark)
+
+
+def read_pending_append(cache_dir=CLEANED_DATA_DIR):
+    """
+    Name and high water mark of the append not yet committed, None when there is none.
+    """
+    path = os.path.join(cache_dir, PENDING_APPEND_FILE)
+    if not os.path.isfile(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def write_pending_append(name, mark, cache_dir=CLEANED_DATA_DIR):
+    """
+    Record an append about to start, with the high water mark that commits it once saved.
+    """
+    replace_json(os.path.join(cache_dir, PENDING_APPEND_FILE), {'name': name, 'mark': mark})
+
+
+def clear_pending_append(cache_dir=CLEANED_DATA_DIR):
+    """
+    Forget the pending append once it was committed or undone.
+    """
+    path = os.path.join(cache_dir, PENDING_APPEND_FILE)
+    if os.path.isfile(path):
+        os.remove(path)
+
+
+def load_cleaned_data(years=None, columns=None, cache_dir=CLEANED_DATA_DIR):
+    """
+    Load the cleaned dataframe from the parquet dataset, only reading the partitions of the given years
+    and the given columns, by default all of them. The partition column is kept as an int16 YEAR column.
+    """
+    read_columns = None if columns is None else list(columns) + [PARTITION_COLUMN]
+    filters = None if years is None else [(PARTITION_COLUMN, 'in', list(years))]
+    cleaned_df = pd.read_parquet(cache_dir, columns=read_columns, filters=filters)
+    # partitions are read one year after another, restore the original row order
+    cleaned_df.sort_index(inplace=True)
+    cleaned_df[PARTITION_COLUMN] = cleaned_df[PARTITION_COLUMN].astype(np.int16)
+    return cleaned_df
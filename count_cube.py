@@ -0,0 +1,164 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+import os
+
+# third party library
+import numpy as np
+
+# local
+from aggregation import AggregationKeys, WEEKDAY_NAMES, count_positions
+from columnar_cache import CLEANED_DATA_DIR
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# count cube saved alongside the cleaned data, parquet readers skip files starting with an underscore
+COUNT_CUBE_FILE = os.path.join(CLEANED_DATA_DIR, '_count_cube.npz')
+
+# count cube of an append not committed yet, it replaces the saved cube when the append commits
+STAGED_COUNT_CUBE_FILE = os.path.join(CLEANED_DATA_DIR, '_count_cube.staged.npz')
+
+# dimensions of the count cube in axis order
+CUBE_DIMENSIONS = ['year', 'month', 'day', 'hour', 'borough']
+
+# borough axis label of accidents without one of the given boroughs
+UNKNOWN_BOROUGH = 'UNKNOWN'
+
+# measures summed in the count cube
+CUBE_MEASURES = ['NUMBER OF PERSONS INJURED', 'NUMBER OF PERSONS KILLED', 'NUMBER OF PEDESTRIANS INJURED',
+                 'NUMBER OF PEDESTRIANS KILLED', 'NUMBER OF CYCLIST INJURED', 'NUMBER OF CYCLIST KILLED',
+                 'NUMBER OF MOTORIST INJURED', 'NUMBER OF MOTORIST KILLED']
+
+
+# ============================================================== #
+#  SECTION: Class Definitions                                   #
+# ============================================================== #
+
+class CountCube:
+    """
+    Dense accident counts and summed measures over year x month x day of the week x hour x borough.
+    Days are in pandas dayofweek order and the last borough is UNKNOWN_BOROUGH.
+    Queries are answered by selecting and summing over axes instead of scanning rows.
+    """
+
+    def __init__(self, years, boroughs, counts, measures):
+        self.years = [int(year) for year in years]
+        self.boroughs = list(boroughs)
+        self.counts = counts
+        self.measures = measures
+        self.domains = {
+            'year': self.years,
+            'month': list(range(1, 13)),
+            'day': WEEKDAY_NAMES,
+            'hour': list(range(24)),
+            'borough': self.boroughs + [UNKNOWN_BOROUGH]
+        }
+
+    def count_by(self, dimensions, measure=None):
+        """
+        Count accidents, or sum a measure, for every combination of values of the given dimensions.
+        Takes the same list of (dimension, domain) as AggregationKeys.count_by and returns the same array,
+        values that are not in the cube count as 0.
+        """
+        cube = self.counts if measure is None else self.measures[measure]
+        requested = dict(dimensions)
+        # sum over every axis that was not requested
+        for axis in reversed(range(len(CUBE_DIMENSIONS))):
+            if CUBE_DIMENSIONS[axis] not in requested:
+                cube = cube.sum(axis=axis)
+        remaining = [dimension for dimension in CUBE_DIMENSIONS if dimension in requested]
+        for axis, dimension in enumerate(remaining):
+            # pad the axis with a zero slice that values not in the cube select
+            pad_width = [(0, 1) if index == axis else (0, 0) for index in range(cube.ndim)]
+            axis_domain = self.domains[dimension]
+            positions = [axis_domain.index(value) if value in axis_domain else -1 for value in requested[dimension]]
+            cube = np.take(np.pad(cube, pad_width), positions, axis=axis)
+        return cube.transpose([remaining.index(dimension) for dimension, _ in dimensions])
+
+    def add(self, cleaned_df, measure_columns=None):
+        """
+        Count the accidents of cleaned_df, rows not yet in the cube, into the cube in place.
+        Years the cube does not have yet are added to it.
+        """
+        keys = AggregationKeys(cleaned_df, self.boroughs)
+        new_years = sorted(set(np.unique(keys.keys['year']).tolist()) - set(self.years))
+        if new_years:
+            self.add_years(new_years)
+        positions = cube_positions(keys, self.years)
+        self.counts += count_positions(positions, self.counts.shape)
+        for column in self.measures.keys() if measure_columns is None else measure_columns:
+            weights = cleaned_df[column].to_numpy(dtype=np.float64, na_value=0)
+            self.measures[column] += np.rint(count_positions(positions, self.counts.shape, weights=weights)).astype(np.int64)
+
+    def add_years(self, years):
+        """
+        Add years without accidents to the cube, keeping the year axis in order.
+        """
+        all_years = sorted(set(self.years) | set(int(year) for year in years))
+        kept = [all_years.index(year) for year in self.years]
+
+        def extend(cube):
+            extended = np.zeros((len(all_years),) + cube.shape[1:], dtype=cube.dtype)
+            extended[kept] = cube
+            return extended
+        self.counts = extend(self.counts)
+        self.measures = {column: extend(measure) for column, measure in self.measures.items()}
+        self.years = all_years
+        self.domains['year'] = self.years
+
+    def save(self, path=COUNT_CUBE_FILE):
+        """
+        Save the cube as a compressed numpy archive.
+        """
+        np.savez_compressed(path, years=self.years, boroughs=self.boroughs, counts=self.counts,
+                            measure_names=list(self.measures.keys()), measures=np.stack(list(self.measures.values())))
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def cube_positions(keys, years):
+    """
+    Position of every row along each axis of a cube of the given years.
+    """
+    return [
+        keys.positions('year', years),
+        keys.keys['month'].astype(np.int64) - 1,
+        keys.keys['day'].astype(np.int64),
+        keys.keys['hour'].astype(np.int64),
+        # accidents outside of the given boroughs go in the last borough position
+        np.where(keys.keys['borough'] < 0, len(keys.boroughs), keys.keys['borough']).astype(np.int64)
+    ]
+
+
+def build_count_cube(cleaned_df, boroughs, measure_columns=CUBE_MEASURES):
+    """
+    Count every accident of cleaned_df into a cube over all of its years and the given boroughs.
+    """
+    keys = AggregationKeys(cleaned_df, boroughs)
+    years = np.unique(keys.keys['year'])
+    positions = cube_positions(keys, years)
+    shape = (len(years), 12, 7, 24, len(keys.boroughs) + 1)
+    counts = count_positions(positions, shape)
+    measures = {}
+    for column in measure_columns:
+        weights = cleaned_df[column].to_numpy(dtype=np.float64, na_value=0)
+        measures[column] = np.rint(count_positions(positions, shape, weights=weights)).astype(np.int64)
+    return CountCube(years, boroughs, counts, measures)
+
+
+def load_count_cube(path=COUNT_CUBE_FILE):
+    """
+    Load a saved count cube, None when there is none.
+    """
+    if not os.path.isfile(path):
+        return None
+    with np.load(path) as archive:
+        measures = dict(zip(archive['measure_names'].tolist(), archive['measures']))
+        return CountCube(archive['years'].tolist(), archive['boroughs'].tolist(), archive['counts'], measures)
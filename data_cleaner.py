@@ -12,6 +12,7 @@ import progressbar
 
 
 # local
+from instrumentation import profiled
 
 
 # ============================================================== #
@@ -192,6 +193,25 @@ UNKNOWN = {'unk.', 'unkown','wanc','uknown' ,'unknow', 'unkl', 'unkow', 'unkwn',
 GENERALIZED_TYPE_TO_SPECIFIC = {'OBSTACLE': OBSTACLE,
                                 'PEDESTRIAN': PEDESTRIAN}
 
+# columns of little value
+USELESS_COLUMNS = ['LOCATION', 'ON STREET NAME', 'CROSS STREET NAME', 'OFF STREET NAME', 'ZIP CODE', 'COLLISION_ID']
+
+# columns that must be present for a row to be kept
+COMPLETE_COLUMNS = ['CRASH DATE', 'BOROUGH', 'LATITUDE', 'LONGITUDE']
+
+# contributing factor columns of each involved vehicle
+FACTOR_COLUMNS = ['CONTRIBUTING FACTOR VEHICLE {}'.format(column_type_index) for column_type_index in range(1, 6)]
+
+# vehicle type columns of each involved vehicle
+VEHICLE_TYPE_COLUMNS = ['VEHICLE TYPE CODE {}'.format(column_type_index) for column_type_index in range(1, 6)]
+
+# columns where a non zero count means a pedestrian was involved
+PEDESTRIAN_COUNT_COLUMNS = ['NUMBER OF PEDESTRIANS INJURED', 'NUMBER OF PEDESTRIANS KILLED',
+                            'NUMBER OF CYCLIST INJURED', 'NUMBER OF CYCLIST KILLED']
+
+# range of days
+DAYS = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+
 
 # ============================================================== #
 #  SECTION: Class Definitions                                   #
@@ -211,23 +231,17 @@ def quantize_numeric(value, bin_size, function=round):
     """Quantize value via function"""
     return function(value / bin_size) * bin_size
 
-# ============================================================== #
-#  SECTION: Main                                                 #
-# ============================================================== #
-
-
-if __name__ == '__main__':
-    # read motor_vehicle_collision data into data frame
-    print('Reading CSV into dataframe ')
-    collision_df = pd.read_csv(MOTOR_VEHICLE_COLLISIONS_CSV)
-    print('Complete!\n')
 
+@profiled(category='clean')
+def clean_collisions_iterrows(collision_df):
+    """
+    Reference implementation of the cleaning steps that walks the dataframe row by row.
+    Kept to verify and benchmark the vectorized cleaning pipeline against.
+    """
     # remove columns of little value
-    useless_columns = ['LOCATION', 'ON STREET NAME', 'CROSS STREET NAME', 'OFF STREET NAME', 'ZIP CODE', 'COLLISION_ID']
-    for column in useless_columns:
+    for column in USELESS_COLUMNS:
         del collision_df[column]
 
-    complete_columns = ['CRASH DATE', 'BOROUGH', 'LATITUDE', 'LONGITUDE']
     print('Dropping invalid rows')
     # initialize progress bar
     bar = progressbar.ProgressBar(maxval=len(collision_df),
@@ -252,7 +266,7 @@ if __name__ == '__main__':
             continue
 
         # mark rows that do not satisfy completeness requirements
-        for column in complete_columns:
+        for column in COMPLETE_COLUMNS:
             if pd.isnull(row[column]):
                 incomplete_dropped_indexes.append(row_index)
                 break
@@ -277,7 +291,8 @@ if __name__ == '__main__':
     bar = progressbar.ProgressBar(maxval=len(collision_df),
                                   widgets=[progressbar.Bar('=', '[', ']'), ' ', progressbar.Percentage()])
     bar.start()
-    unique_boroughs = set()
+    # the keys of a dictionary keep the boroughs in order of first appearance
+    unique_boroughs = dict()
     new_crash_time_column = []
     new_latitude_column = []
     new_longitude_column = []
@@ -294,7 +309,7 @@ if __name__ == '__main__':
         bar.update(row_index + 1)
 
         # grab unique boroughs for later step
-        unique_boroughs.add(row['BOROUGH'])
+        unique_boroughs[row['BOROUGH']] = None
 
     # replace old columns with new ones
     del collision_df['CRASH TIME']
@@ -307,7 +322,7 @@ if __name__ == '__main__':
 
     print('Ulterior Step Complete!')
     print('{} unique boroughs found'.format(len(unique_boroughs)))
-    print('Unique boroughs: {}\n'.format(unique_boroughs))
+    print('Unique boroughs: {}\n'.format(list(unique_boroughs)))
 
     # one hot coding data
     print('One hot coding data')
@@ -406,5 +421,23 @@ if __name__ == '__main__':
     del collision_df['BOROUGH']
     print('Complete!')
 
+    return collision_df
+
+
+# ============================================================== #
+#  SECTION: Main                                                 #
+# ============================================================== #
+
+
+if __name__ == '__main__':
+    from cleaning_pipeline import clean_collisions
+
+    # read motor_vehicle_collision data into data frame
+    print('Reading CSV into dataframe ')
+    collision_df = pd.read_csv(MOTOR_VEHICLE_COLLISIONS_CSV)
+    print('Complete!\n')
+
+    collision_df = clean_collisions(collision_df, print_step=True)
+
     # save cleaned data into csv
     collision_df.to_csv(CLEAN_MOTOR_VEHICLE_COLLISIONS_CSV, index=False)
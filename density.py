@@ -0,0 +1,255 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+
+# third party library
+import numpy as np
+from scipy.signal import fftconvolve
+from scipy.stats import gaussian_kde
+
+# local
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# ways of estimating the density
+DENSITY_METHODS = ['exact', 'fft']
+
+# number of grid points along each axis of a density grid
+DEFAULT_RESOLUTION = 100
+
+# named bandwidth rules, a number is used as the bandwidth factor like gaussian_kde's bw_method
+BANDWIDTH_RULES = ['scott', 'silverman', 'adaptive']
+
+# how strongly the adaptive bandwidth narrows in dense areas and widens in sparse ones,
+# 0.5 is Abramson's square root law
+ADAPTIVE_SENSITIVITY = 0.5
+
+# number of groups of similar local bandwidth the binned adaptive density is computed in
+ADAPTIVE_GROUPS = 16
+
+# number of points the exact adaptive density evaluates at a time
+EXACT_CHUNK_SIZE = 256
+
+# ways of shading a count image, eq_hist spreads the colors evenly over the counts present
+SHADING_METHODS = ['linear', 'log', 'eq_hist']
+
+
+# ============================================================== #
+#  SECTION: Class Definitions                                   #
+# ============================================================== #
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def linear_bin(lon, lat, lon_grid, lat_grid):
+    """
+    Spread each point over the four grid points around it, weighted by how close it is to each,
+    into an array of weights indexed by longitude then latitude grid position.
+    lon_grid and lat_grid must be evenly spaced.
+    """
+    weights = np.zeros((len(lon_grid), len(lat_grid)))
+    # fractional grid position of each point, points off the grid are left out
+    x = (np.asarray(lon, dtype=np.float64) - lon_grid[0]) / (lon_grid[1] - lon_grid[0])
+    y = (np.asarray(lat, dtype=np.float64) - lat_grid[0]) / (lat_grid[1] - lat_grid[0])
+    on_grid = (0 <= x) & (x <= len(lon_grid) - 1) & (0 <= y) & (y <= len(lat_grid) - 1)
+    x, y = x[on_grid], y[on_grid]
+    # index of the grid point below and left of each point, points on the last grid line use the cell before it
+    i = np.minimum(np.floor(x).astype(np.int64), len(lon_grid) - 2)
+    j = np.minimum(np.floor(y).astype(np.int64), len(lat_grid) - 2)
+    tx, ty = x - i, y - j
+    for di, dj, weight in [(0, 0, (1 - tx) * (1 - ty)), (1, 0, tx * (1 - ty)),
+                           (0, 1, (1 - tx) * ty), (1, 1, tx * ty)]:
+        flat_index = np.ravel_multi_index((i + di, j + dj), weights.shape)
+        weights += np.bincount(flat_index, weights=weight, minlength=weights.size).reshape(weights.shape)
+    return weights
+
+
+def gaussian_kernel_grid(covariance, lon_step, lat_step, lon_size, lat_size):
+    """
+    Gaussian kernel with the given covariance evaluated at every grid offset
+    from -(size - 1) to size - 1 steps along each axis.
+    """
+    dx = np.arange(-(lon_size - 1), lon_size) * lon_step
+    dy = np.arange(-(lat_size - 1), lat_size) * lat_step
+    offsets = np.stack(np.meshgrid(dx, dy, indexing='ij'), axis=-1)
+    inverse = np.linalg.inv(covariance)
+    quadratic = np.einsum('...i,ij,...j->...', offsets, inverse, offsets)
+    return np.exp(-0.5 * quadratic) / (2 * np.pi * np.sqrt(np.linalg.det(covariance)))
+
+
+def density_grid(extent, resolution=DEFAULT_RESOLUTION):
+    """
+    Evenly spaced longitude and latitude grid points covering an extent of
+    (min longitude, max longitude, min latitude, max latitude), resolution points along each axis.
+    """
+    min_lon, max_lon, min_lat, max_lat = extent
+    return np.linspace(min_lon, max_lon, resolution), np.linspace(min_lat, max_lat, resolution)
+
+
+def fixed_kernel(lon, lat, bandwidth='scott'):
+    """
+    Gaussian kernel of the points with a bandwidth rule or factor, the adaptive rule
+    starts from Scott's rule.
+    """
+    if isinstance(bandwidth, str) and bandwidth not in BANDWIDTH_RULES:
+        raise ValueError(f'bandwidth must be a number or one of {BANDWIDTH_RULES}, got {bandwidth!r}')
+    bw_method = 'scott' if bandwidth == 'adaptive' else bandwidth
+    return gaussian_kde(np.vstack([lon, lat]), bw_method=bw_method)
+
+
+def padded_grid(lon, lat, lon_grid, lat_grid):
+    """
+    Extend the grid by whole steps on each side until it covers every point, by at most its own size,
+    so points just outside the grid still add their kernel to it.
+    Returns the padded grids and the slices of the original grid within them.
+    """
+    def pad(values, grid):
+        step = grid[1] - grid[0]
+        before = int(np.clip(np.ceil((grid[0] - values.min()) / step), 0, len(grid)))
+        after = int(np.clip(np.ceil((values.max() - grid[-1]) / step), 0, len(grid)))
+        padded = grid[0] + np.arange(-before, len(grid) + after) * step
+        return padded, slice(before, before + len(grid))
+    lon_padded, lon_slice = pad(lon, lon_grid)
+    lat_padded, lat_slice = pad(lat, lat_grid)
+    return lon_padded, lat_padded, (lon_slice, lat_slice)
+
+
+def binned_sum(lon, lat, lon_grid, lat_grid, covariance):
+    """
+    Sum of the Gaussian kernels with the given covariance centred on the points, at every grid point.
+    """
+    if len(lon) == 0:
+        return np.zeros((len(lon_grid), len(lat_grid)))
+    lon_padded, lat_padded, within = padded_grid(lon, lat, lon_grid, lat_grid)
+    weights = linear_bin(lon, lat, lon_padded, lat_padded)
+    kernel_grid = gaussian_kernel_grid(covariance, lon_grid[1] - lon_grid[0], lat_grid[1] - lat_grid[0],
+                                       len(lon_padded), len(lat_padded))
+    return fftconvolve(weights, kernel_grid, mode='same')[within]
+
+
+def interpolate_grid(values, lon_grid, lat_grid, lon, lat):
+    """
+    Bilinearly interpolate values on the grid at the points, points off the grid take the nearest edge.
+    """
+    x = np.clip((lon - lon_grid[0]) / (lon_grid[1] - lon_grid[0]), 0, len(lon_grid) - 1)
+    y = np.clip((lat - lat_grid[0]) / (lat_grid[1] - lat_grid[0]), 0, len(lat_grid) - 1)
+    i = np.minimum(np.floor(x).astype(np.int64), len(lon_grid) - 2)
+    j = np.minimum(np.floor(y).astype(np.int64), len(lat_grid) - 2)
+    tx, ty = x - i, y - j
+    return ((1 - tx) * (1 - ty) * values[i, j] + tx * (1 - ty) * values[i + 1, j]
+            + (1 - tx) * ty * values[i, j + 1] + tx * ty * values[i + 1, j + 1])
+
+
+def adaptive_factors(lon, lat, kernel, lon_grid, lat_grid, sensitivity=ADAPTIVE_SENSITIVITY):
+    """
+    Factor each point's bandwidth is scaled by, from a fixed bandwidth pilot density at the point
+    relative to the geometric mean of the pilot densities: narrower where points are dense.
+    """
+    pilot = binned_sum(lon, lat, lon_grid, lat_grid, kernel.covariance) / kernel.n
+    pilot_at_points = np.maximum(interpolate_grid(pilot, lon_grid, lat_grid, lon, lat), np.finfo(np.float64).tiny)
+    log_pilot = np.log(pilot_at_points)
+    return np.exp(-sensitivity * (log_pilot - log_pilot.mean()))
+
+
+def binned_kde(lon, lat, lon_grid, lat_grid, bandwidth='scott'):
+    """
+    Approximate the Gaussian kernel density of the points at every point of the evenly spaced grid.
+    The points are binned onto the grid and convolved with the kernel through an FFT, so the cost
+    depends on the grid size instead of the number of points times the number of grid points.
+    Uses the same bandwidth as gaussian_kde, Scott's rule by default. The adaptive bandwidth
+    splits the points into groups of similar local bandwidth and convolves each group separately.
+    """
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    kernel = fixed_kernel(lon, lat, bandwidth)
+    if bandwidth != 'adaptive':
+        density_values = binned_sum(lon, lat, lon_grid, lat_grid, kernel.covariance) / kernel.n
+    else:
+        factors = adaptive_factors(lon, lat, kernel, lon_grid, lat_grid)
+        # equal sized groups of points by local bandwidth, each convolved with the group's mean bandwidth
+        order = np.argsort(factors)
+        density_values = np.zeros((len(lon_grid), len(lat_grid)))
+        for group in np.array_split(order, min(ADAPTIVE_GROUPS, len(order))):
+            factor = np.exp(np.log(factors[group]).mean())
+            density_values += binned_sum(lon[group], lat[group], lon_grid, lat_grid, kernel.covariance * factor ** 2)
+        density_values /= kernel.n
+    # FFT round off can leave tiny negative densities
+    return np.maximum(density_values, 0)
+
+
+def exact_kde(lon, lat, lon_grid, lat_grid, bandwidth='scott'):
+    """
+    Gaussian kernel density of the points at every grid point, evaluating every point's kernel.
+    """
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    lon_values, lat_values = np.meshgrid(lon_grid, lat_grid, indexing='ij')
+    kernel = fixed_kernel(lon, lat, bandwidth)
+    if bandwidth != 'adaptive':
+        return kernel(np.vstack([lon_values.ravel(), lat_values.ravel()])).reshape(lon_values.shape)
+    factors = adaptive_factors(lon, lat, kernel, lon_grid, lat_grid)
+    inverse = np.linalg.inv(kernel.covariance)
+    norm = 2 * np.pi * np.sqrt(np.linalg.det(kernel.covariance))
+    grid_points = np.stack([lon_values.ravel(), lat_values.ravel()], axis=-1)
+    density_values = np.zeros(len(grid_points))
+    for start in range(0, len(lon), EXACT_CHUNK_SIZE):
+        points = np.stack([lon[start:start + EXACT_CHUNK_SIZE], lat[start:start + EXACT_CHUNK_SIZE]], axis=-1)
+        chunk_factors = factors[start:start + EXACT_CHUNK_SIZE]
+        offsets = grid_points[:, None, :] - points[None, :, :]
+        quadratic = np.einsum('gpi,ij,gpj->gp', offsets, inverse, offsets) / chunk_factors ** 2
+        density_values += (np.exp(-0.5 * quadratic) / (norm * chunk_factors ** 2)).sum(axis=1)
+    return (density_values / kernel.n).reshape(lon_values.shape)
+
+
+def kde_error(lon, lat, lon_grid, lat_grid, bandwidth='scott'):
+    """
+    Largest difference between the binned and the exact kernel density over the grid,
+    relative to the largest exact density.
+    """
+    exact = exact_kde(lon, lat, lon_grid, lat_grid, bandwidth=bandwidth)
+    binned = binned_kde(lon, lat, lon_grid, lat_grid, bandwidth=bandwidth)
+    return np.abs(binned - exact).max() / exact.max()
+
+
+def count_image(x, y, extent, width, height):
+    """
+    Number of points in each pixel of a width by height image covering an extent of (min x, max x, min y, max y),
+    indexed by row from the bottom then column. Points outside the extent or without coordinates are left out.
+    """
+    min_x, max_x, min_y, max_y = extent
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    within = (min_x <= x) & (x <= max_x) & (min_y <= y) & (y <= max_y)
+    # points on the far edges of the extent fall in the last pixel, like the last bin of a histogram
+    column = np.minimum(((x[within] - min_x) / (max_x - min_x) * width).astype(np.int64), width - 1)
+    row = np.minimum(((y[within] - min_y) / (max_y - min_y) * height).astype(np.int64), height - 1)
+    return np.bincount(row * width + column, minlength=width * height).reshape(height, width)
+
+
+def shade_counts(counts, shading='eq_hist'):
+    """
+    Scale a count image to values from 0 to 1 for a colormap, with empty pixels masked so they are transparent.
+    log shades by the logarithm of the counts and eq_hist by the rank of each count among the pixels' counts.
+    """
+    if shading not in SHADING_METHODS:
+        raise ValueError(f'shading must be one of {SHADING_METHODS}, got {shading!r}')
+    empty = counts == 0
+    if empty.all():
+        return np.ma.masked_array(np.zeros(counts.shape), mask=empty)
+    if shading == 'linear':
+        values = counts / counts.max()
+    elif shading == 'log':
+        values = np.log1p(counts) / np.log1p(counts.max())
+    else:
+        # fraction of non empty pixels with at most the pixel's count
+        unique_counts, inverse, pixels = np.unique(counts[~empty], return_inverse=True, return_counts=True)
+        values = np.zeros(counts.shape)
+        values[~empty] = np.cumsum(pixels)[inverse] / pixels.sum()
+    return np.ma.masked_array(values, mask=empty)
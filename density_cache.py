@@ -0,0 +1,151 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+import hashlib
+import inspect
+import json
+import os
+
+# third party library
+import numpy as np
+
+# local
+import density
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# directory the computed density surfaces are saved in
+DENSITY_CACHE_DIR = 'density_cache'
+
+# total size of the saved density surfaces before the least recently used are removed, in bytes
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+
+# ============================================================== #
+#  SECTION: Class Definitions                                   #
+# ============================================================== #
+
+class DensityCache:
+    """
+    Density surfaces saved on disk as float32 .npy files named by a fingerprint of the
+    coordinates, the grid, bandwidth and method they were estimated with and the version of the estimators.
+    Surfaces are loaded memory mapped and the least recently used are removed once
+    the cache grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir=DENSITY_CACHE_DIR, max_bytes=DEFAULT_CACHE_BYTES, version=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.version = estimator_version() if version is None else version
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, lon, lat, **settings):
+        """
+        Fingerprint of the coordinates and the settings of the estimate.
+        Surfaces estimated by another version of the estimators have other keys.
+        """
+        digest = hashlib.sha256(self.version.encode())
+        for values in (lon, lat):
+            digest.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+        digest.update(json.dumps(settings, sort_keys=True, default=repr).encode())
+        return digest.hexdigest()
+
+    def path(self, key):
+        """
+        File the surface of a key is saved in.
+        """
+        return os.path.join(self.cache_dir, f'{key}.npy')
+
+    def get(self, key):
+        """
+        Memory map the saved surface of a key, None when there is none.
+        """
+        path = self.path(key)
+        # another process may remove the surface at any point, it is then missing
+        try:
+            # the modification time marks when a surface was last used
+            os.utime(path)
+            return np.load(path, mmap_mode='r')
+        except OSError:
+            return None
+
+    def put(self, key, density_values):
+        """
+        Save a surface as float32 and remove the least recently used surfaces past the size cap.
+        Returns the float32 surface saved.
+        """
+        path = self.path(key)
+        density_values = np.asarray(density_values, dtype=np.float32)
+        # write to a temporary file first so readers never see a partial surface
+        temporary_path = f'{path}.{os.getpid()}.tmp'
+        with open(temporary_path, 'wb') as file:
+            np.save(file, density_values)
+        os.replace(temporary_path, path)
+        self.evict()
+        return density_values
+
+    def evict(self):
+        """
+        Remove the least recently used surfaces until the cache is within max_bytes.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.npy'):
+                # another process may remove the surface first
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def size(self):
+        """
+        Total size of the saved surfaces, in bytes.
+        """
+        return sum(os.path.getsize(os.path.join(self.cache_dir, name))
+                   for name in os.listdir(self.cache_dir) if name.endswith('.npy'))
+
+    def clear(self):
+        """
+        Remove every saved surface.
+        """
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.npy'):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    def surface(self, lon, lat, estimate, **settings):
+        """
+        Saved surface of the coordinates and settings, estimating and saving it when it is missing.
+        estimate is called without arguments and returns the density values. The surface is float32
+        whether it was saved before or just estimated, so every render of it is the same.
+        """
+        key = self.key(lon, lat, **settings)
+        density_values = self.get(key)
+        if density_values is None:
+            density_values = self.put(key, estimate())
+        return density_values
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def estimator_version():
+    """
+    Hash of the code of the density estimators, changing the estimators changes the keys of their surfaces.
+    """
+    return hashlib.sha256(inspect.getsource(density).encode()).hexdigest()
@@ -0,0 +1,88 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+
+# third party library
+import numpy as np
+import pandas as pd
+
+# local
+from data_cleaner import GENERALIZED_CAUSE_TO_SPECIFIC, FACTOR_COLUMNS
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# generalized causes, the bit of a cause in a bitmask is its index
+CAUSE_COLUMNS = list(GENERALIZED_CAUSE_TO_SPECIFIC.keys())
+
+# bit of each generalized cause
+CAUSE_BITS = {cause: np.uint8(1 << bit) for bit, cause in enumerate(CAUSE_COLUMNS)}
+
+# how factors within more than one cause are resolved
+#   first - only the first cause in GENERALIZED_CAUSE_TO_SPECIFIC order, as data_cleaner always did
+#   all   - every cause that contains the factor
+RESOLVE_POLICIES = ['first', 'all']
+
+
+# ============================================================== #
+#  SECTION: Class Definitions                                   #
+# ============================================================== #
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def build_factor_index(resolve='first'):
+    """
+    Build an inverted index mapping each contributing factor to a bitmask of its generalized causes.
+    With resolve='first' a factor such as 'Aggressive Driving/Road Rage' that is within both the
+    personal and the drug related causes only maps to the personal cause, with resolve='all' it maps to both.
+    """
+    if resolve not in RESOLVE_POLICIES:
+        raise ValueError(f'resolve must be one of {RESOLVE_POLICIES}, got {resolve!r}')
+    factor_index = {}
+    for cause, specific_factors in GENERALIZED_CAUSE_TO_SPECIFIC.items():
+        for factor in specific_factors:
+            if resolve == 'first' and factor in factor_index:
+                continue
+            factor_index[factor] = factor_index.get(factor, np.uint8(0)) | CAUSE_BITS[cause]
+    return factor_index
+
+
+def multi_cause_factors():
+    """
+    Factors that are within more than one generalized cause mapped to the list of those causes.
+    """
+    causes = {}
+    for cause, specific_factors in GENERALIZED_CAUSE_TO_SPECIFIC.items():
+        for factor in specific_factors:
+            causes.setdefault(factor, []).append(cause)
+    return {factor: factor_causes for factor, factor_causes in causes.items() if len(factor_causes) > 1}
+
+
+def factor_bitmasks(df, columns=FACTOR_COLUMNS, factor_index=None):
+    """
+    Combine the factor columns of df into one bitmask of generalized causes per row.
+    All columns are factorized together so the index is only probed once per distinct factor.
+    """
+    if factor_index is None:
+        factor_index = build_factor_index()
+    codes, unique_factors = pd.factorize(df[columns].to_numpy(dtype=object).ravel())
+    # missing factors have no causes, they go last so the -1 code of pd.factorize indexes them
+    unique_masks = np.array([factor_index.get(factor, 0) for factor in unique_factors] + [0], dtype=np.uint8)
+    return np.bitwise_or.reduce(unique_masks[codes].reshape(len(df), len(columns)), axis=1)
+
+
+def factor_matrix(df, columns=FACTOR_COLUMNS, factor_index=None):
+    """
+    Multi-hot uint8 matrix of the generalized causes of each row of df,
+    one column per cause in CAUSE_COLUMNS order.
+    """
+    bitmasks = factor_bitmasks(df, columns=columns, factor_index=factor_index)
+    bits = np.arange(len(CAUSE_COLUMNS), dtype=np.uint8)
+    return (bitmasks[:, np.newaxis] >> bits) & 1
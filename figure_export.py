@@ -0,0 +1,202 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+from contextlib import contextmanager
+import json
+import os
+import re
+import sys
+
+# third party library
+import matplotlib.pyplot as plt
+
+# local
+from instrumentation import profiled, profiling
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# directory the batch export writes to by default, one directory per question like media/
+EXPORT_DIR = 'exported_media'
+
+# file listing every exported figure, written to the export directory
+MANIFEST_FILE = 'manifest.json'
+
+# exporter figures are saved by while a batch export is running, None when they are shown
+ACTIVE_EXPORTER = None
+
+
+# ============================================================== #
+#  SECTION: Class Definitions                                   #
+# ============================================================== #
+
+class FigureExporter:
+    """
+    Saves figures as PNGs under output_dir/<question>/ and records them for the manifest.
+    Figures are named by the given name or their title, repeated names get a numbered suffix.
+    """
+
+    def __init__(self, output_dir=EXPORT_DIR, dpi=None):
+        self.output_dir = output_dir
+        self.dpi = dpi
+        self.question = ''
+        self.outputs = []
+        self.paths = set()
+
+    def question_dir(self, question=None):
+        """
+        Directory of a question's figures, by default of the current question, created when missing.
+        """
+        question_dir = os.path.join(self.output_dir, self.question if question is None else question)
+        os.makedirs(question_dir, exist_ok=True)
+        return question_dir
+
+    def unique_path(self, name):
+        """
+        Path in the current question's directory for a figure name, not used by an earlier figure of the export.
+        """
+        stem = os.path.join(self.question_dir(), figure_file_name(name))
+        path, count = f'{stem}.png', 1
+        while path in self.paths:
+            count += 1
+            path = f'{stem}_{count}.png'
+        self.paths.add(path)
+        return path
+
+    def save(self, fig, name=None):
+        """
+        Save a figure under the current question and close it to free its memory.
+        """
+        title = figure_title(fig)
+        path = self.unique_path(name or title or 'figure')
+        fig.savefig(path, dpi=self.dpi)
+        plt.close(fig)
+        self.record(path, title)
+        return path
+
+    def record(self, path, title=''):
+        """
+        Add a figure saved elsewhere, such as by a rendering process, to the manifest.
+        """
+        self.paths.add(path)
+        self.outputs.append({'question': self.question, 'path': os.path.relpath(path, self.output_dir), 'title': title})
+
+    def write_manifest(self):
+        """
+        Write the list of exported figures to the manifest file of the export directory.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        manifest_path = os.path.join(self.output_dir, MANIFEST_FILE)
+        with open(manifest_path, 'w') as file:
+            json.dump({'figures': self.outputs}, file, indent=2)
+        return manifest_path
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def figure_file_name(name):
+    """
+    File name of a figure without extension, lowercase words joined by underscores.
+    """
+    return re.sub(r'[^a-z0-9-]+', '_', name.lower()).strip('_')
+
+
+def figure_title(fig):
+    """
+    Title of a figure, its suptitle or otherwise the title of its last axes with one.
+    """
+    if fig._suptitle is not None and fig._suptitle.get_text():
+        return fig._suptitle.get_text()
+    for ax in reversed(fig.axes):
+        if ax.get_title():
+            return ax.get_title()
+    return ''
+
+
+@contextmanager
+def batch_export(output_dir=EXPORT_DIR, dpi=None):
+    """
+    Save every figure finished with show_figure to output_dir instead of showing it, without a display.
+    The manifest is written and the previous backend restored when the export ends.
+    """
+    previous_backend = plt.get_backend()
+    plt.switch_backend('Agg')
+    exporter = FigureExporter(output_dir, dpi=dpi)
+    try:
+        with exporting_to(exporter):
+            yield exporter
+    finally:
+        exporter.write_manifest()
+        plt.close('all')
+        plt.switch_backend(previous_backend)
+
+
+@contextmanager
+def exporting_to(exporter):
+    """
+    Save the figures finished with show_figure by the exporter within the block.
+    """
+    global ACTIVE_EXPORTER
+    previous_exporter = ACTIVE_EXPORTER
+    ACTIVE_EXPORTER = exporter
+    try:
+        yield exporter
+    finally:
+        ACTIVE_EXPORTER = previous_exporter
+
+
+def active_exporter():
+    """
+    Exporter of the running batch export, None when figures are shown.
+    """
+    return ACTIVE_EXPORTER
+
+
+def export_question(question):
+    """
+    Save the following figures of a batch export under the question's directory.
+    """
+    if ACTIVE_EXPORTER is not None:
+        ACTIVE_EXPORTER.question = str(question)
+
+
+@profiled(category='render')
+def show_figure(name=None):
+    """
+    Show the current figure, or save and close it during a batch export.
+    """
+    if ACTIVE_EXPORTER is None:
+        plt.show()
+    else:
+        ACTIVE_EXPORTER.save(plt.gcf(), name)
+
+
+# ============================================================== #
+#  SECTION: Main                                                 #
+# ============================================================== #
+
+
+if __name__ == '__main__':
+    from analytics import load_cube, run_visualizations
+    from cache_manager import load_analytics_data, ensure_clean_collisions_csv
+    from density_cache import DensityCache
+    # run as a script this file is __main__, analytics saves figures through the exporter of the figure_export module
+    from figure_export import batch_export
+    from map_cache import keep_maps_on_disk
+    from year_executor import YearExecutor
+
+    keep_maps_on_disk()
+    # pass --profile to print the time spent in every stage and write its trace
+    with profiling(enabled='--profile' in sys.argv):
+        cleaned_df, year_df_dict = load_analytics_data(print_step=True)
+        ensure_clean_collisions_csv(print_step=True)
+        with batch_export() as exporter:
+            run_visualizations(cleaned_df, year_df_dict, cube=load_cube(cleaned_df), density_cache=DensityCache(),
+                               executor=YearExecutor())
+    print(f'Complete! {len(exporter.outputs)} figures written to {exporter.output_dir}')
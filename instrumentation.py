@@ -0,0 +1,302 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+from contextlib import contextmanager, nullcontext
+import functools
+import json
+import os
+import sys
+import threading
+import time
+try:
+    # the resource module is only available on unix
+    import resource
+except ImportError:
+    resource = None
+
+# third party library
+
+# local
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# Chrome trace event file a profiled run writes, open it in chrome://tracing or ui.perfetto.dev
+TRACE_FILE = 'profile_trace.json'
+
+# seconds between samples of the resident memory while profiling
+MEMORY_SAMPLE_INTERVAL = 0.005
+
+# bytes of a unit of the peak resident memory getrusage reports, kilobytes on linux and bytes on macOS
+MAX_RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+# where the rows a profiled function processes are counted from, its first argument or its result
+ROW_SOURCES = ['argument', 'result']
+
+# profiler stages are recorded by while a profiled run is going, None when profiling is disabled
+ACTIVE_PROFILER = None
+
+
+# ============================================================== #
+#  SECTION: Class Definitions                                   #
+# ============================================================== #
+
+class MemorySampler:
+    """
+    Samples the resident memory of the process in a background thread while it is entered,
+    peak is the most memory resident at any sample. peak is only changed holding lock,
+    so a sample is never lost while another thread resets it.
+    """
+
+    def __init__(self, interval=MEMORY_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.start = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def __enter__(self):
+        self.start = self.peak = current_memory()
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+        self.record(current_memory())
+
+    def sample(self):
+        """
+        Record the resident memory until the sampler is exited.
+        """
+        while not self.stopped.wait(self.interval):
+            self.record(current_memory())
+
+    def record(self, memory):
+        """
+        Raise the peak to memory if it is higher.
+        """
+        with self.lock:
+            self.peak = max(self.peak, memory)
+
+    def reset_peak(self, memory):
+        """
+        Start measuring a new peak from memory. Returns the peak so far.
+        """
+        with self.lock:
+            previous_peak = self.peak
+            self.peak = memory
+            return previous_peak
+
+    def restore_peak(self, previous_peak, memory):
+        """
+        End the peak started by reset_peak, at least memory, and carry it into previous_peak. Returns the ended peak.
+        """
+        with self.lock:
+            peak = max(self.peak, memory)
+            self.peak = max(previous_peak, peak)
+            return peak
+
+
+class Stage:
+    """
+    A stage of a profiled run, rows can be set within the stage when it is only known there.
+    """
+
+    def __init__(self, name, category, rows=None):
+        self.name = name
+        self.category = category
+        self.rows = rows
+
+
+class Profiler:
+    """
+    Records the wall time, CPU time, rows processed and peak memory increase of the stages of a run.
+    Stages nest, the peak memory of a stage includes the stages within it.
+    """
+
+    def __init__(self, sample_interval=MEMORY_SAMPLE_INTERVAL):
+        self.sampler = MemorySampler(sample_interval)
+        self.origin = time.perf_counter()
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name, category='stage', rows=None):
+        """
+        Record the block as a stage.
+        """
+        stage = Stage(name, category, rows)
+        # the peak of the enclosing stage is kept aside and the sampler measures this stage's peak
+        start_memory = current_memory()
+        enclosing_peak = self.sampler.reset_peak(start_memory)
+        start_cpu = time.process_time()
+        start = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            end = time.perf_counter()
+            cpu_seconds = time.process_time() - start_cpu
+            peak = self.sampler.restore_peak(enclosing_peak, current_memory())
+            self.stages.append({'name': stage.name, 'category': stage.category, 'start': start - self.origin,
+                                'seconds': end - start, 'cpu_seconds': cpu_seconds, 'rows': stage.rows,
+                                'peak_memory_delta_bytes': peak - start_memory, 'thread': threading.get_ident()})
+
+    def summary(self):
+        """
+        Totals of every stage name in order of first start: calls, wall and CPU seconds, rows,
+        rows per second and the largest peak memory increase.
+        """
+        totals = {}
+        for stage in sorted(self.stages, key=lambda stage: stage['start']):
+            total = totals.setdefault(stage['name'], {'name': stage['name'], 'calls': 0, 'seconds': 0, 'cpu_seconds': 0,
+                                                      'rows': None, 'peak_memory_delta_bytes': 0})
+            total['calls'] += 1
+            total['seconds'] += stage['seconds']
+            total['cpu_seconds'] += stage['cpu_seconds']
+            if stage['rows'] is not None:
+                total['rows'] = (total['rows'] or 0) + stage['rows']
+            total['peak_memory_delta_bytes'] = max(total['peak_memory_delta_bytes'], stage['peak_memory_delta_bytes'])
+        for total in totals.values():
+            has_rate = total['rows'] is not None and total['seconds'] > 0
+            total['rows_per_second'] = total['rows'] / total['seconds'] if has_rate else None
+        return list(totals.values())
+
+    def summary_table(self):
+        """
+        The summary as a text table.
+        """
+        lines = ['{:<50} {:>6} {:>10} {:>10} {:>12} {:>14} {:>10}'.format(
+            'stage', 'calls', 'wall s', 'cpu s', 'rows', 'rows/s', 'peak +MB')]
+        for total in self.summary():
+            lines.append('{:<50} {:>6} {:>10.3f} {:>10.3f} {:>12} {:>14} {:>10.1f}'.format(
+                total['name'][:50], total['calls'], total['seconds'], total['cpu_seconds'],
+                '' if total['rows'] is None else f"{total['rows']:,}",
+                '' if total['rows_per_second'] is None else f"{total['rows_per_second']:,.0f}",
+                total['peak_memory_delta_bytes'] / 1024 ** 2))
+        return '\n'.join(lines)
+
+    def trace_events(self):
+        """
+        The stages as Chrome trace events, complete events with microsecond timestamps.
+        """
+        pid = os.getpid()
+        return {'traceEvents': [{'name': stage['name'], 'cat': stage['category'], 'ph': 'X', 'pid': pid,
+                                 'tid': stage['thread'], 'ts': stage['start'] * 1e6, 'dur': stage['seconds'] * 1e6,
+                                 'args': {'cpu_seconds': stage['cpu_seconds'], 'rows': stage['rows'],
+                                          'peak_memory_delta_bytes': stage['peak_memory_delta_bytes']}}
+                                for stage in self.stages],
+                'displayTimeUnit': 'ms'}
+
+    def write_trace(self, trace_path=TRACE_FILE):
+        """
+        Write the Chrome trace events of the stages to trace_path.
+        """
+        with open(trace_path, 'w') as file:
+            json.dump(self.trace_events(), file)
+        return trace_path
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+# context of every stage while profiling is disabled, rows set on it are discarded
+DISABLED_STAGE = nullcontext(Stage('disabled', 'stage'))
+
+
+def current_memory():
+    """
+    Resident memory of this process in bytes, the peak so far where the current amount cannot be read,
+    such as on macOS, and 0 where neither can be, such as on Windows.
+    """
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        if resource is None:
+            return 0
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * MAX_RSS_UNIT
+
+
+def row_count(value):
+    """
+    Rows of a dataframe, series or array, or of the first of a tuple of them. None for anything else.
+    """
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    if hasattr(value, 'shape') and len(value.shape):
+        return value.shape[0]
+    return None
+
+
+@contextmanager
+def profiling(trace_path=TRACE_FILE, print_summary=True, enabled=True):
+    """
+    Profile the stages run within the block, writing their Chrome trace to trace_path, unless it is None,
+    and printing the summary table when the block ends. Yields the Profiler, None when not enabled.
+    """
+    global ACTIVE_PROFILER
+    if not enabled:
+        yield None
+        return
+    previous_profiler = ACTIVE_PROFILER
+    profiler = Profiler()
+    ACTIVE_PROFILER = profiler
+    try:
+        with profiler.sampler:
+            yield profiler
+    finally:
+        ACTIVE_PROFILER = previous_profiler
+        if trace_path is not None:
+            profiler.write_trace(trace_path)
+        if print_summary:
+            print(profiler.summary_table())
+
+
+def active_profiler():
+    """
+    Profiler of the running profiled run, None when profiling is disabled.
+    """
+    return ACTIVE_PROFILER
+
+
+def profile_stage(name, category='stage', rows=None):
+    """
+    Context recording the block as a stage of the running profiled run, doing nothing when profiling is disabled.
+    Yields the Stage to set its rows on.
+    """
+    if ACTIVE_PROFILER is None:
+        return DISABLED_STAGE
+    return ACTIVE_PROFILER.stage(name, category, rows)
+
+
+def profiled(category='stage', rows='argument', name=None):
+    """
+    Decorator recording every call of a function as a stage named after it while profiling.
+    Rows are counted from the function's first argument or from its result, while profiling
+    is disabled the function is called directly.
+    """
+    if rows not in ROW_SOURCES:
+        raise ValueError(f'rows must be one of {ROW_SOURCES}, got {rows!r}')
+
+    def decorator(function):
+        stage_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if ACTIVE_PROFILER is None:
+                return function(*args, **kwargs)
+            with ACTIVE_PROFILER.stage(stage_name, category, row_count(args[0]) if args and rows == 'argument' else None) as stage:
+                result = function(*args, **kwargs)
+                if rows == 'result':
+                    stage.rows = row_count(result)
+                return result
+        return wrapper
+    return decorator
@@ -0,0 +1,125 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+import hashlib
+import os
+import pickle
+
+# third party library
+import numpy as np
+from mpl_toolkits.basemap import Basemap
+from PIL import Image
+
+# local
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# directory the map projections and background images are saved in when kept on disk
+MAP_CACHE_DIR = 'map_cache'
+
+# longest side of a decoded background image in pixels, larger images are downsampled
+BACKGROUND_MAX_SIZE = 800
+
+
+# ============================================================== #
+#  SECTION: Class Definitions                                   #
+# ============================================================== #
+
+class MapCache:
+    """
+    Basemap projections and decoded background images built once per process and reused by every map.
+    With a cache_dir they are also pickled to disk so later processes skip building them too.
+    """
+
+    def __init__(self, cache_dir=None, background_max_size=BACKGROUND_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.background_max_size = background_max_size
+        self.basemaps = {}
+        self.backgrounds = {}
+
+    def disk_path(self, kind, key, extension):
+        """
+        File a projection or background is kept in on disk, None when not kept on disk.
+        """
+        if self.cache_dir is None:
+            return None
+        os.makedirs(self.cache_dir, exist_ok=True)
+        return os.path.join(self.cache_dir, f'{kind}_{key}.{extension}')
+
+    def basemap(self, **kwargs):
+        """
+        Basemap built with the keyword arguments.
+        """
+        key = hashlib.sha256(repr(sorted(kwargs.items())).encode()).hexdigest()[:16]
+        if key not in self.basemaps:
+            path = self.disk_path('basemap', key, 'pickle')
+            if path is not None and os.path.isfile(path):
+                with open(path, 'rb') as file:
+                    self.basemaps[key] = pickle.load(file)
+            else:
+                self.basemaps[key] = Basemap(**kwargs)
+                if path is not None:
+                    with open(path, 'wb') as file:
+                        pickle.dump(self.basemaps[key], file, protocol=pickle.HIGHEST_PROTOCOL)
+        map = self.basemaps[key]
+        forget_map_boundary(map)
+        return map
+
+    def background(self, image_path):
+        """
+        Decoded RGBA pixels of the image, downsampled so its longest side is at most background_max_size.
+        """
+        stat = os.stat(image_path)
+        key = hashlib.sha256(repr((os.path.abspath(image_path), stat.st_size, stat.st_mtime_ns,
+                                   self.background_max_size)).encode()).hexdigest()[:16]
+        if key not in self.backgrounds:
+            path = self.disk_path('background', key, 'npy')
+            if path is not None and os.path.isfile(path):
+                pixels = np.load(path)
+            else:
+                with Image.open(image_path) as im:
+                    im = im.convert('RGBA')
+                    im.thumbnail((self.background_max_size, self.background_max_size), Image.LANCZOS)
+                    pixels = np.asarray(im)
+                if path is not None:
+                    np.save(path, pixels)
+            pixels.flags.writeable = False
+            self.backgrounds[key] = pixels
+        return self.backgrounds[key]
+
+    def clear(self):
+        """
+        Forget the projections and backgrounds built by this process.
+        """
+        self.basemaps.clear()
+        self.backgrounds.clear()
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+# projections and backgrounds shared by every map of the process
+MAP_CACHE = MapCache()
+
+
+def forget_map_boundary(map):
+    """
+    Make a reused Basemap draw its map boundary again on the next axes.
+    Basemap keeps the boundary patch it drew in the private _mapboundarydrawn and adds that same patch to later axes,
+    which fails once the patch belongs to the axes of an earlier map. Versions without the attribute are left alone.
+    """
+    if hasattr(map, '_mapboundarydrawn'):
+        map._mapboundarydrawn = False
+
+
+def keep_maps_on_disk(cache_dir=MAP_CACHE_DIR):
+    """
+    Also keep the shared projections and backgrounds on disk in cache_dir.
+    """
+    MAP_CACHE.cache_dir = cache_dir
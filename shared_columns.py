@@ -0,0 +1,155 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+import json
+import os
+import shutil
+import tempfile
+
+# third party library
+import numpy as np
+import pandas as pd
+
+# local
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# directory the published columns are written under, memory backed where the system has one
+SHARED_COLUMNS_ROOT = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+# file describing the published columns, written next to them
+COLUMNS_MANIFEST = 'columns.json'
+
+# pandas arrays of the nullable numeric types by the kind of their values
+MASKED_ARRAYS = {'b': pd.arrays.BooleanArray, 'i': pd.arrays.IntegerArray, 'u': pd.arrays.IntegerArray,
+                 'f': pd.arrays.FloatingArray}
+
+
+# ============================================================== #
+#  SECTION: Class Definitions                                   #
+# ============================================================== #
+
+class SharedColumns:
+    """
+    Columns of a dataframe published as memory mapped .npy files in a directory, so any process
+    can attach to them by the directory's path and read them as numpy views without copying.
+    Categorical and string columns are published as integer codes with their categories in the manifest.
+    Nullable numeric columns, such as the UInt8 counts of the saved data, are published as their values with
+    missing values filled and a boolean mask of the missing values next to them.
+    The publishing process owns the directory and unlinks it when done, attached processes only close.
+    """
+
+    def __init__(self, directory, owner=False):
+        self.directory = directory
+        self.owner = owner
+        with open(os.path.join(directory, COLUMNS_MANIFEST)) as file:
+            manifest = json.load(file)
+        self.length = manifest['length']
+        self.columns = manifest['columns']
+        self.arrays = {column: np.load(os.path.join(directory, description['file']), mmap_mode='r')
+                       for column, description in self.columns.items()}
+        self.masks = {column: np.load(os.path.join(directory, description['mask']), mmap_mode='r')
+                      for column, description in self.columns.items() if description['kind'] == 'masked'}
+
+    def __len__(self):
+        return self.length
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        if self.owner:
+            self.unlink()
+
+    def values(self, column):
+        """
+        Values of a column as a numpy view, a categorical over the view of its codes
+        or a nullable array over the views of its values and mask.
+        """
+        description = self.columns[column]
+        if description['kind'] == 'category':
+            dtype = pd.CategoricalDtype(description['categories'], ordered=description['ordered'])
+            return pd.Categorical.from_codes(self.arrays[column], dtype=dtype)
+        if description['kind'] == 'masked':
+            values = self.arrays[column]
+            return MASKED_ARRAYS[values.dtype.kind](values, self.masks[column])
+        return self.arrays[column]
+
+    def frame(self, columns=None, rows=None):
+        """
+        Dataframe of the given columns, by default all, optionally only of the rows selected by a mask or index.
+        """
+        columns = list(self.columns) if columns is None else columns
+        if rows is None:
+            return pd.DataFrame({column: self.values(column) for column in columns}, copy=False)
+        return pd.DataFrame({column: self.values(column)[rows] for column in columns})
+
+    def close(self):
+        """
+        Drop this process's views of the columns.
+        """
+        self.arrays = {}
+        self.masks = {}
+
+    def unlink(self):
+        """
+        Remove the published columns, only once every process is done with them.
+        """
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def publish_columns(df, columns=None, root=SHARED_COLUMNS_ROOT):
+    """
+    Write the given columns of df, by default all, to a new directory under root and return the
+    owning SharedColumns. Other processes attach with attach_columns(shared.directory).
+    """
+    directory = tempfile.mkdtemp(prefix='shared_columns_', dir=root)
+    manifest = {'length': len(df), 'columns': {}}
+    try:
+        for index, column in enumerate(df.columns if columns is None else columns):
+            series = df[column]
+            description = {'file': f'{index}.npy'}
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                values = series.cat.codes.to_numpy()
+                description.update(kind='category', categories=series.cat.categories.tolist(),
+                                   ordered=bool(series.cat.ordered))
+            elif isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biufmM':
+                values = series.to_numpy()
+                description['kind'] = 'array'
+            elif isinstance(series.dtype, pd.api.extensions.ExtensionDtype) and \
+                    getattr(series.dtype, 'numpy_dtype', np.dtype(object)).kind in MASKED_ARRAYS:
+                # missing values are filled with 0, the mask tells them apart
+                mask = series.isna().to_numpy()
+                values = series.to_numpy(dtype=series.dtype.numpy_dtype, na_value=0)
+                description.update(kind='masked', mask=f'{index}_mask.npy')
+                np.save(os.path.join(directory, description['mask']), mask)
+            else:
+                # strings are published as codes, missing values are -1
+                codes, uniques = pd.factorize(series)
+                values = codes.astype(np.int32)
+                description.update(kind='category', categories=uniques.tolist(), ordered=False)
+            np.save(os.path.join(directory, description['file']), values)
+            manifest['columns'][column] = description
+        with open(os.path.join(directory, COLUMNS_MANIFEST), 'w') as file:
+            json.dump(manifest, file, default=str)
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    return SharedColumns(directory, owner=True)
+
+
+def attach_columns(directory):
+    """
+    Attach to columns published by another process.
+    """
+    return SharedColumns(directory)
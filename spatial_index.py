@@ -0,0 +1,241 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+
+# third party library
+import numpy as np
+
+# local
+from analytics import MAX_LATITUDE, MAX_LONGITUDE, METERS_PER_DEGREE, MIN_LATITUDE, MIN_LONGITUDE
+from data_cleaner import LATITUDE_BIN_SIZE, LONGITUDE_BIN_SIZE
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# fewest collisions in a cell for it to count as a hotspot
+HOTSPOT_MIN_COUNT = 10
+
+# minimum and maximum latitude and longitude the grid covers by default, the bounds cleaned coordinates are within
+NYC_EXTENT = ((MIN_LATITUDE, MIN_LONGITUDE), (MAX_LATITUDE, MAX_LONGITUDE))
+
+
+# ============================================================== #
+#  SECTION: Class Definitions                                   #
+# ============================================================== #
+
+class SpatialGridIndex:
+    """
+    Uniform grid over collision coordinates with the rows of each cell stored contiguously, like a CSR matrix:
+    the rows of cell c are rows[offsets[c]:offsets[c + 1]].
+    Box and radius queries only look at the cells they overlap, so they take time proportional to the rows
+    they return plus the rows of the cells along their border, instead of comparing every row.
+    The grid covers a fixed extent, by default the bounds of NYC, so outliers cannot stretch it. Rows are positions
+    in the indexed coordinates, rows outside the extent, such as those without coordinates, are not indexed.
+    """
+
+    def __init__(self, latitude, longitude, lat_bin_size=LATITUDE_BIN_SIZE, lon_bin_size=LONGITUDE_BIN_SIZE,
+                 extent=NYC_EXTENT):
+        latitude = np.asarray(latitude)
+        longitude = np.asarray(longitude)
+        self.lat_bin_size = lat_bin_size
+        self.lon_bin_size = lon_bin_size
+        (self.min_lat, self.min_lon), (max_lat, max_lon) = extent
+        self.shape = (int(self.cell_of([max_lat], self.min_lat, lat_bin_size)[0]) + 1,
+                      int(self.cell_of([max_lon], self.min_lon, lon_bin_size)[0]) + 1)
+        # comparisons with NaN are false, so rows without coordinates are outside the extent
+        within = (self.min_lat <= latitude) & (latitude <= max_lat) & (self.min_lon <= longitude) & (longitude <= max_lon)
+        indexed = np.flatnonzero(within)
+        lat_cells = self.cell_of(latitude[indexed], self.min_lat, lat_bin_size)
+        lon_cells = self.cell_of(longitude[indexed], self.min_lon, lon_bin_size)
+        cells = lat_cells * self.shape[1] + lon_cells
+
+        # the rows of a cell are in no particular order, queries sort the rows they return,
+        # which costs less than a stable sort of every row
+        order = np.argsort(cells)
+        self.rows = indexed[order]
+        # coordinates in cell order keep their type, so comparisons round bounds like comparing the dataframe does
+        self.latitude = latitude[self.rows]
+        self.longitude = longitude[self.rows]
+        self.counts = np.bincount(cells, minlength=self.shape[0] * self.shape[1]).reshape(self.shape)
+        self.offsets = np.concatenate([[0], np.cumsum(self.counts.ravel())])
+
+    def __len__(self):
+        return len(self.rows)
+
+    @staticmethod
+    def cell_of(values, origin, bin_size):
+        """
+        Cell along one axis of each coordinate.
+        """
+        return np.floor((np.asarray(values, dtype=np.float64) - origin) / bin_size).astype(np.int64)
+
+    def cell_span(self, low, high, origin, bin_size, cells):
+        """
+        First and last cell along one axis overlapping the range low to high, first > last when none do.
+        """
+        first, last = self.cell_of([low, high], origin, bin_size)
+        return max(int(first), 0), min(int(last), cells - 1)
+
+    def candidates(self, min_lat, min_lon, max_lat, max_lon):
+        """
+        Positions in cell order of every row in the cells overlapping the box.
+        """
+        lat_first, lat_last = self.cell_span(min_lat, max_lat, self.min_lat, self.lat_bin_size, self.shape[0])
+        lon_first, lon_last = self.cell_span(min_lon, max_lon, self.min_lon, self.lon_bin_size, self.shape[1])
+        if lat_first > lat_last or lon_first > lon_last:
+            return np.empty(0, dtype=np.int64)
+        # the cells of the box within a row of the grid are consecutive, so each row of the grid is one range
+        row_cells = np.arange(lat_first, lat_last + 1) * self.shape[1]
+        return concatenate_ranges(self.offsets[row_cells + lon_first], self.offsets[row_cells + lon_last + 1])
+
+    def within_box(self, coord1, coord2):
+        """
+        Rows strictly between the minimum latitude and longitude coord1 and the maximum coord2, in ascending order,
+        the same rows df_between_coords selects among the rows within the extent.
+        """
+        min_lat, min_lon = coord1
+        max_lat, max_lon = coord2
+        positions = self.candidates(min_lat, min_lon, max_lat, max_lon)
+        latitude = self.latitude[positions]
+        longitude = self.longitude[positions]
+        within = (min_lat < latitude) & (latitude < max_lat) & (min_lon < longitude) & (longitude < max_lon)
+        return np.sort(self.rows[positions[within]])
+
+    def within_radius(self, latitude, longitude, meters):
+        """
+        Rows within meters of a point in ascending order, and their distances in meters.
+        """
+        lat_delta = meters / METERS_PER_DEGREE
+        lon_delta = meters / (METERS_PER_DEGREE * np.cos(np.radians(latitude)))
+        positions = self.candidates(latitude - lat_delta, longitude - lon_delta, latitude + lat_delta, longitude + lon_delta)
+        distances = distance_meters(latitude, longitude, self.latitude[positions], self.longitude[positions])
+        within = distances <= meters
+        rows = self.rows[positions[within]]
+        order = np.argsort(rows)
+        return rows[order], distances[within][order]
+
+    def cell_rows(self, lat_cell, lon_cell):
+        """
+        Rows of a cell in ascending order.
+        """
+        cell = lat_cell * self.shape[1] + lon_cell
+        return np.sort(self.rows[self.offsets[cell]:self.offsets[cell + 1]])
+
+    def cell_center(self, lat_cell, lon_cell):
+        """
+        Latitude and longitude of the center of a cell.
+        """
+        return self.min_lat + (lat_cell + 0.5) * self.lat_bin_size, self.min_lon + (lon_cell + 0.5) * self.lon_bin_size
+
+    def hotspot(self, lat_cell, lon_cell, distance=None):
+        """
+        Description of a cell as a hotspot: its center, number of collisions, rows and optionally its distance.
+        """
+        center_lat, center_lon = self.cell_center(lat_cell, lon_cell)
+        hotspot = {'latitude': float(center_lat), 'longitude': float(center_lon), 'count': int(self.counts[lat_cell, lon_cell]),
+                   'rows': self.cell_rows(lat_cell, lon_cell)}
+        if distance is not None:
+            hotspot['distance'] = float(distance)
+        return hotspot
+
+    def hotspots(self, number=10):
+        """
+        The number cells with the most collisions, most first.
+        """
+        counts = self.counts.ravel()
+        number = min(number, len(counts))
+        if number <= 0:
+            return []
+        top = np.argpartition(counts, len(counts) - number)[len(counts) - number:]
+        top = top[np.argsort(-counts[top], kind='stable')]
+        return [self.hotspot(*np.unravel_index(cell, self.shape)) for cell in top]
+
+    def ring_cells(self, lat_cell, lon_cell, ring):
+        """
+        Cells of the grid ring cells away from a cell, the border of the square of cells around it.
+        """
+        lat_first, lat_last = max(lat_cell - ring, 0), min(lat_cell + ring, self.shape[0] - 1)
+        lon_first, lon_last = max(lon_cell - ring, 0), min(lon_cell + ring, self.shape[1] - 1)
+        if lat_first > lat_last or lon_first > lon_last:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        lat_cells, lon_cells = [], []
+        # the rows of cells above and below, then the columns of cells left and right between them
+        for border_lat in sorted({lat_cell - ring, lat_cell + ring}):
+            if lat_first <= border_lat <= lat_last:
+                lat_cells.append(np.full(lon_last - lon_first + 1, border_lat))
+                lon_cells.append(np.arange(lon_first, lon_last + 1))
+        between_first, between_last = max(lat_cell - ring + 1, 0), min(lat_cell + ring - 1, self.shape[0] - 1)
+        for border_lon in sorted({lon_cell - ring, lon_cell + ring}):
+            if lon_first <= border_lon <= lon_last and between_first <= between_last:
+                lat_cells.append(np.arange(between_first, between_last + 1))
+                lon_cells.append(np.full(between_last - between_first + 1, border_lon))
+        return np.concatenate(lat_cells), np.concatenate(lon_cells)
+
+    def nearest_hotspot(self, latitude, longitude, min_count=HOTSPOT_MIN_COUNT):
+        """
+        Closest cell with at least min_count collisions to a point, None when no cell has that many.
+        Rings of cells are searched outward from the cell of the point until no cell further out can be closer
+        than the closest hotspot found, so the time taken grows with the distance to it rather than the grid.
+        """
+        lat_cell = int(self.cell_of([latitude], self.min_lat, self.lat_bin_size)[0])
+        lon_cell = int(self.cell_of([longitude], self.min_lon, self.lon_bin_size)[0])
+        # a point is somewhere within its cell, so the centers of ring r are at least r - 0.5 cells away
+        cell_meters = min(self.lat_bin_size * METERS_PER_DEGREE,
+                          self.lon_bin_size * METERS_PER_DEGREE * np.cos(np.radians(latitude)))
+        last_ring = max(lat_cell, self.shape[0] - 1 - lat_cell, lon_cell, self.shape[1] - 1 - lon_cell)
+        nearest = None
+        for ring in range(max(last_ring, 0) + 1):
+            if nearest is not None and nearest[2] <= (ring - 0.5) * cell_meters:
+                break
+            lat_cells, lon_cells = self.ring_cells(lat_cell, lon_cell, ring)
+            hot = self.counts[lat_cells, lon_cells] >= min_count
+            if not hot.any():
+                continue
+            lat_cells, lon_cells = lat_cells[hot], lon_cells[hot]
+            center_lat, center_lon = self.cell_center(lat_cells, lon_cells)
+            distances = distance_meters(latitude, longitude, center_lat, center_lon)
+            closest = np.argmin(distances)
+            if nearest is None or distances[closest] < nearest[2]:
+                nearest = (lat_cells[closest], lon_cells[closest], distances[closest])
+        if nearest is None:
+            return None
+        return self.hotspot(*nearest[:2], distance=nearest[2])
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def concatenate_ranges(starts, ends):
+    """
+    Every position of the ranges starts[i] to ends[i] one after another, without a loop over the ranges.
+    """
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    # position of each range's first value within the result
+    range_starts = np.cumsum(lengths) - lengths
+    return np.repeat(starts - range_starts, lengths) + np.arange(total)
+
+
+def distance_meters(latitude, longitude, latitudes, longitudes):
+    """
+    Distance in meters from a point to each of the points, with an equirectangular projection around the point,
+    accurate within a city.
+    """
+    lat_meters = (np.asarray(latitudes, dtype=np.float64) - latitude) * METERS_PER_DEGREE
+    lon_meters = (np.asarray(longitudes, dtype=np.float64) - longitude) * METERS_PER_DEGREE * np.cos(np.radians(latitude))
+    return np.hypot(lat_meters, lon_meters)
+
+
+def build_spatial_index(df, lat_bin_size=LATITUDE_BIN_SIZE, lon_bin_size=LONGITUDE_BIN_SIZE):
+    """
+    Index the coordinates of df, rows are positions for df.iloc.
+    """
+    return SpatialGridIndex(df['LATITUDE'].to_numpy(), df['LONGITUDE'].to_numpy(),
+                            lat_bin_size=lat_bin_size, lon_bin_size=lon_bin_size)
@@ -0,0 +1,160 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+import os
+import tracemalloc
+
+# third party library
+import pandas as pd
+
+# local
+from analytics import MOTOR_VEHICLE_COLLISIONS_CSV, ANALYTICS_COLUMNS, ANALYTICS_DTYPES, clean_collision_df
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# cleaned output of streaming the collision data
+STREAMED_ANALYTICS_CSV = 'streamed_analytics_data.csv'
+
+# default peak memory reading and cleaning a chunk may use, in bytes
+DEFAULT_MEMORY_LIMIT = 256 * 1024 ** 2
+
+# rows read in the first chunks, before the memory of a row has been measured
+INITIAL_CHUNK_SIZE = 10000
+
+# first chunks whose peak memory is traced, the parser holds more memory from the second chunk on
+TRACED_CHUNKS = 2
+
+
+# ============================================================== #
+#  SECTION: Class Definitions                                   #
+# ============================================================== #
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def chunk_memory(chunk, cleaned_chunk):
+    """
+    Memory of a parsed chunk and its cleaned chunk together, in bytes, strings included.
+    """
+    return int(chunk.memory_usage(deep=True).sum() + cleaned_chunk.memory_usage(deep=True).sum())
+
+
+def traced_peak(function, *args):
+    """
+    Result of calling function and the peak memory allocated while it ran, in bytes, traced by tracemalloc,
+    which numpy and pandas report their buffers to on every platform.
+    """
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    start_memory = tracemalloc.get_traced_memory()[0]
+    try:
+        result = function(*args)
+        return result, tracemalloc.get_traced_memory()[1] - start_memory
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+
+
+def read_and_clean(reader, rows, clean_chunk):
+    """
+    Next chunk of rows of the reader and the chunk cleaned by clean_chunk.
+    """
+    chunk = reader.get_chunk(rows)
+    return chunk, clean_chunk(chunk)
+
+
+def chunk_size_for_memory_limit(row_bytes, memory_limit=DEFAULT_MEMORY_LIMIT):
+    """
+    Largest number of rows of row_bytes each that can be read and cleaned within memory_limit.
+    """
+    return max(1, int(memory_limit // row_bytes))
+
+
+def iter_clean_chunks(csv_path=MOTOR_VEHICLE_COLLISIONS_CSV, chunk_size=None, memory_limit=DEFAULT_MEMORY_LIMIT,
+                      clean_chunk=clean_collision_df, usecols=ANALYTICS_COLUMNS, dtype=ANALYTICS_DTYPES):
+    """
+    Read csv_path in chunks with explicit dtypes and columns and yield each chunk cleaned by clean_chunk
+    with the memory of the chunk, empty chunks are skipped. A fixed chunk_size reads that many rows at a time.
+    Otherwise the chunk size is resized after every chunk so reading and cleaning a chunk peaks within
+    memory_limit. The memory of the parsed and cleaned dataframes of every chunk is measured with
+    memory_usage(deep=True). Reading and cleaning hold temporary copies besides them, so the peaks of the first
+    TRACED_CHUNKS chunks of at most INITIAL_CHUNK_SIZE rows are traced, which slows them down several times,
+    and the largest ratio of a peak to its dataframes scales the later chunks. The parser holds a few MB
+    whatever the size of a chunk, keep memory_limit well above that.
+    """
+    reader = pd.read_csv(csv_path, usecols=usecols, dtype=dtype, iterator=True)
+    next_chunk_size = chunk_size or INITIAL_CHUNK_SIZE
+    # peak memory of reading and cleaning each traced chunk relative to its dataframes
+    overheads = []
+    with reader:
+        while True:
+            traced = chunk_size is None and len(overheads) < TRACED_CHUNKS
+            try:
+                if traced:
+                    (chunk, cleaned_chunk), peak = traced_peak(read_and_clean, reader, next_chunk_size, clean_chunk)
+                else:
+                    chunk, cleaned_chunk = read_and_clean(reader, next_chunk_size, clean_chunk)
+            except StopIteration:
+                return
+            if not len(chunk):
+                continue
+            memory = chunk_memory(chunk, cleaned_chunk)
+            if chunk_size is None:
+                if traced:
+                    overheads.append(peak / memory)
+                next_chunk_size = chunk_size_for_memory_limit(memory * max(overheads + [1]) / len(chunk), memory_limit)
+                if len(overheads) < TRACED_CHUNKS:
+                    next_chunk_size = min(next_chunk_size, INITIAL_CHUNK_SIZE)
+            yield cleaned_chunk, memory
+
+
+def stream_clean_data(output_path=STREAMED_ANALYTICS_CSV, csv_path=MOTOR_VEHICLE_COLLISIONS_CSV, chunk_size=None,
+                      memory_limit=DEFAULT_MEMORY_LIMIT, clean_chunk=clean_collision_df, print_step=False):
+    """
+    Clean csv_path chunk by chunk and append each cleaned chunk to output_path,
+    so the whole data file is never in memory at once.
+    The chunks are written to a temporary file that replaces output_path once every chunk is written,
+    a csv_path without collisions gives an output_path with only the header.
+    Returns the number of cleaned rows written.
+    """
+    temporary_path = f'{output_path}.tmp'
+    rows_written = 0
+    chunks_written = 0
+    chunks = iter_clean_chunks(csv_path, chunk_size=chunk_size, memory_limit=memory_limit, clean_chunk=clean_chunk)
+    try:
+        for chunk_index, (cleaned_chunk, memory) in enumerate(chunks):
+            cleaned_chunk.to_csv(temporary_path, mode='w' if chunk_index == 0 else 'a', header=chunk_index == 0,
+                                 index=False)
+            rows_written += len(cleaned_chunk)
+            chunks_written += 1
+            if print_step:
+                print(f'Chunk {chunk_index}: {len(cleaned_chunk)} rows written, '
+                      f'chunk memory {memory / 1024 ** 2:.0f} MB')
+        if not chunks_written:
+            empty_df = pd.read_csv(csv_path, nrows=0, usecols=ANALYTICS_COLUMNS, dtype=ANALYTICS_DTYPES)
+            clean_chunk(empty_df).to_csv(temporary_path, index=False)
+        os.replace(temporary_path, output_path)
+    finally:
+        if os.path.isfile(temporary_path):
+            os.remove(temporary_path)
+    return rows_written
+
+
+# ============================================================== #
+#  SECTION: Main                                                 #
+# ============================================================== #
+
+
+if __name__ == '__main__':
+    print('Streaming CSV into', STREAMED_ANALYTICS_CSV)
+    rows = stream_clean_data(print_step=True)
+    print(f'Complete! {rows} rows written')
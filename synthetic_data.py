@@ -0,0 +1,293 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+import sys
+
+# third party library
+import numpy as np
+import pandas as pd
+
+# local
+from analytics import BOROUGH_BOUNDS
+from data_cleaner import GENERALIZED_CAUSE_TO_SPECIFIC, VEHICLE, OBSTACLE, PEDESTRIAN, UNKNOWN, \
+    FACTOR_COLUMNS, VEHICLE_TYPE_COLUMNS
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# CSV the synthetic collisions are written to when run as a script, so the Dataset is never overwritten
+SYNTHETIC_COLLISIONS_CSV = 'Synthetic_Motor_Vehicle_Collisions_-_Crashes.csv'
+
+# seed of the generated collisions
+DEFAULT_SEED = 0
+
+# rows generated at a time, so millions of rows are written with bounded memory
+DEFAULT_CHUNK_SIZE = 500000
+
+# first and last crash date of the generated collisions, a little outside the selected years like the Dataset
+FIRST_CRASH_DATE = '2012-07-01'
+LAST_CRASH_DATE = '2021-03-31'
+
+# share of the collisions in each borough, roughly that of the Dataset
+BOROUGH_WEIGHTS = {
+    'BROOKLYN': 0.30,
+    'QUEENS': 0.26,
+    'MANHATTAN': 0.21,
+    'BRONX': 0.15,
+    'STATEN ISLAND': 0.08
+}
+
+# accident hot spots per borough the coordinates are clustered around
+CLUSTERS_PER_BOROUGH = 12
+
+# standard deviation of the coordinates around a hot spot relative to the size of the borough's bounds
+CLUSTER_SPREAD = 0.08
+
+# share of the collisions with no borough, most of them still have coordinates
+MISSING_BOROUGH_RATE = 0.3
+
+# shares of dirty rows: missing coordinates, coordinates of 0, coordinates outside NYC and missing counts
+MISSING_COORDINATE_RATE = 0.06
+ZERO_COORDINATE_RATE = 0.02
+OUTSIDE_NYC_RATE = 0.001
+MISSING_COUNT_RATE = 0.0005
+
+# longitude of the Queensboro Bridge edge case with no borough the cleaning repairs
+QUEENSBORO_BRIDGE_LONGITUDE = -201.23706
+
+# share of the collisions involving 1 to 5 vehicles
+VEHICLE_COUNT_WEIGHTS = [0.20, 0.65, 0.10, 0.04, 0.01]
+
+# share of the contributing factors that are left unspecified, and that are invalid codes
+UNSPECIFIED_FACTOR_RATE = 0.35
+INVALID_FACTOR_RATE = 0.002
+INVALID_FACTORS = ['1', '80']
+
+# vehicle types as they are spelled in the Dataset, most vehicle type codes are one of these
+COMMON_VEHICLE_TYPES = ['Sedan', 'Station Wagon/Sport Utility Vehicle', 'PASSENGER VEHICLE',
+                        'SPORT UTILITY / STATION WAGON', 'Taxi', 'Pick-up Truck', 'Box Truck', 'Bus', 'Bike',
+                        'Motorcycle', 'Van', 'Tractor Truck Diesel']
+
+# share of the vehicle type codes taken from the data cleaner's sets, and misspelled beyond recognition
+RARE_VEHICLE_TYPE_RATE = 0.2
+UNRECOGNIZED_VEHICLE_TYPE_RATE = 0.002
+UNRECOGNIZED_VEHICLE_TYPES = ['Xyzzy', 'Qqqq', '???']
+
+# rates of the people injured and killed per collision
+INJURY_RATES = {'PEDESTRIANS': 0.03, 'CYCLIST': 0.01, 'MOTORIST': 0.2}
+DEATH_RATES = {'PEDESTRIANS': 0.0006, 'CYCLIST': 0.00005, 'MOTORIST': 0.0003}
+
+# columns of the Dataset in order
+RAW_COLUMNS = ['CRASH DATE', 'CRASH TIME', 'BOROUGH', 'ZIP CODE', 'LATITUDE', 'LONGITUDE', 'LOCATION',
+               'ON STREET NAME', 'CROSS STREET NAME', 'OFF STREET NAME',
+               'NUMBER OF PERSONS INJURED', 'NUMBER OF PERSONS KILLED',
+               'NUMBER OF PEDESTRIANS INJURED', 'NUMBER OF PEDESTRIANS KILLED',
+               'NUMBER OF CYCLIST INJURED', 'NUMBER OF CYCLIST KILLED',
+               'NUMBER OF MOTORIST INJURED', 'NUMBER OF MOTORIST KILLED'] + FACTOR_COLUMNS + \
+              ['COLLISION_ID'] + VEHICLE_TYPE_COLUMNS
+
+# street names the collisions happen on
+STREET_NAMES = ['BROADWAY', 'ATLANTIC AVENUE', 'NORTHERN BOULEVARD', 'QUEENS BOULEVARD', 'FLATBUSH AVENUE',
+                'GRAND CONCOURSE', 'HYLAN BOULEVARD', '3 AVENUE', 'LINDEN BOULEVARD', 'BELT PARKWAY']
+
+# first COLLISION_ID of the generated collisions
+FIRST_COLLISION_ID = 3000000
+
+
+# ============================================================== #
+#  SECTION: Class Definitions                                   #
+# ============================================================== #
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def borough_clusters(rng, clusters_per_borough=CLUSTERS_PER_BOROUGH):
+    """
+    Hot spots of every borough, uniformly placed within its BOROUGH_BOUNDS.
+    Returns a dictionary of borough to its hot spots' latitudes and longitudes and the spread around them.
+    """
+    clusters = {}
+    for borough in BOROUGH_WEIGHTS.keys():
+        (min_lat, min_lon), (max_lat, max_lon) = BOROUGH_BOUNDS[borough]
+        centers = rng.uniform((min_lat, min_lon), (max_lat, max_lon), size=(clusters_per_borough, 2))
+        spread = CLUSTER_SPREAD * np.array([max_lat - min_lat, max_lon - min_lon])
+        clusters[borough] = (centers, spread)
+    return clusters
+
+
+def clustered_coordinates(rng, borough_codes, clusters):
+    """
+    Latitude and longitude of each collision around a random hot spot of its borough, kept within the borough's bounds.
+    """
+    coordinates = np.empty((len(borough_codes), 2))
+    for code, borough in enumerate(BOROUGH_WEIGHTS.keys()):
+        rows = np.flatnonzero(borough_codes == code)
+        centers, spread = clusters[borough]
+        points = centers[rng.integers(0, len(centers), len(rows))] + rng.normal(0, 1, (len(rows), 2)) * spread
+        coordinates[rows] = np.clip(points, *BOROUGH_BOUNDS[borough])
+    return np.round(coordinates[:, 0], 6), np.round(coordinates[:, 1], 6)
+
+
+def sample_strings(rng, values, size, p=None):
+    """
+    Sample size strings of values as an object array, None stays missing.
+    """
+    return np.array(values, dtype=object)[rng.choice(len(values), size, p=p)]
+
+
+def crash_dates(first_crash_date=FIRST_CRASH_DATE, last_crash_date=LAST_CRASH_DATE):
+    """
+    Every crash date between the first and last as CRASH DATE strings, formatted once and indexed by the rows.
+    """
+    return pd.date_range(first_crash_date, last_crash_date, freq='D').strftime('%m/%d/%Y').to_numpy(dtype=object)
+
+
+def crash_times():
+    """
+    Every minute of the day as CRASH TIME strings, hours are not zero padded like the Dataset.
+    """
+    return np.array([f'{hour}:{minute:02d}' for hour in range(24) for minute in range(60)], dtype=object)
+
+
+def factor_values():
+    """
+    Contributing factors a factor column is sampled from, sorted so the samples do not depend on set order.
+    """
+    return sorted(set().union(*GENERALIZED_CAUSE_TO_SPECIFIC.values()))
+
+
+def rare_vehicle_types():
+    """
+    Vehicle types of the data cleaner's sets, sorted so the samples do not depend on set order.
+    """
+    return sorted(VEHICLE | OBSTACLE | PEDESTRIAN | UNKNOWN)
+
+
+def synthetic_chunk(rng, size, first_row, clusters, dates, times):
+    """
+    Dataframe of size synthetic raw collisions with the columns of the Dataset, including dirty rows.
+    """
+    df = pd.DataFrame({'CRASH DATE': dates[rng.integers(0, len(dates), size)],
+                       'CRASH TIME': times[rng.integers(0, len(times), size)]})
+
+    # boroughs, some collisions only have coordinates
+    boroughs = np.array(list(BOROUGH_WEIGHTS.keys()), dtype=object)
+    borough_codes = rng.choice(len(boroughs), size, p=list(BOROUGH_WEIGHTS.values()))
+    borough = boroughs[borough_codes]
+    borough[rng.random(size) < MISSING_BOROUGH_RATE] = None
+    df['BOROUGH'] = borough
+    zip_code = rng.integers(10001, 11698, size).astype(np.float64)
+    zip_code[pd.isna(borough)] = np.nan
+    df['ZIP CODE'] = zip_code
+
+    # coordinates clustered within the boroughs, with missing, zero and out of NYC coordinates
+    latitude, longitude = clustered_coordinates(rng, borough_codes, clusters)
+    missing = rng.random(size) < MISSING_COORDINATE_RATE
+    latitude[missing] = np.nan
+    longitude[missing] = np.nan
+    zero = rng.random(size) < ZERO_COORDINATE_RATE
+    latitude[zero] = 0
+    longitude[zero] = 0
+    outside = np.flatnonzero(rng.random(size) < OUTSIDE_NYC_RATE)
+    latitude[outside] = np.round(rng.uniform(30, 50, len(outside)), 6)
+    longitude[outside] = np.round(rng.uniform(-90, -60, len(outside)), 6)
+    if len(outside):
+        # the Queensboro Bridge edge case
+        longitude[outside[0]] = QUEENSBORO_BRIDGE_LONGITUDE
+        borough[outside[0]] = None
+        df['BOROUGH'] = borough
+    df['LATITUDE'] = latitude
+    df['LONGITUDE'] = longitude
+    location = '(' + pd.Series(latitude).astype(str) + ', ' + pd.Series(longitude).astype(str) + ')'
+    df['LOCATION'] = location.where(~np.isnan(latitude), None).to_numpy(dtype=object)
+
+    # streets, off street collisions have no on and cross street
+    off_street = rng.random(size) < 0.15
+    on_street = sample_strings(rng, STREET_NAMES, size)
+    cross_street = sample_strings(rng, STREET_NAMES, size)
+    on_street[off_street] = None
+    cross_street[off_street] = None
+    df['ON STREET NAME'] = on_street
+    df['CROSS STREET NAME'] = cross_street
+    df['OFF STREET NAME'] = np.where(off_street, sample_strings(rng, STREET_NAMES, size), None)
+
+    # people injured and killed, the persons are the sum of the others
+    injured = {person: rng.poisson(rate, size) for person, rate in INJURY_RATES.items()}
+    killed = {person: (rng.random(size) < rate).astype(np.int64) for person, rate in DEATH_RATES.items()}
+    df['NUMBER OF PERSONS INJURED'] = sum(injured.values()).astype(np.float64)
+    df['NUMBER OF PERSONS KILLED'] = sum(killed.values()).astype(np.float64)
+    for person in INJURY_RATES.keys():
+        df[f'NUMBER OF {person} INJURED'] = injured[person].astype(np.float64)
+        df[f'NUMBER OF {person} KILLED'] = killed[person].astype(np.float64)
+    for column in ['NUMBER OF PERSONS INJURED', 'NUMBER OF PERSONS KILLED']:
+        df.loc[rng.random(size) < MISSING_COUNT_RATE, column] = np.nan
+
+    # a factor and a vehicle type per vehicle involved
+    vehicle_count = rng.choice(len(VEHICLE_COUNT_WEIGHTS), size, p=VEHICLE_COUNT_WEIGHTS) + 1
+    factors = factor_values()
+    rare_types = rare_vehicle_types()
+    factor_columns = {}
+    vehicle_type_columns = {}
+    for index, (factor_column, vehicle_type_column) in enumerate(zip(FACTOR_COLUMNS, VEHICLE_TYPE_COLUMNS)):
+        involved = vehicle_count > index
+        factor = sample_strings(rng, factors, size)
+        factor[rng.random(size) < UNSPECIFIED_FACTOR_RATE] = 'Unspecified'
+        invalid = rng.random(size) < INVALID_FACTOR_RATE
+        factor[invalid] = sample_strings(rng, INVALID_FACTORS, invalid.sum())
+        factor[~involved] = None
+        factor_columns[factor_column] = factor
+
+        vehicle_type = sample_strings(rng, COMMON_VEHICLE_TYPES, size)
+        rare = rng.random(size) < RARE_VEHICLE_TYPE_RATE
+        vehicle_type[rare] = sample_strings(rng, rare_types, rare.sum())
+        unrecognized = rng.random(size) < UNRECOGNIZED_VEHICLE_TYPE_RATE
+        vehicle_type[unrecognized] = sample_strings(rng, UNRECOGNIZED_VEHICLE_TYPES, unrecognized.sum())
+        vehicle_type[~involved] = None
+        vehicle_type_columns[vehicle_type_column] = vehicle_type
+    for column, values in factor_columns.items():
+        df[column] = values
+    df['COLLISION_ID'] = np.arange(first_row, first_row + size) + FIRST_COLLISION_ID
+    for column, values in vehicle_type_columns.items():
+        df[column] = values
+    return df[RAW_COLUMNS]
+
+
+def generate_collisions(n_rows, seed=DEFAULT_SEED, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield n_rows synthetic raw collisions with the columns of the Dataset in dataframes of at most chunk_size rows.
+    The same n_rows, seed and chunk_size always yield the same collisions.
+    """
+    clusters = borough_clusters(np.random.default_rng(seed))
+    dates = crash_dates()
+    times = crash_times()
+    for chunk_index, first_row in enumerate(range(0, n_rows, chunk_size)):
+        # every chunk has its own stream so it does not depend on the chunks before it
+        rng = np.random.default_rng([seed, chunk_index])
+        yield synthetic_chunk(rng, min(chunk_size, n_rows - first_row), first_row, clusters, dates, times)
+
+
+def write_collisions_csv(csv_path, n_rows, seed=DEFAULT_SEED, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Write n_rows synthetic raw collisions to csv_path a chunk at a time, readable wherever the Dataset is.
+    """
+    for chunk_index, chunk in enumerate(generate_collisions(n_rows, seed=seed, chunk_size=chunk_size)):
+        chunk.to_csv(csv_path, mode='w' if chunk_index == 0 else 'a', header=chunk_index == 0, index=False)
+    return csv_path
+
+
+# ============================================================== #
+#  SECTION: Main                                                 #
+# ============================================================== #
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f'Writing {rows} synthetic collisions to', SYNTHETIC_COLLISIONS_CSV)
+    write_collisions_csv(SYNTHETIC_COLLISIONS_CSV, rows)
+    print('Complete!')
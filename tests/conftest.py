@@ -0,0 +1,44 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+import glob
+import os
+import sys
+
+# third party library
+import pytest
+
+# local
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the modules are flat at the top of the repository
+sys.path.insert(0, REPO_DIR)
+
+from analytics import MOTOR_VEHICLE_COLLISIONS_CSV
+from synthetic_data import write_collisions_csv
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# rows of synthetic collisions the end to end tests run on
+SYNTHETIC_ROWS = 5000
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+@pytest.fixture
+def dataset_dir(tmp_path, monkeypatch):
+    """
+    Working directory holding synthetic collisions as the Dataset and the borough map images,
+    the scripts read both from the working directory.
+    """
+    write_collisions_csv(str(tmp_path / MOTOR_VEHICLE_COLLISIONS_CSV), SYNTHETIC_ROWS)
+    for image_path in glob.glob(os.path.join(REPO_DIR, '*.png')):
+        os.symlink(image_path, tmp_path / os.path.basename(image_path))
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,76 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+
+# third party library
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+
+# local
+from analytics import bar_series, subplot_multiple_bar_by_metric
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# accidents of each borough in each of three years, in the order the boroughs are plotted
+BOROUGH_COUNTS = {'QUEENS': [30, 12, 7], 'BRONX': [0, 25, 4], 'BROOKLYN': [51, 44, 0]}
+
+# years the counts are of
+COUNTED_YEARS = [2019, 2020, 2021]
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def drawn_bars(data, series=None, total_width=0.8):
+    """
+    Legend labels and the x position and height of the bars of each series, drawn on a new figure.
+    """
+    _, ax = plt.subplots()
+    subplot_multiple_bar_by_metric(ax, data, COUNTED_YEARS, total_width=total_width, series=series)
+    labels = [text.get_text() for text in ax.get_legend().get_texts()]
+    bars = [[(bar.get_x() + bar.get_width() / 2, bar.get_height()) for bar in container] for container in ax.containers]
+    plt.close()
+    return labels, bars
+
+
+# ============================================================== #
+#  SECTION: Tests                                                #
+# ============================================================== #
+
+def test_series_of_a_dictionary_keep_their_order():
+    labels, values = bar_series(BOROUGH_COUNTS)
+    assert labels == ['QUEENS', 'BRONX', 'BROOKLYN']
+    assert [series.tolist() for series in values] == list(BOROUGH_COUNTS.values())
+
+
+def test_series_of_a_matrix_are_its_rows():
+    matrix = np.array(list(BOROUGH_COUNTS.values()))
+    labels, values = bar_series(matrix, series=BOROUGH_COUNTS.keys())
+    assert labels == list(BOROUGH_COUNTS)
+    assert [series.tolist() for series in values] == list(BOROUGH_COUNTS.values())
+    # unlabelled rows are labelled by their position
+    assert bar_series(matrix)[0] == [0, 1, 2]
+
+
+@pytest.mark.parametrize('total_width', [0.8, 0.6])
+def test_one_bar_per_value_grouped_by_year(total_width):
+    labels, bars = drawn_bars(BOROUGH_COUNTS, total_width=total_width)
+    assert labels == list(BOROUGH_COUNTS)
+    bar_width = total_width / len(BOROUGH_COUNTS)
+    for i, (series_bars, counts) in enumerate(zip(bars, BOROUGH_COUNTS.values())):
+        # the series sit side by side within the group of each year, in the order of the series
+        x_offset = (i - len(BOROUGH_COUNTS) / 2) * bar_width + bar_width / 2
+        assert [x for x, _ in series_bars] == pytest.approx(np.arange(len(COUNTED_YEARS)) + x_offset)
+        assert [height for _, height in series_bars] == counts
+
+
+def test_matrix_draws_the_same_bars_as_a_dictionary():
+    matrix = np.array(list(BOROUGH_COUNTS.values()))
+    assert drawn_bars(matrix, series=BOROUGH_COUNTS.keys()) == drawn_bars(BOROUGH_COUNTS)
@@ -0,0 +1,189 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+import os
+
+# third party library
+import numpy as np
+import pandas as pd
+import pytest
+
+# local
+import analytics
+from analytics import BOROUGH_COORDS, INGEST_COLUMNS, INGEST_DTYPES, MOTOR_VEHICLE_COLLISIONS_CSV, read_csv_tail, \
+    read_data, read_new_collisions
+from cache_manager import load_analytics_data
+from columnar_cache import CLEANED_DATA_DIR, PENDING_APPEND_FILE
+from count_cube import COUNT_CUBE_FILE, build_count_cube, load_count_cube
+from synthetic_data import write_collisions_csv
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# rows of the Dataset when it is first cached, and after each download
+FIRST_ROWS = 2000
+GROWN_ROWS = 2400
+REGROWN_ROWS = 2800
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def write_dataset(lines, rows):
+    """
+    Write the header and the first rows collisions of lines as the Dataset.
+    """
+    with open(MOTOR_VEHICLE_COLLISIONS_CSV, 'w') as file:
+        file.writelines(lines[:rows + 1])
+
+
+def assert_same_as_rebuilt(cleaned_df):
+    """
+    Assert the loaded data and saved count cube equal those built from the whole Dataset.
+    """
+    rebuilt_df, _ = read_data()
+    pd.testing.assert_frame_equal(cleaned_df.reset_index(drop=True), rebuilt_df.reset_index(drop=True))
+    cube = load_count_cube()
+    rebuilt_cube = build_count_cube(rebuilt_df, BOROUGH_COORDS.keys())
+    assert cube.years == rebuilt_cube.years
+    assert np.array_equal(cube.counts, rebuilt_cube.counts)
+
+
+# ============================================================== #
+#  SECTION: Tests                                                #
+# ============================================================== #
+
+def test_appends_new_collisions_and_rebuilds_edited_ones(tmp_path, monkeypatch, capsys):
+    """
+    A Dataset that only grew is appended to the cache, one whose cached collisions changed is cleaned again.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(analytics, 'YEARS', analytics.YEARS)
+    write_collisions_csv('generated.csv', REGROWN_ROWS)
+    with open('generated.csv') as file:
+        lines = file.readlines()
+
+    write_dataset(lines, FIRST_ROWS)
+    load_analytics_data(print_step=True)
+    assert 'reading' in capsys.readouterr().out
+
+    write_dataset(lines, GROWN_ROWS)
+    cleaned_df, _ = load_analytics_data(print_step=True)
+    assert 'Appending' in capsys.readouterr().out
+    assert_same_as_rebuilt(cleaned_df)
+
+    # the next download lost a cached collision and had another edited
+    edited_lines = lines[:1] + lines[2:]
+    edited_lines[10] = edited_lines[10].replace(',0.0,', ',1.0,', 1)
+    assert edited_lines[10] != lines[11]
+    write_dataset(edited_lines, REGROWN_ROWS - 1)
+    cleaned_df, _ = load_analytics_data(print_step=True)
+    assert 'stale' in capsys.readouterr().out
+    assert_same_as_rebuilt(cleaned_df)
+    assert len(cleaned_df) == len(read_data()[0])
+
+
+def test_rebuilds_when_new_counts_do_not_fit_the_saved_types(tmp_path, monkeypatch, capsys):
+    """
+    New collisions with counts wider than the cached types are cleaned again with the cached ones instead of appended.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(analytics, 'YEARS', analytics.YEARS)
+    write_collisions_csv('generated.csv', GROWN_ROWS)
+    collision_df = pd.read_csv('generated.csv')
+
+    collision_df.head(FIRST_ROWS).to_csv(MOTOR_VEHICLE_COLLISIONS_CSV, index=False)
+    load_analytics_data()
+    collision_df.loc[GROWN_ROWS - 1, 'NUMBER OF PERSONS KILLED'] = 300
+    collision_df.to_csv(MOTOR_VEHICLE_COLLISIONS_CSV, index=False)
+    cleaned_df, _ = load_analytics_data(print_step=True)
+    out = capsys.readouterr().out
+    assert 'Appending' in out and 'stale' in out
+    assert cleaned_df['NUMBER OF PERSONS KILLED'].max() == 300
+    assert_same_as_rebuilt(cleaned_df)
+
+
+def test_only_the_new_collisions_are_parsed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_collisions_csv('generated.csv', GROWN_ROWS)
+    with open('generated.csv') as file:
+        lines = file.readlines()
+    saved_size = sum(len(line) for line in lines[:FIRST_ROWS + 1])
+    # the saved rows are unreadable, so parsing them would fail
+    lines[1:FIRST_ROWS + 1] = [',' * (len(line) - 2) + 'x\n' for line in lines[1:FIRST_ROWS + 1]]
+    write_dataset(lines, GROWN_ROWS)
+
+    expected = pd.read_csv('generated.csv', usecols=INGEST_COLUMNS, dtype=INGEST_DTYPES).iloc[FIRST_ROWS:]
+    mark = {'collision_id': int(expected['COLLISION_ID'].min()) - 1}
+    new_df = read_new_collisions(MOTOR_VEHICLE_COLLISIONS_CSV, mark, start=saved_size)
+    pd.testing.assert_frame_equal(new_df.reset_index(drop=True), expected.reset_index(drop=True))
+    # a size within a row cannot be parsed from, nor can a file that did not grow
+    assert read_csv_tail(MOTOR_VEHICLE_COLLISIONS_CSV, saved_size - 1) is None
+    assert len(read_csv_tail(MOTOR_VEHICLE_COLLISIONS_CSV, os.path.getsize(MOTOR_VEHICLE_COLLISIONS_CSV))) == 0
+
+
+def stop_at_mark(*args, **kwargs):
+    """
+    Stand in for saving the high water mark, as if the run stopped just before it.
+    """
+    raise KeyboardInterrupt
+
+
+def stop_at_cube(replace):
+    """
+    Stand in for os.replace that stops the run when the staged count cube would replace the saved one.
+    """
+    def stopping_replace(source, destination):
+        if destination == COUNT_CUBE_FILE:
+            raise KeyboardInterrupt
+        return replace(source, destination)
+    return stopping_replace
+
+
+@pytest.mark.parametrize('stop', ['before_mark', 'after_mark'])
+def test_stopped_append_is_not_appended_twice(tmp_path, monkeypatch, stop):
+    """
+    An append stopped part way is undone, or completed once its mark was saved, by the next run.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(analytics, 'YEARS', analytics.YEARS)
+    write_collisions_csv('generated.csv', GROWN_ROWS)
+    with open('generated.csv') as file:
+        lines = file.readlines()
+    write_dataset(lines, FIRST_ROWS)
+    load_analytics_data()
+
+    write_dataset(lines, GROWN_ROWS)
+    with monkeypatch.context() as context:
+        if stop == 'before_mark':
+            context.setattr(analytics, 'write_high_water_mark', stop_at_mark)
+        else:
+            context.setattr(os, 'replace', stop_at_cube(os.replace))
+        with pytest.raises(KeyboardInterrupt):
+            load_analytics_data()
+    assert os.path.isfile(os.path.join(CLEANED_DATA_DIR, PENDING_APPEND_FILE))
+
+    cleaned_df, _ = load_analytics_data()
+    assert not os.path.isfile(os.path.join(CLEANED_DATA_DIR, PENDING_APPEND_FILE))
+    assert_same_as_rebuilt(cleaned_df)
+
+
+def test_rebuilds_when_the_schema_changes(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(analytics, 'YEARS', analytics.YEARS)
+    write_collisions_csv(MOTOR_VEHICLE_COLLISIONS_CSV, FIRST_ROWS)
+    load_analytics_data()
+    # the bounds of the boroughs are only used when plotting, the cache is kept
+    monkeypatch.setitem(analytics.BOROUGH_BOUNDS, 'BRONX', ((40.8, -73.9), (40.9, -73.8)))
+    cleaned_df, _ = load_analytics_data(print_step=True)
+    assert 'Loading cleaned data' in capsys.readouterr().out
+    assert cleaned_df['LATITUDE'].dtype == np.float32
+    monkeypatch.setitem(analytics.ANALYTICS_SCHEMA, 'LATITUDE', np.float64)
+    cleaned_df, _ = load_analytics_data(print_step=True)
+    assert 'Loading cleaned data' not in capsys.readouterr().out
+    assert cleaned_df['LATITUDE'].dtype == np.float64
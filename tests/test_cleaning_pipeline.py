@@ -0,0 +1,69 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+
+# third party library
+import pandas as pd
+import pytest
+
+# local
+from cleaning_pipeline import clean_collisions, compare_with_iterrows, drop_invalid_rows
+from data_cleaner import USELESS_COLUMNS, clean_collisions_iterrows
+from synthetic_data import write_collisions_csv
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# rows of synthetic collisions cleaned both ways, the row by row cleaning takes about a second per thousand
+CLEANED_ROWS = 2000
+
+# rows cleaned in each order the borough columns are checked in
+ORDERED_ROWS = 500
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def raw_collisions(tmp_path):
+    """
+    Synthetic collisions read back from CSV, with the types reading the Dataset gives.
+    """
+    csv_path = tmp_path / 'collisions.csv'
+    write_collisions_csv(str(csv_path), CLEANED_ROWS)
+    return pd.read_csv(csv_path)
+
+
+# ============================================================== #
+#  SECTION: Tests                                                #
+# ============================================================== #
+
+def test_vectorized_cleaning_matches_iterrows(tmp_path):
+    collision_df = raw_collisions(tmp_path)
+    identical, _ = compare_with_iterrows(collision_df)
+    assert identical
+
+
+def test_vectorized_cleaning_leaves_input_unchanged(tmp_path):
+    collision_df = raw_collisions(tmp_path)
+    original_df = collision_df.copy()
+    cleaned_df = clean_collisions(collision_df)
+    pd.testing.assert_frame_equal(collision_df, original_df)
+    pd.testing.assert_frame_equal(cleaned_df, clean_collisions_iterrows(collision_df.copy()))
+
+
+@pytest.mark.parametrize('reverse', [False, True])
+def test_borough_columns_follow_first_appearance(tmp_path, reverse):
+    collision_df = raw_collisions(tmp_path).head(ORDERED_ROWS)
+    if reverse:
+        collision_df = collision_df.iloc[::-1].reset_index(drop=True)
+    boroughs = pd.unique(drop_invalid_rows(collision_df.drop(columns=USELESS_COLUMNS))['BOROUGH']).tolist()
+    cleaned_df = clean_collisions(collision_df)
+    # each borough column is inserted in front of the ones before it
+    assert [column for column in cleaned_df.columns if column.startswith('BOROUGH OF ')] == \
+        ['BOROUGH OF {}'.format(borough) for borough in reversed(boroughs)]
+    pd.testing.assert_frame_equal(cleaned_df, clean_collisions_iterrows(collision_df.copy()))
@@ -0,0 +1,179 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+
+# third party library
+import numpy as np
+import pytest
+
+# local
+from density import SHADING_METHODS, adaptive_factors, binned_kde, count_image, density_grid, exact_kde, fixed_kernel, kde_error, \
+    shade_counts
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# largest difference between the binned and exact density relative to the largest exact density,
+# the binned density is within about 0.5% of the exact one on the clustered points
+KDE_TOLERANCE = 0.02
+
+# tolerance of the adaptive density, binned in groups of similar bandwidth, within about 1% on the clustered points
+ADAPTIVE_KDE_TOLERANCE = 0.03
+
+# extent of a grid fixed ahead of the points, part of the points are outside it
+FIXED_EXTENT = (-74.1, -73.8, 40.6, 40.8)
+
+# width and height in pixels of the count images
+IMAGE_SIZE = (120, 80)
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def clustered_points(seed=0):
+    """
+    Longitude and latitude of points in a few dense clusters over a sparse background, like collisions.
+    """
+    rng = np.random.default_rng(seed)
+    centers = [(-73.95, 40.75), (-73.85, 40.7), (-74.05, 40.62)]
+    clusters = [rng.normal(center, (0.02, 0.015), (700, 2)) for center in centers]
+    background = rng.uniform((-74.25, 40.5), (-73.7, 40.9), (600, 2))
+    return np.concatenate(clusters + [background]).T
+
+
+def lattice_points(size=51):
+    """
+    Longitude and latitude of a square lattice of points over the unit square, evenly spread points.
+    """
+    values = np.linspace(0, 1, size)
+    lon, lat = np.meshgrid(values, values)
+    return lon.ravel(), lat.ravel()
+
+
+def local_factors(lon, lat):
+    """
+    Adaptive bandwidth factors of the points, with a pilot density on a grid over the unit square.
+    """
+    return adaptive_factors(lon, lat, fixed_kernel(lon, lat), *density_grid((0, 1, 0, 1)))
+
+
+# ============================================================== #
+#  SECTION: Tests                                                #
+# ============================================================== #
+
+@pytest.mark.parametrize('bandwidth', ['scott', 'silverman', 0.1])
+def test_binned_density_is_close_to_exact(bandwidth):
+    lon, lat = clustered_points()
+    lon_grid, lat_grid = density_grid((lon.min(), lon.max(), lat.min(), lat.max()))
+    assert kde_error(lon, lat, lon_grid, lat_grid, bandwidth=bandwidth) <= KDE_TOLERANCE
+
+
+@pytest.mark.parametrize('bandwidth', ['scott', 'silverman'])
+def test_binned_density_on_fixed_extent_is_close_to_exact(bandwidth):
+    lon, lat = clustered_points()
+    lon_grid, lat_grid = density_grid(FIXED_EXTENT)
+    # the points outside the grid still add their kernel to it
+    outside = (lon < FIXED_EXTENT[0]) | (lon > FIXED_EXTENT[1]) | (lat < FIXED_EXTENT[2]) | (lat > FIXED_EXTENT[3])
+    assert outside.sum() > len(lon) // 10
+    assert kde_error(lon, lat, lon_grid, lat_grid, bandwidth=bandwidth) <= KDE_TOLERANCE
+
+
+def test_points_outside_the_extent_do_not_wrap_around():
+    rng = np.random.default_rng(0)
+    # a cluster just east of the grid
+    lon, lat = rng.normal((1.1, 0.5), 0.05, (1000, 2)).T
+    lon_grid, lat_grid = density_grid((0, 1, 0, 1))
+    exact = exact_kde(lon, lat, lon_grid, lat_grid)
+    binned = binned_kde(lon, lat, lon_grid, lat_grid)
+    assert np.abs(binned - exact).max() <= KDE_TOLERANCE * exact.max()
+    # the west half is far from the cluster, wrapping around would put its kernel there
+    west = lon_grid < 0.5
+    assert binned[west].max() <= 1e-6 * exact.max()
+
+
+@pytest.mark.parametrize('extent', [None, FIXED_EXTENT])
+def test_adaptive_density_is_close_to_exact(extent):
+    lon, lat = clustered_points()
+    lon_grid, lat_grid = density_grid(extent or (lon.min(), lon.max(), lat.min(), lat.max()))
+    assert kde_error(lon, lat, lon_grid, lat_grid, bandwidth='adaptive') <= ADAPTIVE_KDE_TOLERANCE
+
+
+def test_adaptive_factors_of_evenly_spread_points_are_equal():
+    lon, lat = lattice_points()
+    factors = local_factors(lon, lat)
+    # factors are relative to their geometric mean
+    assert np.isclose(np.exp(np.log(factors).mean()), 1)
+    # points near the edges have fewer neighbours, the bandwidth is the same everywhere away from them
+    bandwidth = np.sqrt(fixed_kernel(lon, lat).covariance[0, 0])
+    inner = (3 * bandwidth < lon) & (lon < 1 - 3 * bandwidth) & (3 * bandwidth < lat) & (lat < 1 - 3 * bandwidth)
+    assert inner.sum() > len(lon) // 10
+    assert factors[inner].max() / factors[inner].min() < 1.01
+
+
+def test_adaptive_factors_shrink_in_dense_clusters():
+    lon, lat = lattice_points()
+    cluster_lon, cluster_lat = np.random.default_rng(0).normal(0.5, 0.02, (2, 2000))
+    factors = local_factors(np.concatenate([lon, cluster_lon]), np.concatenate([lat, cluster_lat]))
+    background_factors, cluster_factors = factors[:len(lon)], factors[len(lon):]
+    far = (np.hypot(lon - 0.5, lat - 0.5) > 0.3) & (0.1 < lon) & (lon < 0.9) & (0.1 < lat) & (lat < 0.9)
+    assert cluster_factors.max() < 1 < background_factors[far].min()
+    assert np.median(cluster_factors) < 0.5 * np.median(background_factors[far])
+
+
+def test_invalid_bandwidth():
+    lon, lat = clustered_points()
+    with pytest.raises(ValueError, match='bandwidth'):
+        binned_kde(lon, lat, *density_grid(FIXED_EXTENT), bandwidth='widest')
+
+
+def test_count_image_counts_every_point_inside_the_extent():
+    lon, lat = clustered_points()
+    # points without coordinates and points on the edges of the extent
+    lon = np.concatenate([lon, [np.nan, -74.0, FIXED_EXTENT[0], FIXED_EXTENT[1], FIXED_EXTENT[1]]])
+    lat = np.concatenate([lat, [40.7, np.nan, FIXED_EXTENT[2], FIXED_EXTENT[3], 40.7]])
+    counts = count_image(lon, lat, FIXED_EXTENT, *IMAGE_SIZE)
+    assert counts.shape == (IMAGE_SIZE[1], IMAGE_SIZE[0])
+    inside = (FIXED_EXTENT[0] <= lon) & (lon <= FIXED_EXTENT[1]) & (FIXED_EXTENT[2] <= lat) & (lat <= FIXED_EXTENT[3])
+    assert 0 < inside.sum() < len(lon)
+    assert counts.sum() == inside.sum()
+    # rows from the bottom, the same pixels as a histogram of the points
+    expected, _, _ = np.histogram2d(lat, lon, bins=(IMAGE_SIZE[1], IMAGE_SIZE[0]),
+                                    range=[FIXED_EXTENT[2:], FIXED_EXTENT[:2]])
+    assert np.array_equal(counts, expected)
+
+
+@pytest.mark.parametrize('shading', SHADING_METHODS)
+def test_shaded_counts_keep_the_order_of_the_counts(shading):
+    lon, lat = clustered_points()
+    counts = count_image(lon, lat, FIXED_EXTENT, *IMAGE_SIZE)
+    shaded = shade_counts(counts, shading)
+    # empty pixels are transparent, the others are shaded up to 1 for the largest count
+    assert np.array_equal(shaded.mask, counts == 0)
+    filled = counts > 0
+    assert shaded[filled].min() > 0 and shaded.max() == 1
+    order = np.argsort(counts[filled], kind='stable')
+    assert np.all(np.diff(shaded[filled][order]) >= 0)
+    # equal counts are shaded the same
+    for count in np.unique(counts[filled])[:5]:
+        assert np.ptp(shaded[counts == count]) == 0
+
+
+def test_equalized_shades_are_the_fraction_of_pixels_at_or_below():
+    counts = np.array([[0, 1, 1], [2, 5, 9]])
+    shaded = shade_counts(counts, 'eq_hist')
+    assert shaded.mask.tolist() == [[True, False, False], [False, False, False]]
+    assert shaded.compressed().tolist() == [2 / 5, 2 / 5, 3 / 5, 4 / 5, 1]
+
+
+def test_empty_count_image_is_transparent():
+    assert shade_counts(np.zeros((3, 4), dtype=np.int64)).mask.all()
+
+
+def test_invalid_shading():
+    with pytest.raises(ValueError, match='shading'):
+        shade_counts(np.ones((2, 2)), 'sqrt')
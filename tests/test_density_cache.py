@@ -0,0 +1,81 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+import os
+
+# third party library
+import numpy as np
+
+# local
+from density_cache import DensityCache, estimator_version
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def coordinates():
+    """
+    Random longitudes and latitudes to key surfaces by.
+    """
+    rng = np.random.default_rng(0)
+    return rng.normal(-73.9, 0.05, 500), rng.normal(40.7, 0.05, 500)
+
+
+# ============================================================== #
+#  SECTION: Tests                                                #
+# ============================================================== #
+
+def test_estimated_and_saved_surfaces_are_the_same(tmp_path):
+    cache = DensityCache(str(tmp_path))
+    lon, lat = coordinates()
+    estimate = np.random.default_rng(1).random((40, 30))
+    estimated = cache.surface(lon, lat, lambda: estimate, method='fft')
+    saved = cache.surface(lon, lat, lambda: None, method='fft')
+    assert estimated.dtype == saved.dtype == np.float32
+    assert np.array_equal(estimated, saved)
+    assert np.array_equal(estimated, estimate.astype(np.float32))
+
+
+def test_other_estimator_versions_are_not_served(tmp_path):
+    lon, lat = coordinates()
+    cache = DensityCache(str(tmp_path))
+    assert cache.version == estimator_version()
+    cache.surface(lon, lat, lambda: np.zeros((4, 4)), method='fft')
+    changed_cache = DensityCache(str(tmp_path), version='changed estimators')
+    assert changed_cache.key(lon, lat, method='fft') != cache.key(lon, lat, method='fft')
+    assert np.array_equal(changed_cache.surface(lon, lat, lambda: np.ones((4, 4)), method='fft'), np.ones((4, 4)))
+
+
+def test_least_recently_read_surface_is_evicted(tmp_path):
+    surface = np.zeros((64, 64))
+    surface_bytes = np.asarray(surface, dtype=np.float32).nbytes
+    # room for two surfaces and the headers of their files, not three
+    cache = DensityCache(str(tmp_path), max_bytes=2 * surface_bytes + 1024)
+    for key in ['first', 'second']:
+        cache.put(key, surface)
+    now = os.stat(cache.path('second')).st_mtime_ns
+    os.utime(cache.path('first'), ns=(now - 2 * 10 ** 9, now - 2 * 10 ** 9))
+    os.utime(cache.path('second'), ns=(now - 10 ** 9, now - 10 ** 9))
+    # reading the first surface makes the second the least recently used
+    assert cache.get('first') is not None
+    cache.put('third', surface)
+    assert cache.get('second') is None
+    assert cache.get('first') is not None and cache.get('third') is not None
+    assert cache.size() <= cache.max_bytes
+
+
+def test_surface_removed_while_read_is_estimated_again(tmp_path, monkeypatch):
+    cache = DensityCache(str(tmp_path))
+    lon, lat = coordinates()
+    cache.surface(lon, lat, lambda: np.zeros((4, 4)), method='fft')
+    utime = os.utime
+
+    def evicting_utime(path, *args, **kwargs):
+        # another process evicts the surface just before it is marked as used
+        os.remove(path)
+        return utime(path, *args, **kwargs)
+    monkeypatch.setattr(os, 'utime', evicting_utime)
+    assert np.array_equal(cache.surface(lon, lat, lambda: np.ones((4, 4)), method='fft'), np.ones((4, 4)))
@@ -0,0 +1,112 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+
+# third party library
+import numpy as np
+import pandas as pd
+import pytest
+
+# local
+from data_cleaner import FACTOR_COLUMNS, GENERALIZED_CAUSE_TO_SPECIFIC
+from factor_index import CAUSE_BITS, CAUSE_COLUMNS, build_factor_index, factor_bitmasks, factor_matrix, \
+    multi_cause_factors
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# random rows of factors checked against the row by row loop
+RANDOM_ROWS = 2000
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def row_by_row_causes(df, resolve):
+    """
+    Multi-hot causes of each row the way the row by row cleaning found them, which only
+    kept the first cause of a factor, or every cause of it with resolve='all'.
+    """
+    causes = np.zeros((len(df), len(CAUSE_COLUMNS)), dtype=np.uint8)
+    for row_index, (_, row) in enumerate(df.iterrows()):
+        for column in FACTOR_COLUMNS:
+            factor = str(row[column])
+            if factor == 'Unspecified' or factor.isnumeric():
+                continue
+            for cause_index, cause in enumerate(CAUSE_COLUMNS):
+                if factor in GENERALIZED_CAUSE_TO_SPECIFIC[cause]:
+                    causes[row_index, cause_index] = 1
+                    if resolve == 'first':
+                        break
+    return causes
+
+
+def factor_rows():
+    """
+    Rows with two or more contributing factors, holding factors within more than one cause,
+    missing factors, 'Unspecified', invalid numeric factors and factors within no cause.
+    """
+    multi_factor = next(iter(multi_cause_factors()))
+    single_factors = sorted(factor for factor in set().union(*GENERALIZED_CAUSE_TO_SPECIFIC.values())
+                            if factor not in multi_cause_factors())
+    rows = [[multi_factor, single_factors[0], None, None, None],
+            [None, multi_factor, multi_factor, None, None],
+            ['Unspecified', '1', multi_factor, single_factors[-1], None],
+            [single_factors[1], single_factors[2], 'Not A Factor', '80', multi_factor]]
+    rng = np.random.default_rng(0)
+    values = np.array(single_factors + [multi_factor, 'Unspecified', '80', 'Not A Factor', None], dtype=object)
+    rows += rng.choice(values, size=(RANDOM_ROWS, len(FACTOR_COLUMNS))).tolist()
+    return pd.DataFrame(rows, columns=FACTOR_COLUMNS)
+
+
+# ============================================================== #
+#  SECTION: Tests                                                #
+# ============================================================== #
+
+@pytest.mark.parametrize('resolve', ['first', 'all'])
+def test_factor_matrix_matches_row_by_row(resolve):
+    df = factor_rows()
+    matrix = factor_matrix(df, factor_index=build_factor_index(resolve=resolve))
+    assert np.array_equal(matrix, row_by_row_causes(df, resolve))
+
+
+@pytest.mark.parametrize('resolve', ['first', 'all'])
+def test_factor_bitmasks_match_matrix(resolve):
+    df = factor_rows()
+    factor_index = build_factor_index(resolve=resolve)
+    bitmasks = factor_bitmasks(df, factor_index=factor_index)
+    expected = row_by_row_causes(df, resolve) @ np.array([CAUSE_BITS[cause] for cause in CAUSE_COLUMNS])
+    assert np.array_equal(bitmasks, expected)
+
+
+def test_first_and_all_only_differ_on_multi_cause_factors():
+    first_index = build_factor_index(resolve='first')
+    all_index = build_factor_index(resolve='all')
+    multi_causes = multi_cause_factors()
+    assert first_index.keys() == all_index.keys()
+    for factor in first_index:
+        if factor in multi_causes:
+            assert first_index[factor] == CAUSE_BITS[multi_causes[factor][0]]
+            assert all_index[factor] == np.bitwise_or.reduce([CAUSE_BITS[cause] for cause in multi_causes[factor]])
+        else:
+            assert first_index[factor] == all_index[factor]
+
+
+def test_multi_cause_factors_lists_causes_in_order():
+    expected = {}
+    for factor in set().union(*GENERALIZED_CAUSE_TO_SPECIFIC.values()):
+        causes = [cause for cause in CAUSE_COLUMNS if factor in GENERALIZED_CAUSE_TO_SPECIFIC[cause]]
+        if len(causes) > 1:
+            expected[factor] = causes
+    assert expected
+    assert multi_cause_factors() == expected
+
+
+def test_unknown_resolve_is_rejected():
+    with pytest.raises(ValueError, match='resolve must be one of'):
+        build_factor_index(resolve='last')
@@ -0,0 +1,41 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+import json
+import os
+import subprocess
+import sys
+
+# third party library
+
+# local
+from conftest import REPO_DIR
+from figure_export import EXPORT_DIR, MANIFEST_FILE
+
+
+# ============================================================== #
+#  SECTION: Tests                                                #
+# ============================================================== #
+
+def test_script_writes_figures(dataset_dir):
+    """
+    Running figure_export.py as a script saves the figures and lists them in the manifest instead of showing them.
+    """
+    env = {**os.environ, 'PYTHONPATH': REPO_DIR, 'MPLBACKEND': 'Agg'}
+    result = subprocess.run([sys.executable, os.path.join(REPO_DIR, 'figure_export.py')], cwd=dataset_dir, env=env,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+    with open(dataset_dir / EXPORT_DIR / MANIFEST_FILE) as file:
+        figures = json.load(file)['figures']
+    assert figures
+    assert {figure['question'].split('/')[0] for figure in figures} >= {str(question) for question in range(1, 10)}
+    # the yearly plots of questions 5 and 6 are rendered by the YearExecutor, one figure of each year at least
+    for question in ('5', '6/hour'):
+        paths = [figure['path'] for figure in figures if figure['question'] == question]
+        assert all(any(str(year) in path for path in paths) for year in range(2013, 2022))
+    for figure in figures:
+        assert os.path.isfile(dataset_dir / EXPORT_DIR / figure['path'])
+    assert f'{len(figures)} figures written' in result.stdout
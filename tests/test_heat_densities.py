@@ -0,0 +1,71 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+import multiprocessing
+
+# third party library
+import numpy as np
+import pandas as pd
+import pytest
+from PIL import Image
+
+# local
+from analytics import BOROUGH_BOUNDS, heat_density_path, render_heat_densities
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# boroughs and year of the rendered heat density maps
+RENDERED_BOROUGHS = ['MANHATTAN', 'BROOKLYN']
+RENDERED_YEAR = 2020
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def heat_density_jobs(output_dir):
+    """
+    Jobs rendering a heat density map of random accidents within each of RENDERED_BOROUGHS.
+    """
+    rng = np.random.default_rng(0)
+    jobs = []
+    for borough in RENDERED_BOROUGHS:
+        (min_lat, min_lon), (max_lat, max_lon) = BOROUGH_BOUNDS[borough]
+        borough_df = pd.DataFrame({'LATITUDE': rng.uniform(min_lat, max_lat, 300).astype(np.float32),
+                                   'LONGITUDE': rng.uniform(min_lon, max_lon, 300).astype(np.float32)})
+        kwargs = {'title': f'Accident Density in {borough.title()} in {RENDERED_YEAR}', 'method': 'fft'}
+        jobs.append((borough_df, borough, heat_density_path(str(output_dir), borough, RENDERED_YEAR), kwargs))
+    return jobs
+
+
+def pixels(path):
+    """
+    Decoded pixels of a saved map.
+    """
+    with Image.open(path) as im:
+        return np.asarray(im.convert('RGBA'))
+
+
+# ============================================================== #
+#  SECTION: Tests                                                #
+# ============================================================== #
+
+@pytest.mark.parametrize('start_method', ['fork', 'spawn'])
+def test_maps_rendered_by_processes_match_serial(dataset_dir, tmp_path, start_method):
+    if start_method not in multiprocessing.get_all_start_methods():
+        pytest.skip(f'{start_method} is not available')
+    serial_jobs = heat_density_jobs(tmp_path / 'serial')
+    parallel_jobs = heat_density_jobs(tmp_path / 'parallel')
+    for directory in ['serial', 'parallel']:
+        (tmp_path / directory).mkdir()
+    serial_paths = render_heat_densities(serial_jobs, workers=1)
+    # maps built by the parent are not inherited by spawned processes
+    parallel_paths = render_heat_densities(parallel_jobs, workers=2, mp_context=multiprocessing.get_context(start_method))
+    assert parallel_paths == [job[2] for job in parallel_jobs]
+    for serial_path, parallel_path in zip(serial_paths, parallel_paths):
+        assert np.array_equal(pixels(serial_path), pixels(parallel_path))
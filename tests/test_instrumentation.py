@@ -0,0 +1,85 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+import os
+import threading
+
+# third party library
+import numpy as np
+import pytest
+
+# local
+import instrumentation
+from instrumentation import MemorySampler, Profiler, current_memory
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# bytes allocated within a stage
+ALLOCATED_BYTES = 64 * 1024 ** 2
+
+
+# ============================================================== #
+#  SECTION: Tests                                                #
+# ============================================================== #
+
+def test_nested_stage_peaks_are_carried_into_the_enclosing_stage():
+    profiler = Profiler()
+    with profiler.sampler:
+        with profiler.stage('outer'):
+            with profiler.stage('inner'):
+                allocated = np.ones(ALLOCATED_BYTES, dtype=np.uint8)
+            del allocated
+    stages = {stage['name']: stage for stage in profiler.stages}
+    assert stages['inner']['peak_memory_delta_bytes'] >= ALLOCATED_BYTES * 0.9
+    assert stages['outer']['peak_memory_delta_bytes'] >= stages['inner']['peak_memory_delta_bytes']
+
+
+def test_samples_taken_while_stages_swap_peaks_are_not_lost():
+    """
+    A sample recorded between a stage resetting the peak and restoring it counts towards that stage.
+    """
+    sampler = MemorySampler()
+    recorded = threading.Event()
+
+    def record_high():
+        sampler.record(10 ** 7)
+        recorded.set()
+
+    previous_peak = sampler.reset_peak(0)
+    thread = threading.Thread(target=record_high)
+    thread.start()
+    recorded.wait()
+    thread.join()
+    assert sampler.restore_peak(previous_peak, 1) == 10 ** 7
+    assert sampler.peak == 10 ** 7
+    # the peak of the enclosing stage is never lowered
+    assert sampler.reset_peak(0) == 10 ** 7
+    assert sampler.restore_peak(10 ** 8, 5) == 5
+    assert sampler.peak == 10 ** 8
+
+
+def unreadable(*args, **kwargs):
+    """
+    Stand in for open on a platform without /proc.
+    """
+    raise OSError('no /proc')
+
+
+@pytest.mark.skipif(not os.path.isfile('/proc/self/status'), reason='needs /proc to read the peak from')
+def test_peak_fallback_is_in_bytes(monkeypatch):
+    with open('/proc/self/status') as file:
+        peak = next(int(line.split()[1]) * 1024 for line in file if line.startswith('VmHWM:'))
+    monkeypatch.setattr(instrumentation, 'open', unreadable, raising=False)
+    # the peak only grows between the two reads
+    assert peak <= current_memory() <= peak * 1.1
+
+
+def test_memory_without_proc_or_resource_is_zero(monkeypatch):
+    monkeypatch.setattr(instrumentation, 'open', unreadable, raising=False)
+    monkeypatch.setattr(instrumentation, 'resource', None)
+    assert current_memory() == 0
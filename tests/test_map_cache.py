@@ -0,0 +1,109 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+import os
+
+# third party library
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+from PIL import Image
+
+# local
+import map_cache
+from analytics import MAX_LATITUDE, MAX_LONGITUDE, MIN_LATITUDE, MIN_LONGITUDE
+from map_cache import MapCache
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# keyword arguments of a basemap of NYC
+NYC_MAP = {'llcrnrlon': MIN_LONGITUDE, 'llcrnrlat': MIN_LATITUDE, 'urcrnrlon': MAX_LONGITUDE, 'urcrnrlat': MAX_LATITUDE}
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def write_image(path, width, height):
+    """
+    Save a random RGB image of width x height pixels to path.
+    """
+    rng = np.random.default_rng(0)
+    Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8)).save(path)
+
+
+def fail_to_build(*args, **kwargs):
+    """
+    Stand in for building a projection or decoding an image that should have been loaded from disk.
+    """
+    raise AssertionError('built again instead of loaded')
+
+
+# ============================================================== #
+#  SECTION: Tests                                                #
+# ============================================================== #
+
+def test_basemaps_are_keyed_by_their_arguments():
+    cache = MapCache()
+    map = cache.basemap(**NYC_MAP)
+    # the order the arguments are passed in does not matter
+    assert cache.basemap(**dict(reversed(list(NYC_MAP.items())))) is map
+    assert cache.basemap(**{**NYC_MAP, 'urcrnrlat': MAX_LATITUDE - 0.1}) is not map
+    assert len(cache.basemaps) == 2
+    cache.clear()
+    assert cache.basemap(**NYC_MAP) is not map
+
+
+def test_basemaps_are_loaded_from_disk(tmp_path, monkeypatch):
+    map = MapCache(cache_dir=str(tmp_path)).basemap(**NYC_MAP)
+    assert [name.startswith('basemap_') and name.endswith('.pickle') for name in os.listdir(tmp_path)] == [True]
+    monkeypatch.setattr(map_cache, 'Basemap', fail_to_build)
+    loaded_map = MapCache(cache_dir=str(tmp_path)).basemap(**NYC_MAP)
+    lon, lat = np.linspace(MIN_LONGITUDE, MAX_LONGITUDE, 10), np.linspace(MIN_LATITUDE, MAX_LATITUDE, 10)
+    assert np.array_equal(loaded_map(lon, lat), map(lon, lat))
+
+
+def test_boundary_is_drawn_on_every_map():
+    cache = MapCache()
+    for _ in range(2):
+        _, ax = plt.subplots()
+        map = cache.basemap(**NYC_MAP)
+        # images are clipped to the boundary, the boundary drawn on the previous axes cannot be added to these
+        map.imshow(np.zeros((4, 4, 4)), origin='upper')
+        boundary = map.drawmapboundary(fill_color='#DDEEFF')
+        # filling the continents clips them to the boundary of these axes
+        map.fillcontinents(color='#FFEEDD')
+        assert boundary in ax.patches
+        plt.close()
+
+
+@pytest.mark.parametrize('size, expected_size', [((1600, 400), (800, 200)), ((300, 500), (300, 500))])
+def test_backgrounds_are_thumbnails(tmp_path, size, expected_size):
+    image_path = str(tmp_path / 'borough.png')
+    write_image(image_path, *size)
+    cache = MapCache()
+    pixels = cache.background(image_path)
+    # larger images are downsampled to at most BACKGROUND_MAX_SIZE on their longest side, smaller ones are kept
+    assert pixels.shape == (expected_size[1], expected_size[0], 4)
+    assert pixels.dtype == np.uint8 and not pixels.flags.writeable
+    assert cache.background(image_path) is pixels
+    assert MapCache(background_max_size=100).background(image_path).shape[:2] == \
+        tuple(round(side * 100 / max(size)) for side in reversed(size))
+
+
+def test_backgrounds_are_loaded_from_disk_until_the_image_changes(tmp_path, monkeypatch):
+    image_path = str(tmp_path / 'borough.png')
+    write_image(image_path, 1000, 500)
+    cache_dir = str(tmp_path / 'cache')
+    pixels = MapCache(cache_dir=cache_dir).background(image_path)
+    with monkeypatch.context() as patch:
+        patch.setattr(map_cache.Image, 'open', fail_to_build)
+        assert np.array_equal(MapCache(cache_dir=cache_dir).background(image_path), pixels)
+    # a changed image is decoded again
+    write_image(image_path, 500, 500)
+    assert MapCache(cache_dir=cache_dir).background(image_path).shape == (500, 500, 4)
@@ -0,0 +1,169 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+import os
+import warnings
+
+# third party library
+import numpy as np
+import pandas as pd
+import pytest
+
+# local
+import analytics
+from analytics import BOROUGH_COORDS, DAYS, HOURS, MONTHS, MOTOR_VEHICLE_COLLISIONS_CSV, aggregation_keys, df_filter_by, \
+    read_data
+from columnar_cache import save_cleaned_data
+from count_cube import CUBE_DIMENSIONS, CUBE_MEASURES, build_count_cube
+from synthetic_data import write_collisions_csv
+from year_executor import YearExecutor
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# rows of synthetic collisions the queries count
+QUERIED_ROWS = 20000
+
+# nested query functions with the column and values of their outer and inner dictionaries, in the order
+# the original loops filtered them
+NESTED_QUERIES = {
+    'query_accidents_by_weekday_and_time_and_year': ('day', DAYS, 'hour', HOURS),
+    'query_accidents_by_borough_and_month_and_year': ('borough', BOROUGH_COORDS.keys(), 'month', MONTHS.keys()),
+    'query_accidents_by_borough_and_day_and_year': ('borough', BOROUGH_COORDS.keys(), 'day', DAYS),
+    'query_accidents_by_borough_and_hour_and_year': ('borough', BOROUGH_COORDS.keys(), 'hour', HOURS)
+}
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+@pytest.fixture(scope='module')
+def cleaned_df(tmp_path_factory):
+    """
+    Cleaned synthetic collisions, with the analyzed years discovered from them.
+    """
+    directory = tmp_path_factory.mktemp('queries')
+    write_collisions_csv(str(directory / MOTOR_VEHICLE_COLLISIONS_CSV), QUERIED_ROWS)
+    previous_directory, previous_years = os.getcwd(), analytics.YEARS
+    os.chdir(directory)
+    try:
+        yield read_data()[0]
+    finally:
+        os.chdir(previous_directory)
+        analytics.set_years(previous_years)
+
+
+def filtered_nested_counts(cleaned_df, outer_column, outer_values, inner_column, inner_values):
+    """
+    Counts of every year, outer and inner value by filtering the rows one value at a time,
+    the way the query functions counted before aggregating.
+    """
+    counts = {}
+    for year in analytics.YEARS:
+        year_df = df_filter_by(cleaned_df, 'year', year)
+        counts[year] = {}
+        for outer_value in outer_values:
+            outer_df = df_filter_by(year_df, outer_column, outer_value)
+            counts[year][outer_value] = [len(df_filter_by(outer_df, inner_column, inner_value))
+                                         for inner_value in inner_values]
+    return counts
+
+
+def plain(nested):
+    """
+    Nested default dictionaries as plain dictionaries, for comparison.
+    """
+    return {outer: dict(inner) for outer, inner in nested.items()}
+
+
+@pytest.fixture(scope='module')
+def cube(cleaned_df):
+    """
+    Count cube of the cleaned synthetic collisions.
+    """
+    return build_count_cube(cleaned_df, BOROUGH_COORDS.keys())
+
+
+# ============================================================== #
+#  SECTION: Tests                                                #
+# ============================================================== #
+
+@pytest.mark.parametrize('query_name', NESTED_QUERIES)
+def test_query_matches_filtered_counts(cleaned_df, query_name):
+    expected = filtered_nested_counts(cleaned_df, *NESTED_QUERIES[query_name])
+    assert plain(getattr(analytics, query_name)(cleaned_df)) == expected
+
+
+def test_value_query_matches_filtered_counts(cleaned_df):
+    counts = analytics.query_accidents_by_value_and_year(cleaned_df, 'month', MONTHS)
+    for month, month_name in MONTHS.items():
+        assert counts[month_name] == [len(df_filter_by(df_filter_by(cleaned_df, 'year', year), 'month', month))
+                                      for year in analytics.YEARS]
+
+
+@pytest.mark.parametrize('query_name', NESTED_QUERIES)
+def test_cube_query_matches_filtered_counts(cleaned_df, cube, query_name):
+    expected = filtered_nested_counts(cleaned_df, *NESTED_QUERIES[query_name])
+    assert plain(getattr(analytics, query_name)(cleaned_df, cube=cube)) == expected
+
+
+def test_cube_counts_match_rows(cleaned_df, cube):
+    keys = aggregation_keys(cleaned_df)
+    domains = {'year': analytics.YEARS, 'month': MONTHS.keys(), 'day': DAYS, 'hour': HOURS, 'borough': BOROUGH_COORDS.keys()}
+    for dimension in CUBE_DIMENSIONS:
+        dimensions = [(dimension, domains[dimension])]
+        assert cube.count_by(dimensions).tolist() == keys.count_by(dimensions).tolist()
+        for measure in CUBE_MEASURES:
+            weights = cleaned_df[measure].to_numpy(dtype=np.float64, na_value=0)
+            assert cube.count_by(dimensions, measure=measure).tolist() == \
+                keys.count_by(dimensions, weights=weights).tolist()
+
+
+def test_executor_counts_match_cube(cleaned_df, cube, tmp_path):
+    save_cleaned_data(cleaned_df, cache_dir=str(tmp_path / 'cleaned'))
+    executor = YearExecutor(workers=1, cache_dir=str(tmp_path / 'cleaned'))
+    # a year without a saved partition counts as 0
+    years = list(analytics.YEARS) + [analytics.YEARS[-1] + 1]
+    dimensions = [('month', MONTHS.keys()), ('year', years), ('borough', BOROUGH_COORDS.keys())]
+    counts = executor.count_by(dimensions)
+    assert not counts[:, -1].any()
+    assert counts.tolist() == cube.count_by(dimensions).tolist()
+    measure = 'NUMBER OF PERSONS KILLED'
+    assert executor.count_by(dimensions[1:], measure=measure).tolist() == \
+        cube.count_by(dimensions[1:], measure=measure).tolist()
+
+
+@pytest.mark.parametrize('from_cube', [False, True])
+def test_death_ratio_of_months_without_accidents_is_zero(cleaned_df, cube, from_cube):
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        years, death_counts, death_ratio = analytics.query_accidents_by_deaths_and_month(
+            cleaned_df, cube=cube if from_cube else None)
+    # the synthetic collisions end within their last year
+    assert any(len(df_filter_by(df_filter_by(cleaned_df, 'year', years[-1]), 'month', month)) == 0 for month in MONTHS)
+    for month, month_name in MONTHS.items():
+        for year_index, year in enumerate(years):
+            month_df = df_filter_by(df_filter_by(cleaned_df, 'year', year), 'month', month)
+            deaths = month_df['NUMBER OF PERSONS KILLED'].sum()
+            assert death_counts[month_name][year_index] == deaths
+            assert death_ratio[month_name][year_index] == (deaths / len(month_df) if len(month_df) else 0)
+
+
+def test_indexed_borough_accidents_match_masks(cleaned_df):
+    year_df_dict = analytics.split_by_year(cleaned_df)
+    indexes = analytics.spatial_indexes(year_df_dict)
+    for year, year_df in year_df_dict.items():
+        for borough, (c1, c2) in analytics.BOROUGH_BOUNDS.items():
+            expected = analytics.df_between_coords(year_df, c1, c2)
+            pd.testing.assert_frame_equal(analytics.df_between_coords(year_df, c1, c2, index=indexes[year]), expected)
+            expected = analytics.borough_accidents(year_df, borough)
+            assert len(expected) > 0
+            pd.testing.assert_frame_equal(analytics.borough_accidents(year_df, borough, index=indexes[year]), expected)
+            for indexed, masked in zip(analytics.borough_coordinates(year_df, borough, index=indexes[year]),
+                                       analytics.borough_coordinates(year_df, borough)):
+                assert np.array_equal(indexed, masked)
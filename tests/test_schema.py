@@ -0,0 +1,81 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+
+# third party library
+import numpy as np
+import pandas as pd
+import pytest
+
+# local
+from analytics import apply_schema, fitting_integer_dtype
+from columnar_cache import append_cleaned_data, load_cleaned_data, save_cleaned_data
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# uint8 count column of the schema and a uint16 one
+KILLED_COLUMN = 'NUMBER OF PERSONS KILLED'
+INJURED_COLUMN = 'NUMBER OF PERSONS INJURED'
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def counts_df(killed, injured=None, first_index=0):
+    """
+    Cleaned rows with the given counts, crashing in 2019 and 2020. Like cleaned rows, whose index has gaps
+    left by the dropped rows, the index is saved as a column.
+    """
+    injured = [0] * len(killed) if injured is None else injured
+    crash_time = pd.to_datetime(['2019-06-01 10:00', '2020-06-01 10:00'] * len(killed))[:len(killed)]
+    return pd.DataFrame({'CRASH TIME': crash_time, KILLED_COLUMN: killed, INJURED_COLUMN: injured},
+                        index=pd.Index(list(range(first_index, first_index + len(killed)))))
+
+
+# ============================================================== #
+#  SECTION: Tests                                                #
+# ============================================================== #
+
+def test_counts_that_fit_keep_the_schema_types():
+    cleaned_df = apply_schema(counts_df([0, 255, np.nan], [0, 65535, 1]))
+    assert cleaned_df[KILLED_COLUMN].dtype == np.uint8
+    assert cleaned_df[INJURED_COLUMN].dtype == np.uint16
+    assert cleaned_df[KILLED_COLUMN].tolist() == [0, 255, 0]
+
+
+def test_counts_that_do_not_fit_are_widened_not_wrapped():
+    cleaned_df = apply_schema(counts_df([1, 300, np.nan], [0, 70000, 1]))
+    assert cleaned_df[KILLED_COLUMN].dtype == np.uint16
+    assert cleaned_df[KILLED_COLUMN].tolist() == [1, 300, 0]
+    assert cleaned_df[INJURED_COLUMN].dtype == np.uint32
+    assert cleaned_df[INJURED_COLUMN].tolist() == [0, 70000, 1]
+
+    # the values are read as int64 when none are missing
+    cleaned_df = apply_schema(counts_df([1, -2, 3]))
+    assert cleaned_df[KILLED_COLUMN].dtype == np.int8
+    assert cleaned_df[KILLED_COLUMN].tolist() == [1, -2, 3]
+
+
+def test_counts_beyond_every_integer_type_are_rejected():
+    with pytest.raises(ValueError, match='beyond every integer type'):
+        fitting_integer_dtype(pd.Series([1e30], name=KILLED_COLUMN), np.uint8)
+
+
+def test_widened_counts_are_saved_and_appended(tmp_path):
+    cache_dir = str(tmp_path / 'cleaned')
+    save_cleaned_data(apply_schema(counts_df([1, 300])), cache_dir)
+    # new counts that fit the saved types are appended with them
+    append_cleaned_data(apply_schema(counts_df([2, 3], first_index=2)), cache_dir)
+    assert load_cleaned_data(cache_dir=cache_dir)[KILLED_COLUMN].tolist() == [1, 300, 2, 3]
+
+    # new counts wider than the saved types are not appended
+    save_cleaned_data(apply_schema(counts_df([1, 2])), cache_dir)
+    with pytest.raises(ValueError, match='save the cleaned data again'):
+        append_cleaned_data(apply_schema(counts_df([3, 400], first_index=2)), cache_dir)
+    assert load_cleaned_data(cache_dir=cache_dir)[KILLED_COLUMN].tolist() == [1, 2]
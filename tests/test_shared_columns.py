@@ -0,0 +1,92 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+import os
+
+# third party library
+import numpy as np
+import pandas as pd
+import pytest
+
+# local
+import analytics
+from analytics import BOROUGH_COORDS, MONTHS, read_data
+from columnar_cache import load_cleaned_data, save_cleaned_data
+from conftest import SYNTHETIC_ROWS
+from count_cube import build_count_cube
+from shared_columns import attach_columns, publish_columns
+from synthetic_data import write_collisions_csv
+from year_executor import YearExecutor
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def mixed_df():
+    """
+    Dataframe with a column of every kind publish_columns handles.
+    """
+    return pd.DataFrame({
+        'count': pd.array([1, None, 300, 0], dtype='UInt16'),
+        'flag': pd.array([True, None, False, True], dtype='boolean'),
+        'ratio': pd.array([1.5, None, 2.0, 0.0], dtype='Float64'),
+        'borough': pd.Categorical(['BRONX', None, 'QUEENS', 'BRONX']),
+        'street': ['BROADWAY', None, 'CANAL ST', 'BROADWAY'],
+        'latitude': np.array([40.7, 40.8, 40.6, 40.5], dtype=np.float32),
+        'time': pd.to_datetime(['2020-01-01', '2020-02-01', '2021-03-01', '2021-04-01'])
+    })
+
+
+# ============================================================== #
+#  SECTION: Tests                                                #
+# ============================================================== #
+
+def test_columns_round_trip(tmp_path):
+    df = mixed_df()
+    with publish_columns(df, root=str(tmp_path)) as shared:
+        with attach_columns(shared.directory) as attached:
+            assert len(attached) == len(df)
+            frame = attached.frame()
+            # strings come back as categoricals of their codes
+            expected = df.astype({'street': 'category'})
+            pd.testing.assert_frame_equal(frame, expected, check_categorical=False)
+            assert frame['count'].dtype == 'UInt16'
+            rows = np.array([True, True, False, False])
+            pd.testing.assert_frame_equal(attached.frame(['count', 'street'], rows=rows).reset_index(drop=True),
+                                          expected.loc[rows, ['count', 'street']].reset_index(drop=True),
+                                          check_categorical=False)
+        assert attached.arrays == {} and attached.masks == {}
+        assert os.path.isdir(shared.directory)
+    # the owner unlinks the columns when done
+    assert not os.path.exists(shared.directory)
+
+
+def test_failed_publish_leaves_nothing(tmp_path):
+    with pytest.raises(KeyError):
+        publish_columns(mixed_df(), columns=['count', 'missing'], root=str(tmp_path))
+    assert os.listdir(tmp_path) == []
+
+
+def test_executor_counts_through_shared_columns_match_cube(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_collisions_csv(analytics.MOTOR_VEHICLE_COLLISIONS_CSV, SYNTHETIC_ROWS)
+    previous_years = analytics.YEARS
+    try:
+        cleaned_df = read_data()[0]
+        save_cleaned_data(cleaned_df)
+        cube = build_count_cube(cleaned_df, BOROUGH_COORDS.keys())
+        # the saved counts load as nullable integers
+        loaded_df = load_cleaned_data()
+        assert loaded_df['NUMBER OF PERSONS KILLED'].dtype == 'UInt8'
+        dimensions = [('year', analytics.YEARS), ('month', MONTHS.keys()), ('borough', BOROUGH_COORDS.keys())]
+        with publish_columns(loaded_df, root=str(tmp_path)) as shared:
+            executor = YearExecutor(workers=1, shared_columns=shared)
+            assert executor.count_by(dimensions).tolist() == cube.count_by(dimensions).tolist()
+            for measure in ['NUMBER OF PERSONS INJURED', 'NUMBER OF PERSONS KILLED']:
+                assert executor.count_by(dimensions, measure=measure).tolist() == \
+                    cube.count_by(dimensions, measure=measure).tolist()
+    finally:
+        analytics.set_years(previous_years)
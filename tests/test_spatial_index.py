@@ -0,0 +1,114 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+
+# third party library
+import numpy as np
+import pytest
+
+# local
+from analytics import BOROUGH_BOUNDS, MAX_LATITUDE, MAX_LONGITUDE, MIN_LATITUDE, MIN_LONGITUDE
+from spatial_index import SpatialGridIndex, distance_meters
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# random collisions indexed, clustered like real ones
+INDEXED_POINTS = 20000
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+@pytest.fixture(scope='module')
+def points():
+    """
+    Float32 latitudes and longitudes clustered within NYC, with rows at 0, NaN and far outside it.
+    """
+    rng = np.random.default_rng(0)
+    centers = np.column_stack([rng.uniform(MIN_LATITUDE, MAX_LATITUDE, 30), rng.uniform(MIN_LONGITUDE, MAX_LONGITUDE, 30)])
+    points = centers[rng.integers(len(centers), size=INDEXED_POINTS)] + rng.normal(0, 0.004, (INDEXED_POINTS, 2))
+    # cleaning drops the coordinates outside NYC besides those at 0
+    points = np.clip(points, [MIN_LATITUDE + 1e-4, MIN_LONGITUDE + 1e-4], [MAX_LATITUDE - 1e-4, MAX_LONGITUDE - 1e-4])
+    points[:50] = 0
+    points[50:60] = np.nan
+    points[60:70] = [10.0, -150.0]
+    return points[:, 0].astype(np.float32), points[:, 1].astype(np.float32)
+
+
+@pytest.fixture(scope='module')
+def index(points):
+    """
+    Index of the points.
+    """
+    return SpatialGridIndex(*points)
+
+
+def brute_force_nearest_hotspot(index, latitude, longitude, min_count):
+    """
+    Distance to the center of the closest cell with at least min_count collisions, checking every cell.
+    """
+    lat_cells, lon_cells = np.nonzero(index.counts >= min_count)
+    if len(lat_cells) == 0:
+        return None
+    return distance_meters(latitude, longitude, *index.cell_center(lat_cells, lon_cells)).min()
+
+
+# ============================================================== #
+#  SECTION: Tests                                                #
+# ============================================================== #
+
+def test_grid_covers_nyc_whatever_the_outliers(points, index):
+    assert index.shape == SpatialGridIndex(points[0][70:], points[1][70:]).shape
+    assert index.shape[0] * index.shape[1] < 300000
+    assert len(index) == INDEXED_POINTS - 70
+
+
+def test_within_box_matches_comparing_every_row(points, index):
+    latitude, longitude = points
+    rng = np.random.default_rng(1)
+    boxes = list(BOROUGH_BOUNDS.values())
+    for _ in range(200):
+        corner = (rng.uniform(MIN_LATITUDE, MAX_LATITUDE), rng.uniform(MIN_LONGITUDE, MAX_LONGITUDE))
+        boxes.append((corner, (corner[0] + rng.uniform(0, 0.05), corner[1] + rng.uniform(0, 0.05))))
+    for (min_lat, min_lon), (max_lat, max_lon) in boxes:
+        within = (min_lat < latitude) & (latitude < max_lat) & (min_lon < longitude) & (longitude < max_lon)
+        assert np.array_equal(index.within_box((min_lat, min_lon), (max_lat, max_lon)), np.flatnonzero(within))
+
+
+def test_within_radius_matches_comparing_every_row(points, index):
+    latitude, longitude = points
+    rng = np.random.default_rng(2)
+    for row in rng.integers(70, INDEXED_POINTS, 50):
+        meters = rng.choice([50, 300, 2000])
+        rows, distances = index.within_radius(float(latitude[row]), float(longitude[row]), meters)
+        all_distances = distance_meters(float(latitude[row]), float(longitude[row]), latitude, longitude)
+        expected = np.flatnonzero(all_distances <= meters)
+        assert np.array_equal(rows, expected)
+        assert np.allclose(distances, all_distances[expected])
+
+
+@pytest.mark.parametrize('min_count', [1, 5, 20, 60])
+def test_nearest_hotspot_matches_checking_every_cell(index, min_count):
+    rng = np.random.default_rng(3)
+    for _ in range(100):
+        # points beyond the grid are searched from outside it
+        latitude = rng.uniform(MIN_LATITUDE - 0.05, MAX_LATITUDE + 0.05)
+        longitude = rng.uniform(MIN_LONGITUDE - 0.05, MAX_LONGITUDE + 0.05)
+        hotspot = index.nearest_hotspot(latitude, longitude, min_count=min_count)
+        expected = brute_force_nearest_hotspot(index, latitude, longitude, min_count)
+        if expected is None:
+            assert hotspot is None
+            continue
+        assert hotspot['distance'] == pytest.approx(expected)
+        assert hotspot['count'] >= min_count
+        assert hotspot['count'] == len(hotspot['rows'])
+
+
+def test_nearest_hotspot_is_none_without_hotspots(index):
+    assert index.nearest_hotspot(40.7, -73.95, min_count=INDEXED_POINTS + 1) is None
@@ -0,0 +1,79 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+import os
+
+# third party library
+import pandas as pd
+
+# local
+from analytics import ANALYTICS_COLUMNS, ANALYTICS_DTYPES, MOTOR_VEHICLE_COLLISIONS_CSV, clean_collision_df
+from conftest import SYNTHETIC_ROWS
+from streaming_reader import INITIAL_CHUNK_SIZE, TRACED_CHUNKS, chunk_memory, iter_clean_chunks, read_and_clean, stream_clean_data, \
+    traced_peak
+from synthetic_data import write_collisions_csv
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# rows of synthetic collisions streamed, several times the rows of the first chunk
+STREAMED_ROWS = 6 * INITIAL_CHUNK_SIZE
+
+# memory limit small enough to split the synthetic collisions into several chunks, in bytes,
+# yet well above the memory the csv parser uses whatever the size of a chunk
+SMALL_MEMORY_LIMIT = 4 * 1024 ** 2
+
+
+# ============================================================== #
+#  SECTION: Tests                                                #
+# ============================================================== #
+
+def test_chunks_stay_within_memory_limit(tmp_path):
+    csv_path = str(tmp_path / MOTOR_VEHICLE_COLLISIONS_CSV)
+    write_collisions_csv(csv_path, STREAMED_ROWS)
+    chunks = list(iter_clean_chunks(csv_path, memory_limit=SMALL_MEMORY_LIMIT))
+    assert len(chunks) > 3
+    # the chunks after the traced ones are sized from the memory of their rows, which differs a little between rows,
+    # reading and cleaning the rows of one of them again peaks within the limit, temporary copies included
+    first_row, next_row = chunks[TRACED_CHUNKS][0].index[0], chunks[TRACED_CHUNKS + 1][0].index[0]
+    reader = pd.read_csv(csv_path, usecols=ANALYTICS_COLUMNS, dtype=ANALYTICS_DTYPES, iterator=True)
+    with reader:
+        reader.get_chunk(first_row)
+        _, peak = traced_peak(read_and_clean, reader, next_row - first_row, clean_collision_df)
+    assert peak <= SMALL_MEMORY_LIMIT * 1.05
+
+    collision_df = pd.read_csv(csv_path, usecols=ANALYTICS_COLUMNS, dtype=ANALYTICS_DTYPES)
+    streamed_df = pd.concat([cleaned_chunk for cleaned_chunk, _ in chunks])
+    pd.testing.assert_frame_equal(streamed_df, clean_collision_df(collision_df))
+
+
+def test_fixed_chunk_size_reports_chunk_memory(dataset_dir):
+    chunk_size = SYNTHETIC_ROWS // 4
+    reader = pd.read_csv(MOTOR_VEHICLE_COLLISIONS_CSV, usecols=ANALYTICS_COLUMNS, dtype=ANALYTICS_DTYPES,
+                         chunksize=chunk_size)
+    with reader:
+        for (cleaned_chunk, memory), chunk in zip(iter_clean_chunks(MOTOR_VEHICLE_COLLISIONS_CSV,
+                                                                    chunk_size=chunk_size), reader, strict=True):
+            assert memory == chunk_memory(chunk, clean_collision_df(chunk))
+
+
+def test_header_only_csv_replaces_previous_output(tmp_path):
+    csv_path = str(tmp_path / MOTOR_VEHICLE_COLLISIONS_CSV)
+    output_path = str(tmp_path / 'streamed.csv')
+    write_collisions_csv(csv_path, SYNTHETIC_ROWS)
+    assert stream_clean_data(output_path, csv_path) > 0
+
+    with open(csv_path) as file:
+        header = file.readline()
+    with open(csv_path, 'w') as file:
+        file.write(header)
+    assert list(iter_clean_chunks(csv_path)) == []
+    assert stream_clean_data(output_path, csv_path) == 0
+    streamed_df = pd.read_csv(output_path)
+    assert len(streamed_df) == 0 and 'CRASH TIME' in streamed_df
+    # no temporary file is left behind
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(path) for path in [csv_path, output_path])
@@ -0,0 +1,100 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+import difflib
+
+# third party library
+import numpy as np
+import pandas as pd
+import pytest
+
+# local
+from vehicle_classifier import CATEGORY_CODES, CATEGORY_PRECEDENCE, VehicleTypeClassifier, build_lookup_table
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# vehicle type within no set and too unlike any known type to be classified by a fallback
+UNRELATED_TYPE = 'zzqx'
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def precedence_category(value):
+    """
+    Category code of a raw vehicle type by checking the sets one by one in precedence order.
+    """
+    v_type = str.lower(str(value))
+    for category, vehicle_types in CATEGORY_PRECEDENCE:
+        if v_type in vehicle_types:
+            return CATEGORY_CODES[category]
+    return CATEGORY_CODES['UNCLASSIFIED']
+
+
+def known_types():
+    """
+    Every known vehicle type, in sorted order.
+    """
+    return sorted(build_lookup_table())
+
+
+# ============================================================== #
+#  SECTION: Tests                                                #
+# ============================================================== #
+
+def test_exact_matches_precedence_order():
+    rng = np.random.default_rng(0)
+    values = known_types() + [v_type.upper() for v_type in known_types()[::7]] + [UNRELATED_TYPE, np.nan, None]
+    df = pd.DataFrame({'first': values, 'second': rng.permutation(np.array(values, dtype=object))})
+    codes = VehicleTypeClassifier().classify_columns(df, ['first', 'second'])
+    expected = np.array([[precedence_category(value) for value in df[column]] for column in df]).T
+    assert np.array_equal(codes, expected)
+
+
+def test_prefix_uses_longest_known_prefix():
+    classifier = VehicleTypeClassifier(fallback='prefix')
+    lookup_table = classifier.lookup_table
+    for v_type in known_types()[::13]:
+        if len(v_type) >= classifier.min_prefix_length:
+            assert classifier.classify_value(v_type + ' xyz') == lookup_table[v_type]
+    # a longer known prefix wins over a shorter one of another category
+    pairs = [(short, long) for short in lookup_table for long in lookup_table
+             if long.startswith(short) and lookup_table[short] != lookup_table[long] and
+             len(short) >= classifier.min_prefix_length]
+    assert pairs
+    for short, long in pairs:
+        assert classifier.classify_value(long + ' xyz') == lookup_table[long]
+    assert classifier.classify_value(known_types()[0][:classifier.min_prefix_length - 1] + '~') == \
+        CATEGORY_CODES['UNCLASSIFIED']
+    assert classifier.classify_value(UNRELATED_TYPE) == CATEGORY_CODES['UNCLASSIFIED']
+
+
+def test_fuzzy_uses_closest_known_type():
+    classifier = VehicleTypeClassifier(fallback='fuzzy')
+    typos = {v_type[:-1] + '~': v_type for v_type in known_types() if len(v_type) >= 10}
+    assert typos
+    for typo, v_type in typos.items():
+        closest = difflib.get_close_matches(typo, classifier.known_types, n=1, cutoff=classifier.fuzzy_cutoff)
+        # a typo of a long type is always close enough to some known type
+        assert closest
+        assert classifier.classify_value(typo) == classifier.lookup_table[closest[0]]
+    assert classifier.classify_value(UNRELATED_TYPE) == CATEGORY_CODES['UNCLASSIFIED']
+
+
+def test_unseen_types_are_memoized():
+    classifier = VehicleTypeClassifier(fallback='prefix')
+    column = pd.Series([known_types()[-1] + ' xyz', UNRELATED_TYPE] * 3)
+    first_codes = classifier.classify_column(column)
+    assert set(classifier.memo) >= {known_types()[-1] + ' xyz', UNRELATED_TYPE}
+    assert np.array_equal(classifier.classify_column(column), first_codes)
+
+
+def test_unknown_fallback_is_rejected():
+    with pytest.raises(ValueError, match='fallback must be one of'):
+        VehicleTypeClassifier(fallback='closest')
@@ -0,0 +1,122 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+import difflib
+
+# third party library
+import numpy as np
+import pandas as pd
+
+# local
+from data_cleaner import VEHICLE, OBSTACLE, PEDESTRIAN, UNKNOWN
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# category of each vehicle type code, a code is the index of its category
+VEHICLE_TYPE_CATEGORIES = ['UNCLASSIFIED', 'UNKNOWN', 'VEHICLE', 'OBSTACLE', 'PEDESTRIAN']
+
+# mapping of category to its code
+CATEGORY_CODES = {category: code for code, category in enumerate(VEHICLE_TYPE_CATEGORIES)}
+
+# sets of vehicle types in the order they are checked, the first set containing a type decides its category
+CATEGORY_PRECEDENCE = [('UNKNOWN', UNKNOWN), ('VEHICLE', VEHICLE), ('OBSTACLE', OBSTACLE), ('PEDESTRIAN', PEDESTRIAN)]
+
+# policies for vehicle types that are not in any set
+FALLBACK_POLICIES = ['exact', 'prefix', 'fuzzy']
+
+
+# ============================================================== #
+#  SECTION: Class Definitions                                   #
+# ============================================================== #
+
+class VehicleTypeClassifier:
+    """
+    Classifies vehicle type codes into VEHICLE_TYPE_CATEGORIES.
+    Columns are factorized so each distinct string is only classified once.
+    Types not in any set are classified by the fallback policy:
+        exact  - leave them UNCLASSIFIED
+        prefix - use the longest known type the string starts with
+        fuzzy  - use the closest known type by difflib similarity
+    Every classified string is memoized for later columns and calls.
+    """
+
+    def __init__(self, fallback='exact', min_prefix_length=4, fuzzy_cutoff=0.85):
+        if fallback not in FALLBACK_POLICIES:
+            raise ValueError(f'fallback must be one of {FALLBACK_POLICIES}, got {fallback!r}')
+        self.fallback = fallback
+        self.min_prefix_length = min_prefix_length
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.lookup_table = build_lookup_table()
+        self.known_types = sorted(self.lookup_table.keys())
+        self.max_type_length = max(len(v_type) for v_type in self.known_types)
+        # memoized classification of unseen types
+        self.memo = {}
+
+    def classify_unseen(self, v_type):
+        """
+        Classify a lowercase vehicle type that is not in the lookup table with the fallback policy.
+        """
+        if self.fallback == 'prefix':
+            for end in range(min(len(v_type), self.max_type_length), self.min_prefix_length - 1, -1):
+                code = self.lookup_table.get(v_type[:end])
+                if code is not None:
+                    return code
+        elif self.fallback == 'fuzzy':
+            matches = difflib.get_close_matches(v_type, self.known_types, n=1, cutoff=self.fuzzy_cutoff)
+            if matches:
+                return self.lookup_table[matches[0]]
+        return CATEGORY_CODES['UNCLASSIFIED']
+
+    def classify_value(self, value):
+        """
+        Classify a single raw vehicle type value, missing values are treated as the string 'nan'.
+        """
+        v_type = str.lower(str(value))
+        code = self.lookup_table.get(v_type)
+        if code is None:
+            code = self.memo.get(v_type)
+            if code is None:
+                code = self.classify_unseen(v_type)
+                self.memo[v_type] = code
+        return code
+
+    def classify_column(self, column):
+        """
+        Classify a column of raw vehicle types into an array of category codes.
+        """
+        codes, unique_types = pd.factorize(column)
+        # the category of missing values goes last so the -1 code of pd.factorize indexes it
+        unique_categories = [self.classify_value(v_type) for v_type in unique_types] + [self.classify_value(np.nan)]
+        return np.array(unique_categories, dtype=np.int8)[codes]
+
+    def classify_columns(self, df, columns):
+        """
+        Classify several vehicle type columns of df into a matrix of category codes,
+        one row per record and one column per vehicle type column.
+        """
+        category_codes = np.empty((len(df), len(columns)), dtype=np.int8)
+        for index, column in enumerate(columns):
+            category_codes[:, index] = self.classify_column(df[column])
+        return category_codes
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def build_lookup_table():
+    """
+    Precompute the category code of every known lowercase vehicle type.
+    """
+    lookup_table = {}
+    # assign the lowest precedence first so higher precedence sets overwrite shared types
+    for category, vehicle_types in reversed(CATEGORY_PRECEDENCE):
+        code = CATEGORY_CODES[category]
+        for v_type in vehicle_types:
+            lookup_table[v_type] = code
+    return lookup_table
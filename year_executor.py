@@ -0,0 +1,161 @@
+# ============================================================== #
+#  SECTION: Imports                                              #
+# ============================================================== #
+
+# standard library
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+# third party library
+import numpy as np
+
+# local
+import analytics
+from aggregation import AggregationKeys
+from columnar_cache import CLEANED_DATA_DIR, cache_exists, load_cleaned_data, saved_years
+import figure_export
+from shared_columns import attach_columns
+
+
+# ============================================================== #
+#  SECTION: Globals                                              #
+# ============================================================== #
+
+# columns every year partition is loaded with
+YEAR_COLUMNS = ['CRASH TIME', 'BOROUGH']
+
+# time columns derived from CRASH TIME, taken from the published columns when they have them
+TIME_COLUMNS = ['YEAR', 'MONTH', 'DAY', 'HOUR']
+
+
+# ============================================================== #
+#  SECTION: Class Definitions                                   #
+# ============================================================== #
+
+class YearExecutor:
+    """
+    Runs per-year jobs in a pool of processes. Each process reads only its year's partition of the
+    saved parquet dataset, so no dataframe is pickled to or from the processes, only the small results.
+    With shared_columns, columns published by shared_columns.publish_columns with a YEAR column,
+    the processes read their year's rows from those instead.
+    count_by is duck-type compatible with CountCube and AggregationKeys, so the query functions
+    can take an executor as their cube.
+    """
+
+    def __init__(self, years=None, workers=None, cache_dir=CLEANED_DATA_DIR, shared_columns=None):
+        self.shared_directory = None if shared_columns is None else shared_columns.directory
+        if self.shared_directory is not None:
+            # every published year by default
+            all_years = np.unique(shared_columns.values('YEAR')).tolist()
+        elif cache_exists(cache_dir):
+            # every saved year by default
+            all_years = saved_years(cache_dir)
+        else:
+            raise FileNotFoundError(f'no cleaned data saved in {cache_dir}, run read_data(save_cleaned=True) first')
+        self.years = all_years if years is None else list(years)
+        self.workers = workers
+        self.cache_dir = cache_dir
+
+    def map_years(self, function, years=None, columns=None, **kwargs):
+        """
+        Call function(year, year_df, **kwargs) for every year, by default every year of the executor,
+        with year_df loaded from the year's partition with YEAR_COLUMNS and columns.
+        Returns a dictionary of year to result in year order.
+        """
+        years = self.years if years is None else list(years)
+        columns = list(dict.fromkeys(YEAR_COLUMNS + list(columns or [])))
+        jobs = [(function, year, columns, self.cache_dir, self.shared_directory, kwargs) for year in years]
+        if self.workers == 1:
+            results = [run_year_job(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=analytics.use_agg_backend) as executor:
+                results = list(executor.map(run_year_job, jobs))
+        return dict(zip(years, results))
+
+    def count_by(self, dimensions, measure=None):
+        """
+        Count accidents, or sum a measure, for every combination of values of the given dimensions,
+        counting each year in its own process. Returns the same array as CountCube.count_by.
+        """
+        domains = dict(dimensions)
+        other_dimensions = [(dimension, list(domain)) for dimension, domain in dimensions if dimension != 'year']
+        years = list(domains['year']) if 'year' in domains else self.years
+        columns = [] if measure is None else [measure]
+        years_present = [year for year in years if year in self.years]
+        counts = self.map_years(year_counts, years=years_present, columns=columns,
+                                dimensions=other_dimensions, measure=measure)
+        # years without a saved partition count as 0
+        shape = tuple(len(domain) for _, domain in other_dimensions)
+        dtype = np.int64 if measure is None else np.float64
+        stacked = np.stack([counts[year] if year in counts else np.zeros(shape, dtype=dtype) for year in years])
+        if 'year' not in domains:
+            return stacked.sum(axis=0)
+        return np.moveaxis(stacked, 0, [dimension for dimension, _ in dimensions].index('year'))
+
+    def render(self, plot, years=None, columns=None, **kwargs):
+        """
+        Call plot(year, year_df, **kwargs) for every year in the pool, by default every year of the executor,
+        saving the figures it finishes with
+        show_figure under the current question of the running batch export, and add them to its manifest.
+        Returns the saved paths in year order.
+        """
+        exporter = figure_export.active_exporter()
+        if exporter is None:
+            raise RuntimeError('render saves figures, run it within figure_export.batch_export')
+        outputs = self.map_years(export_year_figures, years=years, columns=columns, plot=plot, output_dir=exporter.output_dir,
+                                 question=exporter.question, plot_kwargs=kwargs)
+        paths = []
+        for year_outputs in outputs.values():
+            for output in year_outputs:
+                paths.append(os.path.join(exporter.output_dir, output['path']))
+                exporter.record(paths[-1], output['title'])
+        return paths
+
+
+# ============================================================== #
+#  SECTION: Helper Definitions                                   #
+# ============================================================== #
+
+def load_year(year, columns=YEAR_COLUMNS, cache_dir=CLEANED_DATA_DIR, shared_directory=None):
+    """
+    Rows of one year from the saved parquet dataset, or from the published columns in shared_directory,
+    with the analytics schema and time columns.
+    """
+    if shared_directory is not None:
+        with attach_columns(shared_directory) as shared:
+            published = [column for column in shared.columns if column in columns or column in TIME_COLUMNS]
+            year_df = shared.frame(published, rows=shared.values('YEAR') == year)
+    else:
+        year_df = load_cleaned_data([year], columns=columns, cache_dir=cache_dir)
+    year_df = analytics.apply_schema(year_df)
+    if 'CRASH TIME' in year_df and not all(column in year_df for column in TIME_COLUMNS):
+        analytics.add_time_columns(year_df)
+    return year_df
+
+
+def run_year_job(job):
+    """
+    Load the year's rows and call the job's function on them, run in the pool's processes.
+    """
+    function, year, columns, cache_dir, shared_directory, kwargs = job
+    year_df = load_year(year, columns=columns, cache_dir=cache_dir, shared_directory=shared_directory)
+    return function(year, year_df, **kwargs)
+
+
+def year_counts(year, year_df, dimensions, measure=None):
+    """
+    Count the accidents of a year, or sum a measure, for every combination of values of the dimensions.
+    """
+    weights = None if measure is None else year_df[measure].to_numpy(dtype=np.float64, na_value=0)
+    return AggregationKeys(year_df, analytics.BOROUGH_COORDS.keys()).count_by(dimensions, weights=weights)
+
+
+def export_year_figures(year, year_df, plot, output_dir, question, plot_kwargs):
+    """
+    Plot a year's figures in a process of the pool with its own exporter, returning the exported figures.
+    """
+    exporter = figure_export.FigureExporter(output_dir)
+    exporter.question = question
+    with figure_export.exporting_to(exporter):
+        plot(year, year_df, **plot_kwargs)
+    return exporter.outputs